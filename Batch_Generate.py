@@ -0,0 +1,267 @@
+"""
+多标书批量生成工具
+
+把多个标书任务（需求对应表、标书底稿、产品手册章节目录）分配到进程池中并行执行，
+每个任务调用一次Generate.main()，输出写入各自的目录。各进程的大模型调用经由主进程中的
+共享限流器，合计不超过BAIDU_RPM/BAIDU_TPM/OPENAI_RPM/OPENAI_TPM。
+
+任务来源：
+- 目录：每个子目录是一个任务，包含需求对应表.xlsx和标书内容.docx（或唯一的.xlsx和.docx），
+  可选的sections子目录作为章节目录
+- 清单：JSON文件，形如{"jobs": [{"name": "A", "excel": "a/表.xlsx", "word": "a/底稿.docx",
+  "sections": "手册/sections", "output_dir": "out/A"}]}，相对路径相对于清单所在目录
+
+用法：
+    python Batch_Generate.py data/batch --workers 4
+    python Batch_Generate.py jobs.json --workers 8 --output-dir data/output/batch --resume
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import Generate
+from Generate import OUTPUT_DIR, Config, RateLimiter, metrics
+
+PROVIDERS = ("baidu", "openai")
+STATUS_NAME = "batch_status.json"
+
+
+@dataclass
+class BatchJob:
+    """一个标书任务"""
+    name: str
+    excel_file: Path
+    word_file: Path
+    output_dir: Path
+    sections_dir: Optional[Path] = None
+
+    def config_overrides(self) -> Dict[str, Any]:
+        """任务在工作进程中需要覆盖的配置，输出文件名与单任务运行相同；
+        未指定章节目录时使用环境变量或默认的SECTIONS_DIR"""
+        out = self.output_dir
+        return {
+            "EXCEL_FILE": self.excel_file,
+            "WORD_FILE": self.word_file,
+            "OUTPUT_EXCEL_FILE": out / Path(Config.OUTPUT_EXCEL_FILE).name,
+            "OUTPUT_WORD_FILE": out / Path(Config.OUTPUT_WORD_FILE).name,
+            "JOURNAL_FILE": out / Path(Config.JOURNAL_FILE).name,
+            "METRICS_JSON_FILE": out / Path(Config.METRICS_JSON_FILE).name,
+            "METRICS_PROM_FILE": out / Path(Config.METRICS_PROM_FILE).name,
+            "DEDUP_REPORT_FILE": out / Path(Config.DEDUP_REPORT_FILE).name,
+            "SECTION_MATCH_REPORT_FILE": out / Path(Config.SECTION_MATCH_REPORT_FILE).name,
+            "SECTIONS_DIR": self.sections_dir if self.sections_dir is not None else Config.SECTIONS_DIR,
+        }
+
+
+def _find_input(directory: Path, default_name: str, suffix: str) -> Optional[Path]:
+    """优先使用默认文件名，否则取目录中唯一的该类型文件"""
+    if (directory / default_name).is_file():
+        return directory / default_name
+    candidates = [path for path in directory.glob(f"*{suffix}") if not path.name.startswith("~$")]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def discover_jobs(source: Path, output_root: Path) -> List[BatchJob]:
+    """从任务目录或JSON清单读取任务列表
+
+    Args:
+        source: 任务目录或清单文件
+        output_root: 未指定output_dir的任务输出到output_root/任务名
+
+    Returns:
+        按名称排列（清单按书写顺序）的任务列表
+    """
+    source = Path(source)
+    jobs: List[BatchJob] = []
+    if source.is_file():
+        with open(source, encoding='utf-8') as f:
+            entries = json.load(f).get("jobs", [])
+        base = source.parent
+        for entry in entries:
+            excel_file = base / entry["excel"]
+            name = entry.get("name") or excel_file.parent.name
+            sections = entry.get("sections")
+            jobs.append(BatchJob(
+                name=name,
+                excel_file=excel_file,
+                word_file=base / entry["word"],
+                output_dir=base / entry["output_dir"] if entry.get("output_dir") else output_root / name,
+                sections_dir=base / sections if sections else None,
+            ))
+    elif source.is_dir():
+        for directory in sorted(path for path in source.iterdir() if path.is_dir()):
+            excel_file = _find_input(directory, Path(Config.EXCEL_FILE).name, ".xlsx")
+            word_file = _find_input(directory, Path(Config.WORD_FILE).name, ".docx")
+            if excel_file is None or word_file is None:
+                print(f"跳过目录（未找到唯一的需求对应表或标书底稿）: {directory}")
+                continue
+            sections_dir = directory / "sections"
+            jobs.append(BatchJob(directory.name, excel_file, word_file, output_root / directory.name,
+                                 sections_dir if sections_dir.is_dir() else None))
+    else:
+        raise FileNotFoundError(f"未找到任务目录或清单: {source}")
+
+    names = [job.name for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"任务名重复: {', '.join(duplicates)}")
+    return jobs
+
+
+class RateLimitManager(BaseManager):
+    """在独立进程中托管各提供商的限流器，供所有工作进程共享"""
+
+
+RateLimitManager.register("RateLimiter", RateLimiter, exposed=("reserve", "record_usage"))
+
+
+class SharedRateLimiter(RateLimiter):
+    """工作进程中的限流器，预约和用量校正转发给共享限流器，等待仍在本进程内进行"""
+
+    def __init__(self, remote):
+        self.remote = remote
+
+    def reserve(self, tokens: int) -> float:
+        return self.remote.reserve(tokens)
+
+    def record_usage(self, reserved: int, actual: Optional[int]) -> None:
+        self.remote.record_usage(reserved, actual)
+
+
+def init_worker(limiters: Dict[str, Any]) -> None:
+    """工作进程初始化：安装共享限流器"""
+    for provider, remote in limiters.items():
+        RateLimiter.install(provider, SharedRateLimiter(remote))
+
+
+def _counter_total(snapshot: Dict[str, Any], name: str, **labels: str) -> float:
+    return sum(counter["value"] for counter in snapshot["counters"]
+               if counter["name"] == name and all(counter["labels"].get(k) == v for k, v in labels.items()))
+
+
+def run_job(job: BatchJob, resume: bool = False) -> Dict[str, Any]:
+    """在工作进程中执行一个任务，输出重定向到任务目录下的run.log，返回状态"""
+    job.output_dir.mkdir(parents=True, exist_ok=True)
+    log_file = job.output_dir / "run.log"
+    result: Dict[str, Any] = {"name": job.name, "status": "ok", "error": None,
+                              "output_dir": str(job.output_dir), "log": str(log_file), "pid": os.getpid()}
+    start = time.time()
+    # 工作进程会执行多个任务，任务结束后恢复配置，避免影响后续任务
+    overrides = job.config_overrides()
+    saved = {name: getattr(Config, name) for name in overrides}
+    try:
+        with open(log_file, 'a' if resume else 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+            for name, value in overrides.items():
+                setattr(Config, name, value)
+            Generate.main(resume=resume)
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+    seconds = time.time() - start
+    snapshot = metrics.snapshot()
+    rows = int(_counter_total(snapshot, "rows_total", stage="assembled"))
+    result.update(seconds=round(seconds, 3), rows=rows,
+                  rows_per_second=round(rows / seconds, 3) if seconds > 0 else 0.0,
+                  llm_calls=int(_counter_total(snapshot, "llm_call_total")))
+    return result
+
+
+def write_status(path: Path, status: Dict[str, Any]) -> None:
+    """原子写入批量状态文件"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def run_batch(jobs: List[BatchJob], output_root: Path, workers: int, resume: bool = False) -> Dict[str, Any]:
+    """用进程池执行所有任务，每完成一个任务更新状态文件并打印进度
+
+    Returns:
+        批量状态：各任务结果和汇总吞吐量
+    """
+    output_root = Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    status_file = output_root / STATUS_NAME
+    start = time.time()
+    status: Dict[str, Any] = {
+        "started_at": start, "workers": workers,
+        "jobs": {job.name: {"name": job.name, "status": "queued", "output_dir": str(job.output_dir)}
+                 for job in jobs},
+    }
+    write_status(status_file, status)
+
+    context = multiprocessing.get_context("spawn")
+    with RateLimitManager(ctx=context) as manager:
+        limiters = {provider: manager.RateLimiter(getattr(Config, f"{provider.upper()}_RPM", 0),
+                                                  getattr(Config, f"{provider.upper()}_TPM", 0))
+                    for provider in PROVIDERS}
+        with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context,
+                                 initializer=init_worker, initargs=(limiters,)) as executor:
+            futures = {executor.submit(run_job, job, resume): job for job in jobs}
+            for finished, future in enumerate(as_completed(futures), start=1):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 工作进程异常退出
+                    result = {"name": job.name, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                              "output_dir": str(job.output_dir), "rows": 0}
+                status["jobs"][job.name] = result
+                write_status(status_file, status)
+                detail = (f"{result['rows']}行，{result['seconds']:.1f}秒，{result['rows_per_second']:.2f}行/秒"
+                          if result["status"] == "ok" else result["error"])
+                print(f"[{finished}/{len(jobs)}] {job.name}: {'完成' if result['status'] == 'ok' else '失败'}，{detail}")
+
+    elapsed = time.time() - start
+    results = list(status["jobs"].values())
+    rows = sum(result.get("rows", 0) for result in results)
+    status["summary"] = {
+        "jobs": len(results),
+        "succeeded": sum(result["status"] == "ok" for result in results),
+        "failed": sum(result["status"] != "ok" for result in results),
+        "rows": rows,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 3) if elapsed > 0 else 0.0,
+        "jobs_per_hour": round(len(results) / elapsed * 3600, 1) if elapsed > 0 else 0.0,
+    }
+    write_status(status_file, status)
+    return status
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数，返回退出码：0全部成功，1有任务失败"""
+    parser = argparse.ArgumentParser(description='多标书批量生成（进程池并行，共享大模型限流）')
+    parser.add_argument('source', help='任务目录（每个子目录一个任务）或JSON任务清单')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1), help='并行进程数')
+    parser.add_argument('--output-dir', default=str(OUTPUT_DIR / "batch"), help='任务输出的根目录')
+    parser.add_argument('--resume', action='store_true', help='各任务从断点日志续跑')
+    args = parser.parse_args(argv)
+
+    output_root = Path(args.output_dir)
+    jobs = discover_jobs(Path(args.source), output_root)
+    if not jobs:
+        print(f"未找到任务: {args.source}")
+        return 1
+    print(f"共{len(jobs)}个任务，{args.workers}个进程，状态文件: {output_root / STATUS_NAME}")
+    summary = run_batch(jobs, output_root, args.workers, args.resume)["summary"]
+    print(f"批量完成: 成功{summary['succeeded']}个，失败{summary['failed']}个，共{summary['rows']}行，"
+          f"耗时{summary['elapsed_seconds']:.1f}秒，{summary['rows_per_second']:.2f}行/秒，"
+          f"{summary['jobs_per_hour']:.1f}个任务/小时")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
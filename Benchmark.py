@@ -0,0 +1,322 @@
+"""
+文档流水线基准测试工具
+
+生成指定规模的合成产品手册和需求对应表，在不调用大模型的情况下
+测量拆分、章节查找、组装和保存各阶段的耗时，并与保存的基线比较。
+
+主要功能：
+- 按标题数、段落数、表格数、图片数和需求行数生成合成输入
+- 调用Extract_Word.py拆分手册，调用Generate.main()生成标书（大模型以固定应答替代）
+- 多次运行取中位数，结果与基线比较，超出容差时返回非零退出码
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+from docx import Document
+from docx.shared import Cm
+from openpyxl import Workbook
+
+import Generate
+from Extract_Word import DocumentProcessor
+from Fake_LLM_Server import canned_answer
+from Generate import AIService, Config, SectionIndex, metrics
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_BASELINE = ROOT_DIR / "data" / "benchmarks" / "baseline.json"
+
+# 每7个标题为一组：1个一级标题，下设2个二级标题，各带2个三级标题
+HEADING_PATTERN = (1, 2, 3, 3, 2, 3, 3)
+
+# Generate.main()中记录的阶段指标 → 报告中的阶段名
+MAIN_STAGES = {
+    ("excel_seconds", "load"): "excel_load",
+    ("docx_seconds", "load"): "docx_load",
+    ("docx_seconds", "parse_section"): "section_parse",
+    ("stage_seconds", "generate"): "generate_stub",
+    ("docx_seconds", "copy"): "assemble",
+    ("docx_seconds", "save"): "docx_save",
+    ("excel_seconds", "save"): "excel_save",
+}
+
+
+def make_png(width: int, height: int, seed: int) -> bytes:
+    """生成纯色PNG图片，seed决定颜色，用于模拟截图"""
+    def chunk(chunk_type: bytes, payload: bytes) -> bytes:
+        return (struct.pack('>I', len(payload)) + chunk_type + payload
+                + struct.pack('>I', zlib.crc32(chunk_type + payload) & 0xFFFFFFFF))
+
+    color = bytes(((seed * 53) % 256, (seed * 97) % 256, (seed * 193) % 256))
+    raw = (b'\x00' + color * width) * height
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+def build_manual(path: Path, headings: int, paragraphs: int, tables: int, images: int,
+                 distinct_images: int = 16) -> None:
+    """生成合成产品手册
+
+    Args:
+        path: 输出路径
+        headings: 标题总数
+        paragraphs: 每个标题下的段落数
+        tables: 每个标题下的表格数
+        images: 每个标题下的图片数
+        distinct_images: 不同图片的数量，图片按顺序循环复用
+    """
+    pictures = [make_png(1280, 720, seed) for seed in range(max(1, distinct_images))]
+    document = Document()
+    image_count = 0
+    for i in range(headings):
+        level = HEADING_PATTERN[i % len(HEADING_PATTERN)]
+        document.add_heading(f"功能模块{i + 1}", level=level)
+        for j in range(paragraphs):
+            text = f"模块{i + 1}第{j + 1}段：系统支持数据源配置化管理，可界面化新增、修改、删除和搜索。"
+            if j % 3 == 2:
+                document.add_paragraph(text, style='List Paragraph')
+            else:
+                document.add_paragraph(text)
+        for j in range(tables):
+            table = document.add_table(rows=4, cols=3)
+            table.style = 'Table Grid'
+            for row_index, row in enumerate(table.rows):
+                for col_index, cell in enumerate(row.cells):
+                    cell.text = f"指标{row_index}-{col_index}" if row_index else f"列{col_index + 1}"
+        for j in range(images):
+            picture = pictures[image_count % len(pictures)]
+            image_count += 1
+            document.add_paragraph().add_run().add_picture(io.BytesIO(picture), width=Cm(16))
+    # 拆分时最后一节不保存，追加一个收尾标题
+    document.add_heading("附录", level=1)
+    document.save(str(path))
+
+
+def build_matrix(path: Path, rows: int, section_keys: List[str], group_every: int = 5) -> None:
+    """生成合成需求对应表，G列循环引用已拆分的章节，每隔几行留空"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['序号', '需求类型（手工填写）', '需求说明（手工填写）', None, None, None,
+                  '标准需求对应序号（手工填写）'])
+    for index in range(1, rows + 1):
+        group = f"需求分组{index // group_every + 1}" if index % group_every == 1 else None
+        g_value = section_keys[index % len(section_keys)] if section_keys and index % 4 else 'X'
+        sheet.append([index, group, f"需求{index}：支持可视化创建不同类型数据源，包括传统数据库、文件系统等",
+                      None, None, None, g_value])
+    workbook.save(str(path))
+
+
+def build_proposal(path: Path) -> None:
+    """生成待追加内容的标书底稿"""
+    document = Document()
+    document.add_heading("技术方案", level=1)
+    document.save(str(path))
+
+
+class StubLLM:
+    """替代大模型的固定应答，与替身服务返回相同的结果"""
+
+    @staticmethod
+    def cache_identity():
+        return ("stub", "stub", None)
+
+    @staticmethod
+    def call_api(prompt: str, profile=None) -> str:
+        return canned_answer(prompt)
+
+    @classmethod
+    async def acall_api(cls, prompt: str, profile=None) -> str:
+        return cls.call_api(prompt, profile)
+
+
+def time_extraction(manual: Path, sections_dir: Path) -> float:
+    """拆分手册，返回耗时"""
+    if sections_dir.exists():
+        shutil.rmtree(sections_dir)
+    start = time.perf_counter()
+    DocumentProcessor(str(sections_dir)).process_document(str(manual))
+    return time.perf_counter() - start
+
+
+def time_lookup(sections_dir: Path, g_values: List[str]) -> float:
+    """加载章节索引并查找所有G列值，返回耗时"""
+    start = time.perf_counter()
+    index = SectionIndex.load(sections_dir)
+    for value in g_values:
+        index.lookup(value)
+    return time.perf_counter() - start
+
+
+def time_search(sections_dir: Path, queries: List[str]) -> float:
+    """加载章节检索索引并按需求文本检索，返回耗时"""
+    start = time.perf_counter()
+    search = SectionIndex.load(sections_dir).load_search()
+    for query in queries:
+        search.search(query, top_k=1)
+    return time.perf_counter() - start
+
+
+def run_generate(work_dir: Path, sections_dir: Path) -> Dict[str, float]:
+    """以固定应答运行Generate.main()，返回各阶段耗时"""
+    overrides = {
+        "EXCEL_FILE": work_dir / "matrix.xlsx",
+        "WORD_FILE": work_dir / "proposal.docx",
+        "OUTPUT_EXCEL_FILE": work_dir / "matrix_out.xlsx",
+        "OUTPUT_WORD_FILE": work_dir / "proposal_out.docx",
+        "JOURNAL_FILE": work_dir / "run_journal.jsonl",
+        "SECTIONS_DIR": sections_dir,
+        "LLM_CACHE_ENABLED": False,
+        "METRICS_ENABLED": False,
+    }
+    with contextlib.ExitStack() as stack:
+        for name, value in overrides.items():
+            stack.enter_context(patch.object(Config, name, value))
+        stack.enter_context(patch.object(AIService, "get_ai_provider", return_value=StubLLM))
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        start = time.perf_counter()
+        Generate.main()
+        total = time.perf_counter() - start
+
+    snapshot = metrics.snapshot()
+    timings = {stage: 0.0 for stage in MAIN_STAGES.values()}
+    for histogram in snapshot["histograms"]:
+        labels = histogram["labels"]
+        stage = MAIN_STAGES.get((histogram["name"], labels.get("operation") or labels.get("stage")))
+        if stage:
+            timings[stage] += histogram["sum"]
+    timings["generate_total"] = total
+    return timings
+
+
+def run_benchmark(params: Dict[str, int], repeat: int = 3, work_dir: Optional[Path] = None) -> Dict:
+    """生成输入并重复运行各阶段，返回每个阶段的中位数和最小值"""
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        temp_dir = Path(temp_dir)
+        manual = temp_dir / "manual.docx"
+        sections_dir = temp_dir / "sections"
+        build_manual(manual, params["headings"], params["paragraphs"], params["tables"], params["images"])
+        build_proposal(temp_dir / "proposal.docx")
+
+        samples: Dict[str, List[float]] = {}
+        for _ in range(repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                extract_seconds = time_extraction(manual, sections_dir)
+                section_keys = sorted(SectionIndex.load(sections_dir).sections)
+                build_matrix(temp_dir / "matrix.xlsx", params["rows"], section_keys)
+                g_values = [section_keys[i % len(section_keys)] for i in range(params["rows"])] \
+                    if section_keys else []
+                lookup_seconds = time_lookup(sections_dir, g_values)
+                search_seconds = time_search(sections_dir, [
+                    f"需求{i}：支持可视化创建不同类型数据源，包括传统数据库、文件系统等" for i in range(params["rows"])])
+            timings = {"extract": extract_seconds, "section_lookup": lookup_seconds,
+                       "section_search": search_seconds}
+            timings.update(run_generate(temp_dir, sections_dir))
+            for stage, seconds in timings.items():
+                samples.setdefault(stage, []).append(seconds)
+
+        return {
+            "params": params,
+            "repeat": repeat,
+            "sections": len(section_keys),
+            "platform": f"{platform.system()} {platform.machine()} Python {platform.python_version()}",
+            "stages": {stage: {"median": statistics.median(values), "min": min(values)}
+                       for stage, values in samples.items()},
+        }
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float, min_seconds: float = 0.05) -> List[str]:
+    """与基线比较中位数，返回超出容差的阶段说明
+
+    基线耗时低于min_seconds的阶段只比较绝对差值，避免计时噪声误报。
+    """
+    regressions = []
+    for stage, current in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            continue
+        limit = max(base["median"] * (1 + tolerance), base["median"] + min_seconds)
+        if current["median"] > limit:
+            regressions.append(f"{stage}: {current['median']:.3f}s，基线{base['median']:.3f}s"
+                               f"（+{(current['median'] / base['median'] - 1) * 100 if base['median'] else 0:.0f}%）")
+    return regressions
+
+
+def print_report(result: Dict, baseline: Optional[Dict]) -> None:
+    """打印各阶段耗时，有基线时附带比值"""
+    params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+    print(f"规模: {params}，拆分得到{result['sections']}个章节，重复{result['repeat']}次")
+    print(f"{'阶段':<16}{'中位数(s)':>12}{'最小值(s)':>12}{'基线(s)':>12}{'比值':>8}")
+    for stage, current in result["stages"].items():
+        base = (baseline or {}).get("stages", {}).get(stage)
+        base_text = f"{base['median']:>12.3f}" if base else f"{'-':>12}"
+        ratio_text = f"{current['median'] / base['median']:>8.2f}" if base and base["median"] else f"{'-':>8}"
+        print(f"{stage:<16}{current['median']:>12.3f}{current['min']:>12.3f}{base_text}{ratio_text}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数，返回退出码：0正常，1有阶段超出基线容差"""
+    parser = argparse.ArgumentParser(description='文档流水线基准测试（不调用大模型）')
+    parser.add_argument('--headings', type=int, default=70, help='手册标题总数')
+    parser.add_argument('--paragraphs', type=int, default=6, help='每个标题下的段落数')
+    parser.add_argument('--tables', type=int, default=1, help='每个标题下的表格数')
+    parser.add_argument('--images', type=int, default=1, help='每个标题下的图片数')
+    parser.add_argument('--rows', type=int, default=200, help='需求对应表行数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取中位数')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='基线文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许比基线慢的比例')
+    parser.add_argument('--output', type=Path, help='把本次结果写入JSON文件')
+    args = parser.parse_args(argv)
+
+    params = {"headings": args.headings, "paragraphs": args.paragraphs, "tables": args.tables,
+              "images": args.images, "rows": args.rows}
+    result = run_benchmark(params, max(1, args.repeat))
+
+    baseline = None
+    if args.baseline.exists() and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print(f"基线规模与本次不同，不做比较: {args.baseline}")
+            baseline = None
+
+    print_report(result, baseline)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.baseline}")
+        return 0
+
+    if baseline:
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("以下阶段超出基线容差：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("所有阶段均在基线容差范围内")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,28 +9,148 @@ Word文档处理工具
 - 保持原始格式（包括中文字体）
 - 处理表格和图片
 - 自动调整图片大小
+- 生成章节清单（版本号 → 文件路径、标题、大小、哈希）
+- 建立章节全文检索索引（BM25），供Generate.py为未填G列的需求匹配章节
+- 流式拆分（--memory-budget-mb）：图片只保留对源文档的引用，保存章节时逐张读取，
+  超出内存预算的章节直接写入文件并分块计算哈希，适合在小内存机器上拆分超大手册
+- 并行拆分（--workers）：主进程扫描标题边界和版本号，章节文档的生成和保存分给进程池，
+  文件名、编号、清单和索引与顺序拆分相同
+- 章节模板（--template）：章节文档从预先解析的模板克隆（Template_Pool.py），使用模板中的样式，
+  不再为每个章节重新解析模板；命令行默认使用data/templates/Template.docx，--no-template使用python-docx默认模板
 """
 
 from typing import List, Tuple, Optional, Union, BinaryIO
 from docx import Document
 from docx.document import Document as _Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+from docx.oxml.shape import CT_Inline
 from docx.oxml.text.paragraph import CT_P
 from docx.oxml.table import CT_Tbl
+from docx.parts.image import ImagePart
 from docx.table import Table, _Cell
 from docx.text.paragraph import Paragraph
 from docx.shared import Cm
+import argparse
+import hashlib
 import io
+import json
+import multiprocessing
 import os
+import shutil
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from Image_Info import find_run_image, probe_image, run_image_size_cm
+from Section_Search import INDEX_NAME, BM25Index
+from Template_Pool import TemplatePool
+
+MEDIA_PREFIX = 'word/media/'  # 源文档中图片所在目录
+CHUNK_SIZE = 1024 * 1024  # 分块读取章节文件计算哈希的块大小
+
+# 并行拆分时工作进程中已打开的源文档（路径 -> 压缩包），每个进程只打开一次
+_archives = {}
+
+
+def open_archive(path: str) -> zipfile.ZipFile:
+    """打开（或复用本进程已打开的）源文档压缩包"""
+    archive = _archives.get(path)
+    if archive is None:
+        archive = _archives[path] = zipfile.ZipFile(path)
+    return archive
+
+
+class SourceImage:
+    """源文档中图片的延迟引用
+
+    只记录图片在源文档压缩包中的成员名、类型和大小，需要时才读取内容，
+    拆分过程中不为每张图片复制一份数据。传给并行拆分的工作进程时只传递源文档路径，
+    工作进程自行打开源文档读取图片。
+    """
+
+    HEAD_BYTES = 65536  # 推算尺寸时读取的文件头长度
+
+    def __init__(self, archive: zipfile.ZipFile, image_part):
+        self.archive = archive
+        self.member = image_part.partname.lstrip('/')
+        self.name = os.path.basename(image_part.partname)
+        self.ext = image_part.partname.ext
+        self.content_type = image_part.content_type
+        self.size = archive.getinfo(self.member).file_size
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['archive'] = self.archive.filename
+        return state
+
+    def __setstate__(self, state):
+        state['archive'] = open_archive(state['archive'])
+        self.__dict__.update(state)
+
+    def read(self) -> bytes:
+        """读取图片内容"""
+        return self.archive.read(self.member)
+
+    def size_cm(self) -> Tuple[Optional[float], Optional[float]]:
+        """按文件头的像素和分辨率推算显示尺寸，无法识别时返回(None, None)"""
+        with self.archive.open(self.member) as f:
+            info = probe_image(f.read(self.HEAD_BYTES))
+        if info is None and self.size > self.HEAD_BYTES:
+            info = probe_image(self.read())
+        return info.size_cm() if info else (None, None)
+
+
+class LazyImagePart(ImagePart):
+    """章节文档中的图片部件，保存文档时才从源文档读取内容"""
+
+    def __init__(self, partname, source: SourceImage):
+        super().__init__(partname, source.content_type, b'')
+        self.source = source
+
+    @property
+    def blob(self) -> bytes:
+        return self.source.read()
+
 
 class DocumentProcessor:
     """处理Word文档的主类"""
     
     MAX_WIDTH_CM = 14.0  # 最大宽度（厘米）
+    MANIFEST_NAME = 'sections_manifest.json'  # 章节清单文件名
+    INDEX_NAME = INDEX_NAME  # 章节检索索引文件名
+
+    MAX_PENDING_PER_WORKER = 4  # 并行拆分时每个工作进程最多排队的章节数
 
-    def __init__(self):
+    def __init__(self, output_dir: str = '.', memory_budget_mb: float = 0, workers: int = 0,
+                 template: Optional[str] = None):
         self.version = [0, 0, 0]
+        self.output_dir = output_dir
+        # 章节文档模板，为None时使用python-docx的默认模板
+        self.template = template
+        self.manifest = {}
+        self.section_texts = {}
+        # 内存预算（字节），大于0时流式拆分
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.source_archive: Optional[zipfile.ZipFile] = None
+        # 工作进程数，大于1时并行生成和保存章节
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pending = deque()
+        self.style_names = {}
+
+    def get_version_text(self) -> str:
+        """生成当前版本号文本，去掉末尾的0，例如[1, 2, 0] -> '1.2'"""
+        version = self.version.copy()
+        while version and version[-1] == 0:
+            version.pop()
+        return '.'.join(map(str, version))
+
+    @staticmethod
+    def clean_heading_text(heading_text: str) -> str:
+        """清理标题文本，只保留字母数字和特定符号"""
+        return ''.join(c for c in heading_text if c.isalnum() or c in (' ', '-', '_')).strip()
 
     def get_file_name(self, heading_text: str) -> str:
         """生成文件名
@@ -41,13 +161,7 @@ class DocumentProcessor:
         Returns:
             格式化后的文件名
         """
-        version = self.version.copy()
-        while version[-1] == 0:
-            version.pop()
-        
-        # 清理标题文本，只保留字母数字和特定符号
-        clean_text = ''.join(c for c in heading_text if c.isalnum() or c in (' ', '-', '_')).strip()
-        return f"{'.'.join(map(str, version))}- {clean_text}"
+        return f"{self.get_version_text()}- {self.clean_heading_text(heading_text)}"
 
     def update_version(self, level: str) -> None:
         """更新版本号
@@ -102,9 +216,10 @@ class DocumentProcessor:
             table_data.append(row_data)
         return ('table', table_data)
 
-    @staticmethod
-    def get_image_from_run(run) -> Optional[Tuple[BinaryIO, str, float, float]]:
+    def get_image_from_run(self, run) -> Optional[Tuple[Union[BinaryIO, SourceImage], str, float, float]]:
         """从运行对象中提取图片
+
+        流式拆分时返回对源文档图片的引用，显示尺寸缺失时在插入章节时再推算
         
         Args:
             run: Word运行对象
@@ -112,21 +227,18 @@ class DocumentProcessor:
         Returns:
             图片数据元组或None
         """
-        drawing_elements = run._element.xpath('.//a:blip')
-        if not drawing_elements:
+        found = find_run_image(run._element)
+        if found is None:
             return None
 
-        embed = drawing_elements[0].get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
+        embed, width_cm, height_cm = found
         image_part = run.part.related_parts[embed]
+        if self.source_archive is not None:
+            image = SourceImage(self.source_archive, image_part)
+            return image, image.name, width_cm, height_cm
         image_data = image_part.blob
-        
-        width_cm = height_cm = None
-        drawing_element = run._element.xpath('.//wp:extent')
-        if drawing_element:
-            cx = int(drawing_element[0].get('cx'))
-            cy = int(drawing_element[0].get('cy'))
-            width_cm = cx / 914400 * 2.54
-            height_cm = cy / 914400 * 2.54
+        # 没有 wp:extent 时只读取文件头推算尺寸，不解码像素
+        width_cm, height_cm = run_image_size_cm(run, embed, width_cm, height_cm)
 
         image_stream = io.BytesIO(image_data)
         image_stream.name = os.path.basename(image_part.partname)
@@ -134,13 +246,46 @@ class DocumentProcessor:
 
     def save_content_to_new_doc(self, content: List[Union[str, Tuple]], heading_text: str) -> None:
         """保存内容到新的Word文档
+
+        并行拆分时把章节交给进程池，按提交顺序登记结果，排队的章节过多时等待最早的章节完成
         
         Args:
             content: 要保存的内容列表
             heading_text: 标题文本
         """
+        version = self.get_version_text()
         file_name = f"{self.get_file_name(heading_text)}.docx"
-        doc = Document()
+        section_text = self.section_text(content, heading_text)
+        if self.executor is not None:
+            # 参数在后台线程中序列化，调用方随后会清空content，因此提交副本
+            future = self.executor.submit(write_section, self.output_dir, self.memory_budget,
+                                          self.template, file_name, list(content))
+            self.pending.append((version, file_name, heading_text, section_text, future))
+            while len(self.pending) > self.workers * self.MAX_PENDING_PER_WORKER:
+                self.collect_section()
+            return
+        size, digest = self.write_section(file_name, content)
+        self.record_section(file_name, heading_text, size, digest, version)
+        self.section_texts[version] = section_text
+
+    def collect_section(self) -> None:
+        """等待最早提交的章节保存完成并登记"""
+        version, file_name, heading_text, section_text, future = self.pending.popleft()
+        size, digest = future.result()
+        self.record_section(file_name, heading_text, size, digest, version)
+        self.section_texts[version] = section_text
+
+    def write_section(self, file_name: str, content: List[Union[str, Tuple]]) -> Tuple[int, str]:
+        """生成章节文档并写入输出目录
+
+        Args:
+            file_name: 章节文件名
+            content: 要保存的内容列表
+
+        Returns:
+            (文件大小, sha256)
+        """
+        doc = TemplatePool.shared(self.template).new_document()
         
         for item in content:
             if isinstance(item, str):
@@ -148,7 +293,132 @@ class DocumentProcessor:
             elif isinstance(item, tuple):
                 self._process_content_item(doc, item)
 
-        doc.save(file_name)
+        path = os.path.join(self.output_dir, file_name)
+        if self.memory_budget and self.content_size(content) > self.memory_budget:
+            return self.save_in_chunks(doc, path)
+        # 先保存到内存，写文件的同时计算大小和哈希，避免再次读取
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        data = buffer.getvalue()
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data), hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def content_size(content: List[Union[str, Tuple]]) -> int:
+        """估算章节内容的字节数（文本按UTF-8长度，图片按文件大小）"""
+        size = 0
+        for item in content:
+            if isinstance(item, str):
+                size += len(item.encode('utf-8'))
+            elif item[0] == 'list':
+                size += len(item[1].encode('utf-8'))
+            elif item[0] == 'table':
+                size += sum(len(cell.encode('utf-8')) for row in item[1] for cell in row)
+            elif item[0] == 'image':
+                image = item[1]
+                size += image.size if isinstance(image, SourceImage) else len(image.getbuffer())
+        return size
+
+    @staticmethod
+    def save_in_chunks(doc: _Document, path: str) -> Tuple[int, str]:
+        """把章节直接保存到文件，再分块读取计算大小和哈希，不在内存中保留整个章节文件
+
+        Returns:
+            (文件大小, sha256)
+        """
+        tmp_path = path + '.tmp'
+        doc.save(tmp_path)
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+        return size, digest.hexdigest()
+
+    @staticmethod
+    def section_text(content: List[Union[str, Tuple]], heading_text: str) -> str:
+        """提取章节的可检索文本（标题、段落、列表和表格单元格）
+
+        Args:
+            content: 章节内容列表
+            heading_text: 标题文本
+
+        Returns:
+            以换行分隔的文本
+        """
+        parts = [heading_text]
+        for item in content:
+            if isinstance(item, str):
+                parts.append(item)
+            elif item[0] == 'list':
+                parts.append(item[1])
+            elif item[0] == 'table':
+                parts.extend(cell for row in item[1] for cell in row if cell)
+        return '\n'.join(parts)
+
+    def record_section(self, file_name: str, heading_text: str, size: int, sha256: str,
+                       version: Optional[str] = None) -> None:
+        """把已保存的章节登记到清单
+        
+        Args:
+            file_name: 章节文件名（相对于输出目录）
+            heading_text: 标题文本
+            size: 章节文件大小
+            sha256: 章节文件哈希
+            version: 章节号，为空时使用当前版本号
+        """
+        self.manifest[version or self.get_version_text()] = {
+            'path': file_name,
+            'title': self.clean_heading_text(heading_text),
+            'size': size,
+            'sha256': sha256,
+        }
+
+    def save_manifest(self, source: str) -> str:
+        """把章节清单写入输出目录
+        
+        Args:
+            source: 被拆分的原始文档路径
+            
+        Returns:
+            清单文件路径
+        """
+        manifest_path = os.path.join(self.output_dir, self.MANIFEST_NAME)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': os.path.basename(source), 'sections': self.manifest},
+                      f, ensure_ascii=False, indent=2)
+        return manifest_path
+
+    def save_search_index(self) -> str:
+        """为已拆分的章节建立BM25检索索引并写入输出目录
+
+        Returns:
+            索引文件路径
+        """
+        index = BM25Index.build(self.section_texts.items())
+        index_path = os.path.join(self.output_dir, self.INDEX_NAME)
+        index.save(index_path)
+        return index_path
+
+    def rebuild_search_index(self) -> str:
+        """根据已有章节清单和章节文件重建检索索引，无需重新拆分
+
+        Returns:
+            索引文件路径
+        """
+        with open(os.path.join(self.output_dir, self.MANIFEST_NAME), encoding='utf-8') as f:
+            self.manifest = json.load(f)['sections']
+        self.section_texts = {}
+        for version, entry in self.manifest.items():
+            doc = Document(os.path.join(self.output_dir, entry['path']))
+            content = [para.text for para in doc.paragraphs if para.text]
+            content += [('table', [[cell.text for cell in row.cells] for row in table.rows])
+                        for table in doc.tables]
+            self.section_texts[version] = self.section_text(content, entry.get('title', ''))
+        return self.save_search_index()
 
     def _add_text_paragraph(self, doc: _Document, text: str) -> None:
         """添加文本段落
@@ -207,17 +477,24 @@ class DocumentProcessor:
             tbl_borders.append(border)
         tbl_pr.append(tbl_borders)
 
-    def _add_image(self, doc: _Document, image_stream: BinaryIO, 
-                  image_name: str, width_cm: float, height_cm: float) -> None:
+    def _add_image(self, doc: _Document, image_stream: Union[BinaryIO, SourceImage],
+                  image_name: str, width_cm: Optional[float],
+                  height_cm: Optional[float]) -> None:
         """添加图片
         
         Args:
             doc: Word文档对象
-            image_stream: 图片数据流
+            image_stream: 图片数据流或源文档图片引用
             image_name: 图片名称
             width_cm: 宽度（厘米）
             height_cm: 高度（厘米）
         """
+        if isinstance(image_stream, SourceImage):
+            self._add_source_image(doc, image_stream, width_cm, height_cm)
+            return
+        if width_cm is None or height_cm is None:
+            doc.add_paragraph().add_run().add_picture(image_stream)
+            return
         if width_cm > self.MAX_WIDTH_CM:
             scale_factor = self.MAX_WIDTH_CM / width_cm
             width_cm = self.MAX_WIDTH_CM
@@ -225,6 +502,56 @@ class DocumentProcessor:
         doc.add_paragraph().add_run().add_picture(
             image_stream, width=Cm(width_cm), height=Cm(height_cm))
 
+    def _add_source_image(self, doc: _Document, image: SourceImage,
+                          width_cm: Optional[float], height_cm: Optional[float]) -> None:
+        """以延迟部件插入源文档中的图片，同一章节内重复的图片共用一个部件
+
+        Args:
+            doc: Word文档对象
+            image: 源文档图片引用
+            width_cm: 宽度（厘米）
+            height_cm: 高度（厘米）
+        """
+        if width_cm is None or height_cm is None:
+            width_cm, height_cm = image.size_cm()
+            if width_cm is None or height_cm is None:
+                # 无法识别的格式交给python-docx解析
+                image_stream = io.BytesIO(image.read())
+                image_stream.name = image.name
+                self._add_image(doc, image_stream, image.name, None, None)
+                return
+        if width_cm > self.MAX_WIDTH_CM:
+            height_cm = height_cm * self.MAX_WIDTH_CM / width_cm
+            width_cm = self.MAX_WIDTH_CM
+
+        image_parts = doc.part.package.image_parts
+        part = next((p for p in image_parts
+                     if isinstance(p, LazyImagePart) and p.source.member == image.member), None)
+        if part is None:
+            part = LazyImagePart(image_parts._next_image_partname(image.ext), image)
+            image_parts.append(part)
+        rId = doc.part.relate_to(part, RT.IMAGE)
+        inline = CT_Inline.new_pic_inline(doc.part.next_id, rId, image.name, Cm(width_cm), Cm(height_cm))
+        doc.add_paragraph().add_run()._r.add_drawing(inline)
+
+    @staticmethod
+    def open_without_media(archive: zipfile.ZipFile) -> _Document:
+        """打开去掉图片内容的源文档副本
+
+        python-docx打开文档时会把所有部件读入内存；副本中图片为空内容，
+        图片仍留在原压缩包中，由SourceImage按需读取。
+        """
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as target:
+            for info in archive.infolist():
+                if info.filename.startswith(MEDIA_PREFIX):
+                    target.writestr(info.filename, b'')
+                    continue
+                with archive.open(info) as source, target.open(info.filename, 'w') as destination:
+                    shutil.copyfileobj(source, destination, CHUNK_SIZE)
+        buffer.seek(0)
+        return Document(buffer)
+
     def _add_list_item(self, doc: _Document, text: str) -> None:
         """添加列表项
         
@@ -260,18 +587,53 @@ class DocumentProcessor:
         Args:
             docx_path: Word文档路径
         """
-        doc = Document(docx_path)
+        # 流式和并行拆分都只引用源文档中的图片；并行时由工作进程自行读取
+        if self.memory_budget or self.workers > 1:
+            self.source_archive = zipfile.ZipFile(docx_path)
+            doc = self.open_without_media(self.source_archive)
+        else:
+            doc = Document(docx_path)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = {}
+        self.section_texts = {}
+        self.pending.clear()
+        self.style_names = {}
         content_between_headings = []
         current_heading_text = None
-        
-        for block in self.iter_block_items(doc):
-            if isinstance(block, Paragraph):
-                self._process_paragraph(block, content_between_headings)
-            elif isinstance(block, Table):
-                content_between_headings.append(self.process_table(block))
 
-        if content_between_headings and current_heading_text:
-            self.save_content_to_new_doc(content_between_headings, current_heading_text)
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        try:
+            for block in self.iter_block_items(doc):
+                if isinstance(block, Paragraph):
+                    self._process_paragraph(block, content_between_headings)
+                elif isinstance(block, Table):
+                    content_between_headings.append(self.process_table(block))
+
+            if content_between_headings and current_heading_text:
+                self.save_content_to_new_doc(content_between_headings, current_heading_text)
+            while self.pending:
+                self.collect_section()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+                self.pending.clear()
+            if self.source_archive is not None:
+                self.source_archive.close()
+                self.source_archive = None
+
+        self.save_manifest(docx_path)
+        self.save_search_index()
+
+    def paragraph_style_name(self, para: Paragraph) -> str:
+        """按样式ID缓存段落样式名（python-docx每次查找样式都要遍历全部样式定义）"""
+        style_id = para._p.style
+        name = self.style_names.get(style_id)
+        if name is None:
+            name = self.style_names[style_id] = para.style.name
+        return name
 
     def _process_paragraph(self, para: Paragraph, content: List) -> None:
         """处理段落
@@ -280,12 +642,13 @@ class DocumentProcessor:
             para: 段落对象
             content: 内容列表
         """
-        if para.style.name.startswith('Heading'):
+        style_name = self.paragraph_style_name(para)
+        if style_name.startswith('Heading'):
             if content:
                 self.save_content_to_new_doc(content, para.text)
                 content.clear()
             
-            heading_level = para.style.name.split(' ')[-1]
+            heading_level = style_name.split(' ')[-1]
             self.update_version(heading_level)
             return
 
@@ -299,16 +662,54 @@ class DocumentProcessor:
                 if text:
                     paragraph_text += text
 
-        if para.style.name == 'List Paragraph' or para._element.xpath('.//w:numPr'):
+        if style_name == 'List Paragraph' or para._element.xpath('.//w:numPr'):
             content.append(('list', paragraph_text))
         elif paragraph_text:
             content.append(paragraph_text)
 
-def main():
+
+def write_section(output_dir: str, memory_budget: int, template: Optional[str], file_name: str,
+                  content: List[Union[str, Tuple]]) -> Tuple[int, str]:
+    """并行拆分的工作进程入口：生成并保存一个章节，返回(文件大小, sha256)"""
+    processor = DocumentProcessor(output_dir, template=template)
+    processor.memory_budget = memory_budget
+    return processor.write_section(file_name, content)
+
+
+def main(argv: Optional[List[str]] = None):
     """主函数"""
-    processor = DocumentProcessor()
-    docx_file = 'Template.docx'  # 替换为实际的文档路径
-    processor.process_document(docx_file)
+    root_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='按标题层级拆分产品说明书')
+    parser.add_argument('docx_file', nargs='?',
+                        default=os.path.join(root_dir, 'data', 'input', '标书内容.docx'),
+                        help='要拆分的Word文档路径')
+    parser.add_argument('--output-dir', default=os.path.join(root_dir, 'data', 'sections'),
+                        help='章节文件和清单的输出目录')
+    parser.add_argument('--reindex', action='store_true',
+                        help='不重新拆分，只根据输出目录中已有的章节重建检索索引')
+    parser.add_argument('--memory-budget-mb', type=float, default=0,
+                        help='流式拆分的内存预算（MB）：图片按需从源文档读取，超出预算的章节分块写入；0表示不启用')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='并行生成和保存章节的进程数，0或1表示顺序拆分')
+    default_template = os.path.join(root_dir, 'data', 'templates', 'Template.docx')
+    template_group = parser.add_mutually_exclusive_group()
+    template_group.add_argument('--template',
+                                help='章节文档的模板，默认使用data/templates/Template.docx（与Generate.py的TEMPLATE_FILE相同）')
+    template_group.add_argument('--no-template', dest='template', action='store_const', const=None,
+                                help='不使用模板，章节文档使用python-docx默认模板（与之前的版本相同）')
+    parser.set_defaults(template=default_template if os.path.exists(default_template) else None)
+    args = parser.parse_args(argv)
+
+    processor = DocumentProcessor(args.output_dir, args.memory_budget_mb, args.workers, args.template)
+    if args.reindex:
+        index_path = processor.rebuild_search_index()
+        print(f"检索索引重建完成，共{len(processor.manifest)}个章节，索引: {index_path}")
+        return
+    print(f"章节模板: {args.template or 'python-docx默认模板'}")
+    processor.process_document(args.docx_file)
+    print(f"拆分完成，共{len(processor.manifest)}个章节，清单: "
+          f"{os.path.join(args.output_dir, processor.MANIFEST_NAME)}，"
+          f"检索索引: {os.path.join(args.output_dir, processor.INDEX_NAME)}")
 
 if __name__ == '__main__':
     main()
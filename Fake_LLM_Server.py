@@ -0,0 +1,367 @@
+"""
+本地大模型替身服务
+
+模拟百度千帆（OAuth令牌接口和wenxinworkshop对话接口）以及OpenAI兼容的
+/chat/completions接口，用于在不消耗额度的情况下调优并发、限流和重试配置。
+
+主要功能：
+- 按提示词哈希返回确定的应答（标题、批量标题JSON、长篇方案），遵守请求的输出上限和停止序列
+- 可配置的延迟分布（固定、均匀、指数、对数正态）
+- 按比例注入限流、服务端错误和超时，或按每分钟请求数在服务端限流
+- GET /stats 返回请求统计
+
+用法：
+    python Fake_LLM_Server.py --port 8765 --latency-ms 300 --throttle-rate 0.05
+    BAIDU_API_BASE=http://127.0.0.1:8765/ OPENAI_API_BASE=http://127.0.0.1:8765/v1/ python Generate.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# 与Generate.Config中提示词的开头一致，用于区分请求类型
+TITLE_BATCH_MARKER = "下面的JSON数组中每一项包含id和text"
+TITLE_MARKER = "变为10字以内"
+
+BAIDU_TOKEN_PATH = "/oauth/2.0/token"
+BAIDU_CHAT_PREFIX = "/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/"
+
+
+def canned_answer(prompt: str) -> str:
+    """按提示词生成确定的应答：批量标题返回JSON数组，标题返回短文本，其余返回长篇方案"""
+    digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:6]
+    if TITLE_BATCH_MARKER in prompt:
+        start = prompt.find('[')
+        try:
+            items = json.loads(prompt[start:]) if start >= 0 else []
+        except ValueError:
+            items = []
+        return json.dumps([{"id": item.get("id"), "title": f"标题{digest}{item.get('id')}"}
+                           for item in items if isinstance(item, dict)], ensure_ascii=False)
+    if TITLE_MARKER in prompt:
+        return f"标题{digest}"
+    return f"完全支持。系统支持{digest}。" + "系统提供配置化管理和可视化监控功能。" * 40
+
+
+def count_tokens(text: str) -> int:
+    """与Generate.estimate_tokens相同的粗略估算"""
+    cjk = sum(1 for c in text if '\u2e80' <= c <= '\u9fff' or '\uf900' <= c <= '\ufaff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def limit_answer(answer: str, max_tokens: Optional[int], stop: Any) -> Tuple[str, str]:
+    """按请求的停止序列和输出上限截断应答，返回（应答, 结束原因）"""
+    for sequence in (stop if isinstance(stop, list) else [stop] if stop else []):
+        position = answer.find(sequence)
+        if position >= 0:
+            answer = answer[:position]
+    if max_tokens and count_tokens(answer) > max_tokens:
+        while answer and count_tokens(answer) > max_tokens:
+            answer = answer[:-1]
+        return answer, "length"
+    return answer, "stop"
+
+
+@dataclass
+class ServerSettings:
+    """替身服务的延迟和故障配置"""
+    latency: str = "lognormal"      # fixed / uniform / exponential / lognormal
+    latency_ms: float = 300.0       # 固定值、均值或对数正态的中位数（毫秒）
+    latency_sigma: float = 0.5      # 对数正态分布的sigma
+    throttle_rate: float = 0.0      # 返回限流错误的比例
+    error_rate: float = 0.0         # 返回HTTP 500的比例
+    timeout_rate: float = 0.0       # 挂起hang_seconds秒再应答的比例
+    hang_seconds: float = 30.0
+    rpm: float = 0.0                # 服务端每分钟请求上限，0表示不限制
+    token_ttl: int = 2592000        # 百度访问令牌有效期（秒）
+    seed: Optional[int] = None
+
+
+class FakeLLMServer:
+    """本地大模型替身服务，可在后台线程中运行"""
+
+    def __init__(self, settings: Optional[ServerSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or ServerSettings()
+        self._random = random.Random(self.settings.seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._tokens = set()
+        self._stats = {"token": 0, "baidu": 0, "openai": 0, "ok": 0, "throttled": 0,
+                       "errors": 0, "timeouts": 0, "unauthorized": 0}
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeLLMServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def issue_token(self) -> str:
+        token = f"fake.{uuid.uuid4().hex}"
+        with self._lock:
+            self._tokens.add(token)
+        return token
+
+    def token_valid(self, token: Optional[str]) -> bool:
+        with self._lock:
+            return token in self._tokens
+
+    def sample_latency(self) -> float:
+        """按配置的分布抽取一次延迟（秒）"""
+        settings = self.settings
+        mean = settings.latency_ms / 1000.0
+        with self._lock:
+            if settings.latency == "uniform":
+                return self._random.uniform(0, 2 * mean)
+            if settings.latency == "exponential":
+                return self._random.expovariate(1 / mean) if mean > 0 else 0.0
+            if settings.latency == "lognormal":
+                return self._random.lognormvariate(math.log(mean), settings.latency_sigma) if mean > 0 else 0.0
+        return mean
+
+    def choose_fault(self) -> Optional[str]:
+        """决定本次请求注入的故障：throttle / error / timeout，或None"""
+        settings = self.settings
+        now = time.monotonic()
+        with self._lock:
+            if settings.rpm > 0:
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= settings.rpm:
+                    return "throttle"
+                self._recent.append(now)
+            roll = self._random.random()
+        if roll < settings.throttle_rate:
+            return "throttle"
+        roll -= settings.throttle_rate
+        if roll < settings.error_rate:
+            return "error"
+        roll -= settings.error_rate
+        if roll < settings.timeout_rate:
+            return "timeout"
+        return None
+
+    def usage(self, prompt: str, answer: str) -> Dict[str, int]:
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(answer)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """请求处理：按路径分发到百度令牌、百度对话和OpenAI对话接口"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    @property
+    def app(self) -> FakeLLMServer:
+        return self.server.app
+
+    def _send_json(self, status: int, data: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已超时断开
+            self.close_connection = True
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            return {}
+
+    def do_GET(self) -> None:
+        if urlparse(self.path).path == "/stats":
+            self._send_json(200, self.app.stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        parsed = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        body = self._read_json()
+        if parsed.path == BAIDU_TOKEN_PATH:
+            self._baidu_token(query)
+        elif parsed.path.startswith(BAIDU_CHAT_PREFIX):
+            self._baidu_chat(query, body)
+        elif parsed.path.endswith("/chat/completions"):
+            self._openai_chat(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    @staticmethod
+    def _prompt(body: Dict) -> str:
+        messages = body.get("messages") or [{}]
+        return str(messages[-1].get("content", ""))
+
+    def _simulate(self) -> Tuple[Optional[str], float]:
+        """抽取故障和延迟，超时故障挂起hang_seconds秒"""
+        fault = self.app.choose_fault()
+        if fault == "timeout":
+            self.app.count("timeouts")
+            time.sleep(self.app.settings.hang_seconds)
+        else:
+            time.sleep(self.app.sample_latency())
+        return fault, time.time()
+
+    def _baidu_token(self, query: Dict[str, str]) -> None:
+        self.app.count("token")
+        if query.get("grant_type") != "client_credentials" or not query.get("client_id") \
+                or not query.get("client_secret"):
+            self._send_json(200, {"error": "invalid_client", "error_description": "unknown client id"})
+            return
+        self._send_json(200, {"access_token": self.app.issue_token(),
+                              "expires_in": self.app.settings.token_ttl})
+
+    def _baidu_chat(self, query: Dict[str, str], body: Dict) -> None:
+        self.app.count("baidu")
+        if not self.app.token_valid(query.get("access_token")):
+            self.app.count("unauthorized")
+            self._send_json(200, {"error_code": 110, "error_msg": "Access token invalid or no longer valid"})
+            return
+        fault, now = self._simulate()
+        if fault == "timeout":
+            # 挂起后不应答直接断开，模拟上游超时
+            self.close_connection = True
+            return
+        if fault == "throttle":
+            self.app.count("throttled")
+            self._send_json(200, {"error_code": 18, "error_msg": "Open api qps request limit reached"})
+            return
+        if fault == "error":
+            self.app.count("errors")
+            self._send_json(500, {"error_code": 336100, "error_msg": "internal error"})
+            return
+        prompt = self._prompt(body)
+        answer, reason = limit_answer(canned_answer(prompt), body.get("max_output_tokens"), body.get("stop"))
+        self.app.count("ok")
+        self._send_json(200, {"id": f"as-{uuid.uuid4().hex[:10]}", "object": "chat.completion",
+                              "created": int(now), "result": answer, "is_truncated": reason == "length",
+                              "need_clear_history": False, "usage": self.app.usage(prompt, answer)})
+
+    def _openai_chat(self, body: Dict) -> None:
+        self.app.count("openai")
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            self.app.count("unauthorized")
+            self._send_json(401, {"error": {"message": "Missing API key", "type": "invalid_request_error"}})
+            return
+        fault, now = self._simulate()
+        if fault == "timeout":
+            # 挂起后不应答直接断开，模拟上游超时
+            self.close_connection = True
+            return
+        if fault == "throttle":
+            self.app.count("throttled")
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                            "code": "rate_limit_exceeded"}}, {"Retry-After": "1"})
+            return
+        if fault == "error":
+            self.app.count("errors")
+            self._send_json(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+            return
+        prompt = self._prompt(body)
+        answer, reason = limit_answer(canned_answer(prompt), body.get("max_tokens"), body.get("stop"))
+        self.app.count("ok")
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(now),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                         "finish_reason": reason}],
+            "usage": self.app.usage(prompt, answer)})
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加延迟和故障相关的命令行参数，供服务和压测工具共用"""
+    defaults = ServerSettings()
+    parser.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'],
+                        default=defaults.latency, help='延迟分布')
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms, help='延迟均值或中位数（毫秒）')
+    parser.add_argument('--latency-sigma', type=float, default=defaults.latency_sigma, help='对数正态分布的sigma')
+    parser.add_argument('--throttle-rate', type=float, default=defaults.throttle_rate, help='限流错误比例')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help='HTTP 500比例')
+    parser.add_argument('--timeout-rate', type=float, default=defaults.timeout_rate, help='挂起不应答的比例')
+    parser.add_argument('--hang-seconds', type=float, default=defaults.hang_seconds, help='超时故障挂起的秒数')
+    parser.add_argument('--rpm', type=float, default=defaults.rpm, help='服务端每分钟请求上限，0表示不限制')
+    parser.add_argument('--token-ttl', type=int, default=defaults.token_ttl, help='百度访问令牌有效期（秒）')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+
+
+def settings_from_args(args: argparse.Namespace) -> ServerSettings:
+    return ServerSettings(**{key: getattr(args, key) for key in asdict(ServerSettings())})
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description='本地大模型替身服务（百度千帆/OpenAI兼容接口）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(settings_from_args(args), args.host, args.port)
+    print(f"替身服务已启动: {server.url}")
+    print(f"  百度: BAIDU_API_BASE={server.url}")
+    print(f"  OpenAI: OPENAI_API_BASE={server.url}v1/")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"请求统计: {json.dumps(server.stats(), ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
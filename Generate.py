@@ -1,18 +1,44 @@
+import argparse
+import asyncio
+import copy
+import email.utils
+import hashlib
 import io
 import json
 import os
+import random
 import re
+import sqlite3
+import threading
 import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Callable, Tuple
 
 import docx
-import openai
-import requests
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
 from docx.shared import Cm
 from dotenv import load_dotenv
-from openpyxl import Workbook, load_workbook
-from openpyxl.worksheet.worksheet import Worksheet
+from lxml import etree
+
+# 提供商SDK、HTTP客户端和openpyxl在首次使用时才导入，只拆分文档或查看帮助时不必加载
+if TYPE_CHECKING:
+    import httpx
+    import openai
+    import requests
+    from openpyxl import Workbook
+    from openpyxl.worksheet.worksheet import Worksheet
+
+from Image_Info import find_run_image, image_info_cache, run_image_size_cm
+from Near_Duplicate import find_near_duplicates, write_cluster_report
+from Section_Search import INDEX_NAME, BM25Index
+from Template_Pool import TemplatePool
 
 # 定义项目根目录和其他目录
 ROOT_DIR = Path(__file__).parent
@@ -22,37 +48,49 @@ OUTPUT_DIR = DATA_DIR / "output"
 TEMPLATES_DIR = DATA_DIR / "templates"
 EXAMPLES_DIR = ROOT_DIR / "examples"
 
-# 创建必要的目录
-for dir_path in [DATA_DIR, INPUT_DIR, OUTPUT_DIR, TEMPLATES_DIR, EXAMPLES_DIR]:
-    dir_path.mkdir(parents=True, exist_ok=True)
 
-# 加载环境变量
-load_dotenv()
+def ensure_directories() -> None:
+    """创建必要的目录（运行时调用，导入本模块不会创建目录）"""
+    for dir_path in [DATA_DIR, INPUT_DIR, OUTPUT_DIR, TEMPLATES_DIR, EXAMPLES_DIR]:
+        dir_path.mkdir(parents=True, exist_ok=True)
+
+
+class LazyConfig(type):
+    """配置类的元类：首次读取或修改配置项时才加载.env和环境变量
+
+    从环境变量读取的配置项只在Config.reload()中赋值，导入模块时不读取.env；
+    访问尚未加载的配置项（或在加载前修改配置项）时先执行一次reload()。
+    """
+
+    def __getattr__(cls, name):
+        # 只有类中尚不存在的属性会走到这里
+        if name.startswith('_') or cls._loaded:
+            raise AttributeError(f"配置项不存在: {name}")
+        cls.reload()
+        return type.__getattribute__(cls, name)
 
-class Config:
+    def __setattr__(cls, name, value):
+        if not name.startswith('_') and not cls._loaded:
+            cls.reload()
+        super().__setattr__(name, value)
+
+
+class Config(metaclass=LazyConfig):
     """配置类，用于管理所有配置项"""
 
-    # 加载环境变量
-    load_dotenv()
+    _loaded = False
 
     # 文件路径配置
     EXCEL_FILE = INPUT_DIR / "需求对应表.xlsx"
     WORD_FILE = INPUT_DIR / "标书内容.docx"
     TEMPLATE_FILE = TEMPLATES_DIR / "Template.docx"
-    
+
     # 输出文件路径配置
     OUTPUT_EXCEL_FILE = OUTPUT_DIR / "需求对应表_输出.xlsx"
     OUTPUT_WORD_FILE = OUTPUT_DIR / "标书内容_输出.docx"
 
-    # API配置
-    BAIDU_API_KEY = os.getenv('BAIDU_API_KEY', 'your_api_key_here')
-    BAIDU_SECRET_KEY = os.getenv('BAIDU_SECRET_KEY', 'your_secret_key_here')
-    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'your_api_key_here')
-    OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1/')  # 添加末尾的斜杠
-    USE_BAIDU = os.getenv('USE_BAIDU', 'true').lower() == 'true'
-    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4')
-    OPENAI_TEMPERATURE = float(os.getenv('OPENAI_TEMPERATURE', '0.7'))
-    OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '1500'))
+    # 断点续跑日志
+    JOURNAL_FILE = OUTPUT_DIR / "run_journal.jsonl"
 
     # Word文档配置
     MAX_WIDTH_CM = 14.0
@@ -71,9 +109,15 @@ class Config:
     PROMPT_TITLE = """你是一个专业作者，请把以下这段文字变为10字以内不带细节内容和标点和解释的文字，
     直接给出结果不要'简化为'这种返回："""
 
+    PROMPT_TITLE_BATCH = """你是一个专业作者，下面的JSON数组中每一项包含id和text，请把每一项的text分别变为10字以内
+    不带细节内容和标点和解释的文字。只返回一个JSON数组，每一项形如{"id": 编号, "title": "结果"}，
+    不要返回任何其他内容。输入如下："""
+
+    PROMPT_ADAPT = """下面给出一条需求的产品功能介绍，以及另一条措辞略有不同的相似需求。请在原介绍的基础上做最小改动，
+    使其针对新需求：保留原有结构和风格，只调整与新需求不一致的内容，不要补充解释，直接输出修改后的介绍。"""
+
     # 标题配置
     MORE_SECTION = 1
-    RE_GENERATE_TEXT = 0
     DDD_ANSWER = 1
     KEY_FLAG = 0
     LEVEL1 = 'heading 1'
@@ -82,27 +126,729 @@ class Config:
     LAST_HEADING_2 = 0
     LAST_HEADING_3 = 0
 
+    @staticmethod
+    def stop_sequences(name: str, default: str) -> List[str]:
+        """读取JSON字符串数组格式的停止序列，格式错误时给出配置项名称"""
+        value = os.getenv(name, default)
+        try:
+            stop = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"配置项{name}不是有效的JSON: {value!r}（{e.msg}），应为字符串数组，例如[\"\\n\"]") from e
+        if not isinstance(stop, list) or not all(isinstance(item, str) for item in stop):
+            raise ValueError(f"配置项{name}应为JSON字符串数组，实际为: {value!r}")
+        return stop
+
+    @staticmethod
+    def choice(name: str, default: str, choices: Tuple[str, ...]) -> str:
+        """读取取值有限的配置项（不区分大小写），取值不在范围内时给出配置项名称和可选值"""
+        value = os.getenv(name, default).strip().lower()
+        if value not in choices:
+            raise ValueError(f"配置项{name}的取值无效: {value!r}，可选值: {', '.join(choices)}")
+        return value
+
     @classmethod
     def reload(cls):
-        """重新加载配置"""
+        """加载.env并从环境变量读取配置（首次访问配置项时自动执行，修改环境变量后可再次调用）"""
+        cls._loaded = True
         load_dotenv()
+
+        # Excel流式处理（只读方式读取、只写方式逐行输出，适合超大需求表；不保留单元格样式）
+        cls.EXCEL_STREAMING = os.getenv('EXCEL_STREAMING', 'false').lower() == 'true'
+
+        # 产品手册章节目录（Extract_Word.py的输出，含sections_manifest.json）
+        cls.SECTIONS_DIR = Path(os.getenv('SECTIONS_DIR', str(DATA_DIR / "sections")))
+
+        # 章节自动匹配（G列为空时按C列文本检索章节；suggest只输出建议，fill在得分不低于阈值时填入G列，off关闭）
+        cls.SECTION_MATCH_MODE = cls.choice('SECTION_MATCH_MODE', 'suggest', ('suggest', 'fill', 'off'))
+        cls.SECTION_MATCH_THRESHOLD = float(os.getenv('SECTION_MATCH_THRESHOLD', '0.25'))
+        cls.SECTION_MATCH_REPORT_FILE = Path(os.getenv('SECTION_MATCH_REPORT_FILE', str(OUTPUT_DIR / "section_matches.json")))
+
+        # 已解析章节的LRU缓存上限（条数、MB）
+        cls.SECTION_CACHE_MAX_ENTRIES = int(os.getenv('SECTION_CACHE_MAX_ENTRIES', '256'))
+        cls.SECTION_CACHE_MAX_MB = float(os.getenv('SECTION_CACHE_MAX_MB', '64'))
+
+        # 断点续跑日志配置（每写入多少行或间隔多少秒执行一次fsync）
+        cls.JOURNAL_FSYNC_EVERY = int(os.getenv('JOURNAL_FSYNC_EVERY', '20'))
+        cls.JOURNAL_FSYNC_INTERVAL = float(os.getenv('JOURNAL_FSYNC_INTERVAL', '2'))
+
+        # 运行指标导出（JSON和Prometheus文本格式；导出间隔秒数大于0时运行中周期性导出）
+        cls.METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+        cls.METRICS_JSON_FILE = Path(os.getenv('METRICS_JSON_FILE', str(OUTPUT_DIR / "metrics.json")))
+        cls.METRICS_PROM_FILE = Path(os.getenv('METRICS_PROM_FILE', str(OUTPUT_DIR / "metrics.prom")))
+        cls.METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '0'))
+
+        # API配置
         cls.BAIDU_API_KEY = os.getenv('BAIDU_API_KEY', 'your_api_key_here')
         cls.BAIDU_SECRET_KEY = os.getenv('BAIDU_SECRET_KEY', 'your_secret_key_here')
         cls.OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'your_api_key_here')
-        cls.OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1/')
+        cls.OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1/')  # 添加末尾的斜杠
+        cls.BAIDU_API_BASE = os.getenv('BAIDU_API_BASE', 'https://aip.baidubce.com/')
         cls.USE_BAIDU = os.getenv('USE_BAIDU', 'true').lower() == 'true'
         cls.OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4')
         cls.OPENAI_TEMPERATURE = float(os.getenv('OPENAI_TEMPERATURE', '0.7'))
         cls.OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '1500'))
 
+        # 按任务区分的生成限制（最大输出令牌数、温度、停止序列JSON数组、输入截断字符数，0表示不截断）
+        cls.TITLE_MAX_TOKENS = int(os.getenv('TITLE_MAX_TOKENS', '32'))
+        cls.TITLE_TEMPERATURE = float(os.getenv('TITLE_TEMPERATURE', '0.3'))
+        cls.TITLE_STOP = cls.stop_sequences('TITLE_STOP', '["\\n"]')
+        cls.TITLE_MAX_INPUT_CHARS = int(os.getenv('TITLE_MAX_INPUT_CHARS', '1000'))
+        cls.SOLUTION_MAX_TOKENS = int(os.getenv('SOLUTION_MAX_TOKENS', os.getenv('OPENAI_MAX_TOKENS', '1500')))
+        cls.SOLUTION_TEMPERATURE = float(os.getenv('SOLUTION_TEMPERATURE', os.getenv('OPENAI_TEMPERATURE', '0.7')))
+        cls.SOLUTION_STOP = cls.stop_sequences('SOLUTION_STOP', '[]')
+        cls.SOLUTION_MAX_INPUT_CHARS = int(os.getenv('SOLUTION_MAX_INPUT_CHARS', '4000'))
+        cls.ANSWER_MAX_TOKENS = int(os.getenv('ANSWER_MAX_TOKENS', '512'))
+        cls.ANSWER_TEMPERATURE = float(os.getenv('ANSWER_TEMPERATURE', '0.5'))
+        cls.ANSWER_STOP = cls.stop_sequences('ANSWER_STOP', '[]')
+        cls.ANSWER_MAX_INPUT_CHARS = int(os.getenv('ANSWER_MAX_INPUT_CHARS', '4000'))
+
+        # 模型上下文长度（令牌数），提示词加输出上限超出时告警
+        cls.MODEL_CONTEXT_TOKENS = int(os.getenv('MODEL_CONTEXT_TOKENS', '8000'))
+
+        # HTTP连接配置
+        cls.HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '120'))
+        cls.HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+
+        # 限流与重试配置（每分钟请求数/令牌数，0表示不限制）
+        cls.BAIDU_RPM = float(os.getenv('BAIDU_RPM', '300'))
+        cls.BAIDU_TPM = float(os.getenv('BAIDU_TPM', '300000'))
+        cls.OPENAI_RPM = float(os.getenv('OPENAI_RPM', '0'))
+        cls.OPENAI_TPM = float(os.getenv('OPENAI_TPM', '0'))
+        cls.RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '6'))
+        cls.RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+        cls.RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '60'))
+
+        # 标题批量生成配置（每次请求打包的需求条数，1表示逐条生成）
+        cls.TITLE_BATCH_SIZE = int(os.getenv('TITLE_BATCH_SIZE', '1'))
+
+        # 对冲请求（主提供商超过耗时分位数仍未应答时向另一提供商发送同一请求，先得到有效应答者胜出）
+        cls.HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'false').lower() == 'true'
+        cls.HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '0.9'))
+        cls.HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+        cls.HEDGE_INITIAL_DELAY = float(os.getenv('HEDGE_INITIAL_DELAY', '30'))
+        cls.HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '1'))
+        cls.HEDGE_MAX_DELAY = float(os.getenv('HEDGE_MAX_DELAY', '120'))
+
+        # 近似重复需求合并（C列相似度不低于阈值的需求只生成一次；reuse直接复用应答，adapt按差异改写）
+        cls.DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'false').lower() == 'true'
+        cls.DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.85'))
+        cls.DEDUP_MODE = cls.choice('DEDUP_MODE', 'reuse', ('reuse', 'adapt'))
+        cls.DEDUP_REPORT_FILE = Path(os.getenv('DEDUP_REPORT_FILE', str(OUTPUT_DIR / "dedup_clusters.json")))
+
+        # 有序流式组装（已生成但尚未写入标书的最多行数；每隔多少秒把已写入的部分保存到输出文件，0表示只在结束时保存）
+        cls.REORDER_BUFFER_SIZE = int(os.getenv('REORDER_BUFFER_SIZE', '64'))
+        cls.PARTIAL_SAVE_INTERVAL = float(os.getenv('PARTIAL_SAVE_INTERVAL', '60'))
+
+        # 并发配置（同时处理的AI请求数，1为顺序执行；ASYNC_MODE使用异步HTTP在单线程内并发）
+        cls.MAX_WORKERS = int(os.getenv('MAX_WORKERS', '1'))
+        cls.ASYNC_MODE = os.getenv('ASYNC_MODE', 'false').lower() == 'true'
+
+        # AI应答缓存配置
+        cls.LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+        cls.LLM_CACHE_FILE = Path(os.getenv('LLM_CACHE_FILE', str(DATA_DIR / "cache" / "llm_cache.sqlite3")))
+        cls.LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB', '256'))
+        cls.LLM_CACHE_MAX_AGE_DAYS = float(os.getenv('LLM_CACHE_MAX_AGE_DAYS', '90'))
+
+        # 1表示忽略缓存重新生成
+        cls.RE_GENERATE_TEXT = int(os.getenv('RE_GENERATE_TEXT', '0'))
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的令牌数：中日韩字符按1个令牌计，其余字符按4个字符1个令牌计"""
+    cjk = sum(1 for c in text if '\u2e80' <= c <= '\u9fff' or '\uf900' <= c <= '\ufaff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class Metrics:
+    """运行指标：计数器、耗时直方图和采集时读取的统计值
+
+    线程安全；运行结束时（或按间隔周期性地）导出为JSON和Prometheus文本格式，
+    后者可直接交给node_exporter的textfile采集器。
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+    def __init__(self, prefix: str = "proposalllm"):
+        self.prefix = prefix
+        self.started = time.time()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], Dict[str, Any]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._flush_stop: Optional[threading.Event] = None
+        self._flush_thread: Optional[threading.Thread] = None
+
+    def reset(self) -> None:
+        """清空所有指标"""
+        with self._lock:
+            self.started = time.time()
+            self._counters.clear()
+            self._histograms.clear()
+            self._collectors.clear()
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        """计数器加amount"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """记录一次耗时"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.BUCKETS)}
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+
+    @contextmanager
+    def timer(self, name: str, **labels: str):
+        """统计代码块耗时，写入name直方图"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def track(self, name: str, **labels: str):
+        """统计耗时（name_seconds）并按成功/失败计数（name_total）"""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            yield
+            status = "ok"
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+            self.inc(f"{name}_total", status=status, **labels)
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """注册采集函数，导出时调用并以 name{stat=...} 的形式输出"""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前所有指标的快照"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.BUCKETS, histogram["buckets"]):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                histograms.append({"name": name, "labels": dict(labels), "count": histogram["count"],
+                                   "sum": histogram["sum"], "max": histogram["max"], "buckets": buckets})
+            collectors = list(self._collectors.items())
+
+        gauges = []
+        for name, collect in collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"采集指标{name}失败: {str(e)}")
+                continue
+            gauges.extend({"name": name, "labels": {"stat": stat}, "value": value}
+                          for stat, value in sorted(values.items()))
+        return {"started_at": self.started, "uptime_seconds": time.time() - self.started,
+                "counters": counters, "histograms": histograms, "gauges": gauges}
+
+    @staticmethod
+    def _format_labels(labels: Dict[str, Any], extra: str = "") -> str:
+        parts = []
+        for key, value in labels.items():
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            parts.append(f'{key}="{value}"')
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def to_prometheus(self, snapshot: Optional[Dict[str, Any]] = None) -> str:
+        """转换为Prometheus文本格式"""
+        snapshot = snapshot or self.snapshot()
+        lines, declared = [], set()
+
+        def declare(name: str, metric_type: str) -> None:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for item in snapshot["counters"]:
+            name = f"{self.prefix}_{item['name']}"
+            declare(name, "counter")
+            lines.append(f"{name}{self._format_labels(item['labels'])} {item['value']:g}")
+        for item in snapshot["gauges"]:
+            name = f"{self.prefix}_{item['name']}"
+            declare(name, "gauge")
+            lines.append(f"{name}{self._format_labels(item['labels'])} {item['value']:g}")
+        for item in snapshot["histograms"]:
+            name = f"{self.prefix}_{item['name']}"
+            declare(name, "histogram")
+            labels = self._format_labels(item["labels"])
+            buckets = list(item["buckets"].items()) + [("+Inf", item["count"])]
+            for bound, count in buckets:
+                bucket_labels = self._format_labels(item["labels"], 'le="%s"' % bound)
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{labels} {item['sum']:.6f}")
+            lines.append(f"{name}_count{labels} {item['count']}")
+        name = f"{self.prefix}_uptime_seconds"
+        declare(name, "gauge")
+        lines.append(f"{name} {snapshot['uptime_seconds']:.3f}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write_atomic(path: Path, content: str) -> None:
+        """先写临时文件再替换，避免采集器读到半个文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def write(self, json_path: Optional[Path], prom_path: Optional[Path]) -> None:
+        """导出为JSON和Prometheus文本文件，路径为空时跳过对应格式"""
+        snapshot = self.snapshot()
+        if json_path:
+            self._write_atomic(json_path, json.dumps(snapshot, ensure_ascii=False, indent=2))
+        if prom_path:
+            self._write_atomic(prom_path, self.to_prometheus(snapshot))
+
+    def start_periodic_flush(self, json_path: Optional[Path], prom_path: Optional[Path],
+                             interval: float) -> None:
+        """启动后台线程，每隔interval秒导出一次"""
+        if interval <= 0 or self._flush_thread is not None:
+            return
+        stop = threading.Event()
+
+        def flush_loop() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.write(json_path, prom_path)
+                except Exception as e:
+                    print(f"导出运行指标失败: {str(e)}")
+
+        self._flush_stop = stop
+        self._flush_thread = threading.Thread(target=flush_loop, name="metrics-flush", daemon=True)
+        self._flush_thread.start()
+
+    def stop_periodic_flush(self) -> None:
+        """停止周期导出线程"""
+        if self._flush_thread is not None:
+            self._flush_stop.set()
+            self._flush_thread.join()
+            self._flush_thread = self._flush_stop = None
+
+
+# 全局运行指标
+metrics = Metrics()
+
+
+class RetryableAPIError(Exception):
+    """可重试的API错误（限流、超时或服务端错误）"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头，支持秒数和HTTP日期两种格式，无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def response_json(response) -> Dict[str, Any]:
+    """解析HTTP响应的JSON内容；5xx返回非JSON内容时转换为RetryableAPIError，其余情况给出明确错误"""
+    try:
+        return response.json()
+    except ValueError as e:
+        message = f"HTTP {response.status_code} 返回内容不是JSON: {response.text[:200]}"
+        if response.status_code >= 500:
+            raise RetryableAPIError(message) from e
+        raise Exception(f"API调用失败: {message}") from e
+
+
+class RequestCancelled(Exception):
+    """请求已被取消（对冲调用中落败的一方）"""
+
+
+# 由对冲调用发起的同步请求在此登记取消事件，落败后不再重试
+request_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("request_cancel_event", default=None)
+
+
+class TokenBucket:
+    """线程安全的令牌桶
+
+    预约制实现：每次预约立即扣减令牌（允许透支），并返回调用方需要等待的秒数，
+    因此并发调用方按预约顺序排队，不会同时涌入。
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """预约令牌
+
+        Returns:
+            需要等待的秒数
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """按实际用量返还（正数）或追加扣减（负数）令牌"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """按提供商区分的限流器，同时限制每分钟请求数和令牌数"""
+
+    _registry: Dict[str, "RateLimiter"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute, burst=tokens_per_minute / 60.0) \
+            if tokens_per_minute > 0 else None
+
+    @classmethod
+    def for_provider(cls, provider: str) -> "RateLimiter":
+        """获取（必要时创建）指定提供商的共享限流器"""
+        with cls._registry_lock:
+            if provider not in cls._registry:
+                prefix = provider.upper()
+                cls._registry[provider] = cls(getattr(Config, f"{prefix}_RPM", 0),
+                                              getattr(Config, f"{prefix}_TPM", 0))
+            return cls._registry[provider]
+
+    @classmethod
+    def reset(cls) -> None:
+        """丢弃已创建的限流器，下次使用时按最新配置重建"""
+        with cls._registry_lock:
+            cls._registry.clear()
+
+    @classmethod
+    def install(cls, provider: str, limiter: "RateLimiter") -> None:
+        """指定提供商使用的限流器（批量模式下替换为跨进程共享的限流器）"""
+        with cls._registry_lock:
+            cls._registry[provider] = limiter
+
+    def reserve(self, tokens: int) -> float:
+        """预约一次请求及其令牌，返回需要等待的秒数"""
+        wait = 0.0
+        if self.request_bucket:
+            wait = self.request_bucket.reserve(1)
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int) -> None:
+        """阻塞直到允许发出请求"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        """异步等待直到允许发出请求"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, reserved: int, actual: Optional[int]) -> None:
+        """用实际令牌用量校正预约量"""
+        if self.token_bucket and actual is not None:
+            self.token_bucket.adjust(reserved - actual)
+
+
+class RetryPolicy:
+    """带随机抖动的指数退避重试策略"""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls) -> "RetryPolicy":
+        """根据当前配置创建重试策略"""
+        return cls(Config.RETRY_MAX_ATTEMPTS, Config.RETRY_BASE_DELAY, Config.RETRY_MAX_DELAY)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """计算第attempt次失败后的等待秒数（full jitter）"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return max(backoff, retry_after or 0.0)
+
+    def run(self, func: Callable[[], Any], description: str = "API调用") -> Any:
+        """执行func，遇到RetryableAPIError时退避后重试；请求被取消时不再重试"""
+        cancel_event = request_cancel_event.get()
+        for attempt in range(self.max_attempts):
+            if cancel_event is not None and cancel_event.is_set():
+                raise RequestCancelled(f"{description}已取消")
+            try:
+                return func()
+            except RetryableAPIError as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                wait = self.delay(attempt, e.retry_after)
+                print(f"{description}受限或暂时失败（{e}），{wait:.1f}秒后第{attempt + 1}次重试")
+                if cancel_event is None:
+                    time.sleep(wait)
+                elif cancel_event.wait(wait):
+                    raise RequestCancelled(f"{description}已取消")
+
+    async def arun(self, func: Callable[[], Any], description: str = "API调用") -> Any:
+        """异步版本的run，func返回协程"""
+        for attempt in range(self.max_attempts):
+            try:
+                return await func()
+            except RetryableAPIError as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                wait = self.delay(attempt, e.retry_after)
+                print(f"{description}受限或暂时失败（{e}），{wait:.1f}秒后第{attempt + 1}次重试")
+                await asyncio.sleep(wait)
+
+
+class AsyncHTTPClient:
+    """两个AI提供商共享的异步HTTP连接池
+
+    httpx.AsyncClient绑定创建它的事件循环，因此按事件循环各保留一个客户端。
+    安装了h2时启用HTTP/2，多个请求复用同一连接。
+    """
+
+    _clients: Dict[int, "httpx.AsyncClient"] = {}
+
+    @staticmethod
+    def http2_available() -> bool:
+        """是否安装了HTTP/2支持"""
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    @classmethod
+    def get_client(cls) -> "httpx.AsyncClient":
+        """获取当前事件循环的共享客户端"""
+        import httpx
+
+        loop_id = id(asyncio.get_running_loop())
+        client = cls._clients.get(loop_id)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=cls.http2_available(),
+                timeout=Config.HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=Config.HTTP_POOL_SIZE,
+                                    max_keepalive_connections=Config.HTTP_POOL_SIZE),
+            )
+            cls._clients[loop_id] = client
+        return client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """关闭当前事件循环的共享客户端"""
+        client = cls._clients.pop(id(asyncio.get_running_loop()), None)
+        if client is not None:
+            await client.aclose()
+
+    @staticmethod
+    async def post_json(url: str, **kwargs) -> "httpx.Response":
+        """发送POST请求，网络错误和5xx转换为RetryableAPIError"""
+        import httpx
+
+        try:
+            response = await AsyncHTTPClient.get_client().post(url, **kwargs)
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            raise RetryableAPIError(f"网络错误: {e}") from e
+        if response.status_code == 429:
+            raise RetryableAPIError("HTTP 429", parse_retry_after(response.headers.get('retry-after')))
+        if response.status_code >= 500:
+            raise RetryableAPIError(f"HTTP {response.status_code}")
+        return response
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """单类生成任务的输出限制：最大输出令牌数、温度、停止序列和输入截断长度"""
+    name: str
+    max_tokens: int
+    temperature: float
+    stop: Tuple[str, ...] = ()
+    max_input_chars: int = 0
+
+    # 批量标题每条额外预留的令牌数（JSON结构开销）
+    BATCH_ITEM_OVERHEAD = 12
+
+    @classmethod
+    def for_task(cls, task: str) -> "GenerationProfile":
+        """按任务名（title/solution/answer）读取当前配置"""
+        prefix = task.upper()
+        return cls(task, getattr(Config, f"{prefix}_MAX_TOKENS"), getattr(Config, f"{prefix}_TEMPERATURE"),
+                   tuple(getattr(Config, f"{prefix}_STOP")), getattr(Config, f"{prefix}_MAX_INPUT_CHARS"))
+
+    @classmethod
+    def default(cls) -> "GenerationProfile":
+        """未指定任务时沿用全局的OPENAI_MAX_TOKENS和OPENAI_TEMPERATURE"""
+        return cls("default", Config.OPENAI_MAX_TOKENS, Config.OPENAI_TEMPERATURE)
+
+    def for_batch(self, count: int) -> "GenerationProfile":
+        """批量请求的限制：输出上限按条数放大，去掉会截断JSON的停止序列"""
+        return replace(self, name=f"{self.name}_batch", stop=(),
+                       max_tokens=(self.max_tokens + self.BATCH_ITEM_OVERHEAD) * count)
+
+    def cache_identity(self) -> Tuple:
+        """参与缓存键的字段"""
+        return self.max_tokens, self.temperature, list(self.stop), self.max_input_chars
+
+    def truncate(self, text: Any) -> str:
+        """按输入截断长度截断需求文本"""
+        text = str(text)
+        if self.max_input_chars and len(text) > self.max_input_chars:
+            return text[:self.max_input_chars] + "…"
+        return text
+
+    def budget(self, prompt: str) -> int:
+        """估算一次请求占用的上下文令牌数（提示词加输出上限）"""
+        return estimate_tokens(prompt) + self.max_tokens
+
+
+class BaiduTokenManager:
+    """百度访问令牌管理类
+
+    缓存访问令牌直到过期前的安全余量，令牌失效时由并发调用方中的一个负责刷新，
+    其余调用方等待并复用刷新结果。
+    """
+
+    # 在令牌过期前提前刷新的秒数
+    REFRESH_MARGIN = 300
+
+    def __init__(self, fetcher: Callable[[], Tuple[str, int]]):
+        self._fetcher = fetcher
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+
+    def _is_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at
+
+    def get_token(self) -> str:
+        """获取有效的访问令牌，必要时刷新"""
+        if self._is_valid():
+            return self._token
+
+        with self._lock:
+            # 等待锁期间可能已有其他线程完成刷新
+            if self._is_valid():
+                return self._token
+
+            token, expires_in = self._fetcher()
+            margin = min(self.REFRESH_MARGIN, expires_in / 2)
+            self._token = token
+            self._expires_at = time.monotonic() + expires_in - margin
+            return token
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """使缓存的令牌失效
+
+        Args:
+            token: 仅当缓存令牌与之相同时才失效，避免覆盖其他线程刚刷新的令牌
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
 
 class BaiduAPI:
     """百度API调用类"""
 
+    # 相对于Config.BAIDU_API_BASE的接口路径
+    TOKEN_PATH = "oauth/2.0/token"
+    CHAT_PATH = "rpc/2.0/ai_custom/v1/wenxinworkshop/chat/ernie_speed"
+
+    # 访问令牌无效或过期的错误码
+    TOKEN_ERROR_CODES = {110, 111}
+
+    # 可重试的错误码：服务暂不可用、集群超限、QPS超限、内部错误、RPM/TPM超限
+    RETRYABLE_ERROR_CODES = {2, 4, 18, 336100, 336501, 336502}
+
+    # 令牌默认有效期（秒），接口未返回expires_in时使用
+    DEFAULT_TOKEN_TTL = 2592000
+
+    _session: Optional["requests.Session"] = None
+    _session_lock = threading.Lock()
+
+    token_manager = BaiduTokenManager(lambda: BaiduAPI.fetch_access_token())
+
     @staticmethod
-    def get_access_token() -> str:
-        """获取百度API访问令牌"""
-        url = "https://aip.baidubce.com/oauth/2.0/token"
+    def cache_identity() -> Tuple[str, str, Optional[float]]:
+        """返回用于缓存键的（提供商, 模型, 温度）"""
+        return "baidu", "ernie_speed", None
+
+    @classmethod
+    def get_token_url(cls) -> str:
+        """OAuth令牌接口地址"""
+        return f"{Config.BAIDU_API_BASE.rstrip('/')}/{cls.TOKEN_PATH}"
+
+    @classmethod
+    def get_chat_url(cls) -> str:
+        """对话接口地址"""
+        return f"{Config.BAIDU_API_BASE.rstrip('/')}/{cls.CHAT_PATH}"
+
+    @classmethod
+    def get_session(cls) -> "requests.Session":
+        """获取共享的长连接会话"""
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    import requests
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=2, pool_maxsize=Config.HTTP_POOL_SIZE)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    cls._session = session
+        return cls._session
+
+    @classmethod
+    def fetch_access_token(cls) -> Tuple[str, int]:
+        """向百度OAuth接口请求新的访问令牌
+
+        Returns:
+            (访问令牌, 有效期秒数)
+        """
         params = {
             "grant_type": "client_credentials",
             "client_id": Config.BAIDU_API_KEY,
@@ -110,29 +856,114 @@ class BaiduAPI:
         }
 
         try:
-            resp = requests.post(url, params=params).json()
+            resp = response_json(cls.get_session().post(cls.get_token_url(), params=params,
+                                                        timeout=Config.HTTP_TIMEOUT))
             if 'error' in resp:
                 raise Exception(f"获取token失败: {resp.get('error_description', '未知错误')}")
-            return str(resp.get("access_token"))
+            return str(resp.get("access_token")), int(resp.get("expires_in", cls.DEFAULT_TOKEN_TTL))
         except Exception as e:
             print(f"获取百度API token失败: {str(e)}")
             raise
 
     @classmethod
-    def call_api(cls, prompt: str) -> str:
-        """调用百度API"""
-        url = f"https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/ernie_speed?access_token={cls.get_access_token()}"
+    def get_access_token(cls) -> str:
+        """获取百度API访问令牌（带缓存）"""
+        return cls.token_manager.get_token()
 
-        payload = {
+    @staticmethod
+    def build_payload(prompt: str, profile: Optional[GenerationProfile]) -> Dict[str, Any]:
+        """构造对话请求体，未指定任务时只发送消息"""
+        payload: Dict[str, Any] = {
             "messages": [{"role": "user", "content": prompt}]
         }
+        if profile is not None:
+            # 千帆接口的温度范围为(0, 1]，输出上限范围为[2, 2048]，停止序列最多4个
+            payload["temperature"] = min(1.0, max(0.01, profile.temperature))
+            payload["max_output_tokens"] = min(2048, max(2, profile.max_tokens))
+            if profile.stop:
+                payload["stop"] = list(profile.stop[:4])
+        return payload
+
+    @classmethod
+    def _request(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """发送一次对话请求，限流和服务端错误转换为RetryableAPIError"""
+        import requests
+        payload = cls.build_payload(prompt, profile)
+        limiter = RateLimiter.for_provider("baidu")
+        reserved = (profile or GenerationProfile.default()).budget(prompt)
+
+        for attempt in range(2):
+            limiter.acquire(reserved)
+            access_token = cls.get_access_token()
+            try:
+                response = cls.get_session().post(
+                    cls.get_chat_url(),
+                    params={"access_token": access_token},
+                    json=payload,
+                    timeout=Config.HTTP_TIMEOUT
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise RetryableAPIError(f"网络错误: {e}") from e
+            if response.status_code == 429:
+                raise RetryableAPIError("HTTP 429", parse_retry_after(response.headers.get('retry-after')))
+            if response.status_code >= 500:
+                raise RetryableAPIError(f"HTTP {response.status_code}")
+
+            data = response_json(response)
+            result = cls._parse_response(data, access_token, attempt)
+            if result is not None:
+                limiter.record_usage(reserved, data.get('usage', {}).get('total_tokens'))
+                return result
+        raise Exception("API调用失败: 访问令牌无效")
+
+    @classmethod
+    def _parse_response(cls, data: Dict, access_token: str, attempt: int) -> Optional[str]:
+        """解析对话接口返回，令牌失效且可重试时返回None"""
+        error_code = data.get('error_code')
+        # 令牌被提前吊销或过期时刷新一次后重试
+        if error_code in cls.TOKEN_ERROR_CODES and attempt == 0:
+            cls.token_manager.invalidate(access_token)
+            return None
+        if error_code in cls.RETRYABLE_ERROR_CODES:
+            raise RetryableAPIError(f"错误码{error_code}: {data.get('error_msg', '未知错误')}")
+        if 'error_code' in data:
+            raise Exception(f"API调用失败: {data.get('error_msg', '未知错误')}")
+        return data['result']
 
+    @classmethod
+    def call_api(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """调用百度API"""
         try:
-            response = requests.post(url, json=payload)
-            data = response.json()
-            if 'error_code' in data:
-                raise Exception(f"API调用失败: {data.get('error_msg', '未知错误')}")
-            return data['result']
+            return RetryPolicy.from_config().run(lambda: cls._request(prompt, profile), "百度API调用")
+        except Exception as e:
+            print(f"调用百度API失败: {str(e)}")
+            raise
+
+    @classmethod
+    async def _arequest(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """通过共享异步连接池发送一次对话请求"""
+        payload = cls.build_payload(prompt, profile)
+        limiter = RateLimiter.for_provider("baidu")
+        reserved = (profile or GenerationProfile.default()).budget(prompt)
+
+        for attempt in range(2):
+            await limiter.aacquire(reserved)
+            # 令牌通常已缓存，仅在刷新时才会阻塞工作线程
+            access_token = await asyncio.to_thread(cls.get_access_token)
+            response = await AsyncHTTPClient.post_json(
+                cls.get_chat_url(), params={"access_token": access_token}, json=payload)
+            data = response_json(response)
+            result = cls._parse_response(data, access_token, attempt)
+            if result is not None:
+                limiter.record_usage(reserved, data.get('usage', {}).get('total_tokens'))
+                return result
+        raise Exception("API调用失败: 访问令牌无效")
+
+    @classmethod
+    async def acall_api(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """异步调用百度API"""
+        try:
+            return await RetryPolicy.from_config().arun(lambda: cls._arequest(prompt, profile), "百度API调用")
         except Exception as e:
             print(f"调用百度API失败: {str(e)}")
             raise
@@ -146,56 +977,632 @@ class OpenAIAPI:
         """初始化OpenAI配置"""
         if not Config.OPENAI_API_KEY:
             raise ValueError("OpenAI API密钥未配置")
+        import openai
         openai.api_key = Config.OPENAI_API_KEY
         openai.api_base = Config.OPENAI_API_BASE
 
+    @staticmethod
+    def cache_identity() -> Tuple[str, str, Optional[float]]:
+        """返回用于缓存键的（提供商, 模型, 温度）"""
+        return "openai", Config.OPENAI_MODEL, Config.OPENAI_TEMPERATURE
+
+    _client = None
+    _client_key: Optional[Tuple[str, str, float]] = None
+    _client_lock = threading.Lock()
+
+    @staticmethod
+    def get_base_url() -> str:
+        """返回以斜杠结尾的API基础URL"""
+        base_url = Config.OPENAI_API_BASE
+        if not base_url.endswith('/'):
+            base_url += '/'
+        return base_url
+
     @classmethod
-    def call_api(cls, prompt: str) -> str:
-        """调用OpenAI API"""
+    def get_client(cls) -> "openai.OpenAI":
+        """获取共享的OpenAI客户端，配置变化时重建"""
+        key = (Config.OPENAI_API_KEY, cls.get_base_url(), Config.HTTP_TIMEOUT)
+        with cls._client_lock:
+            if cls._client is None or cls._client_key != key:
+                cls.initialize()
+                import openai
+                # 重试由RetryPolicy统一负责，关闭SDK自带的重试
+                cls._client = openai.OpenAI(
+                    api_key=Config.OPENAI_API_KEY,
+                    base_url=key[1],
+                    timeout=Config.HTTP_TIMEOUT,
+                    max_retries=0
+                )
+                cls._client_key = key
+            return cls._client
+
+    @classmethod
+    def reset_client(cls) -> None:
+        """丢弃共享客户端"""
+        with cls._client_lock:
+            cls._client = None
+            cls._client_key = None
+
+    @staticmethod
+    def build_options(profile: GenerationProfile) -> Dict[str, Any]:
+        """按任务限制构造请求参数，停止序列最多4个"""
+        options: Dict[str, Any] = {"temperature": profile.temperature, "max_tokens": profile.max_tokens}
+        if profile.stop:
+            options["stop"] = list(profile.stop[:4])
+        return options
+
+    @classmethod
+    def _request(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """发送一次对话请求，限流和服务端错误转换为RetryableAPIError"""
+        import openai
+        profile = profile or GenerationProfile.default()
+        client = cls.get_client()
+        limiter = RateLimiter.for_provider("openai")
+        reserved = profile.budget(prompt)
+        limiter.acquire(reserved)
         try:
-            cls.initialize()
-            # 检查API基础URL是否以斜杠结尾
-            base_url = Config.OPENAI_API_BASE
-            if not base_url.endswith('/'):
-                base_url += '/'
-                
-            client = openai.OpenAI(
-                api_key=Config.OPENAI_API_KEY,
-                base_url=base_url
-            )
             response = client.chat.completions.create(
                 model=Config.OPENAI_MODEL,
                 messages=[{"role": "user", "content": prompt}],
-                temperature=Config.OPENAI_TEMPERATURE,
-                max_tokens=Config.OPENAI_MAX_TOKENS
+                **cls.build_options(profile)
             )
-            return response.choices[0].message.content.strip()
+        except openai.RateLimitError as e:
+            retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+            raise RetryableAPIError(f"HTTP 429: {e}", parse_retry_after(retry_after)) from e
+        except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+            raise RetryableAPIError(str(e)) from e
+
+        usage = getattr(response, 'usage', None)
+        limiter.record_usage(reserved, getattr(usage, 'total_tokens', None))
+        return response.choices[0].message.content.strip()
+
+    @classmethod
+    def call_api(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """调用OpenAI API"""
+        try:
+            return RetryPolicy.from_config().run(lambda: cls._request(prompt, profile), "OpenAI API调用")
         except Exception as e:
             print(f"调用OpenAI API失败: {str(e)}")
             raise
 
+    @classmethod
+    async def _arequest(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """通过共享异步连接池发送一次chat/completions请求"""
+        if not Config.OPENAI_API_KEY:
+            raise ValueError("OpenAI API密钥未配置")
+        profile = profile or GenerationProfile.default()
+        limiter = RateLimiter.for_provider("openai")
+        reserved = profile.budget(prompt)
+        await limiter.aacquire(reserved)
+
+        response = await AsyncHTTPClient.post_json(
+            f"{cls.get_base_url()}chat/completions",
+            headers={"Authorization": f"Bearer {Config.OPENAI_API_KEY}"},
+            json={
+                "model": Config.OPENAI_MODEL,
+                "messages": [{"role": "user", "content": prompt}],
+                **cls.build_options(profile)
+            })
+        data = response_json(response)
+        if response.status_code >= 400 or 'error' in data:
+            error = data.get('error') or {}
+            raise Exception(f"API调用失败: HTTP {response.status_code} {error.get('message', '未知错误')}")
+
+        limiter.record_usage(reserved, data.get('usage', {}).get('total_tokens'))
+        return data['choices'][0]['message']['content'].strip()
+
+    @classmethod
+    async def acall_api(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """异步调用OpenAI API"""
+        try:
+            return await RetryPolicy.from_config().arun(lambda: cls._arequest(prompt, profile), "OpenAI API调用")
+        except Exception as e:
+            print(f"调用OpenAI API失败: {str(e)}")
+            raise
+
+
+class LatencyTracker:
+    """按任务记录主提供商最近的应答耗时，给出对冲前的等待时间"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        """记录一次耗时"""
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def deadline(self, key: str) -> float:
+        """样本不足时使用初始等待时间，否则取配置的分位数并限制在上下限之间"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < max(1, Config.HEDGE_MIN_SAMPLES):
+            return Config.HEDGE_INITIAL_DELAY
+        index = min(len(samples) - 1, max(0, int(Config.HEDGE_PERCENTILE * len(samples) + 0.5) - 1))
+        return min(max(samples[index], Config.HEDGE_MIN_DELAY), Config.HEDGE_MAX_DELAY)
+
+
+class HedgedProvider:
+    """对冲调用类
+
+    先向主提供商（USE_BAIDU决定）发送请求，超过该任务近期耗时的分位数仍未应答，
+    或主提供商调用失败时，向另一提供商发送同一请求，先返回非空应答者胜出，另一方被取消。
+    异步调用直接取消任务；同步调用无法中断已发出的HTTP请求，只能丢弃其结果并停止重试。
+    """
+
+    latency = LatencyTracker()
+    _stats: Dict[str, int] = {}
+    _stats_lock = threading.Lock()
+
+    @staticmethod
+    def providers() -> Tuple[Tuple[str, type], Tuple[str, type]]:
+        """返回（主提供商, 备用提供商），元素为（名称, 调用类）"""
+        baidu, openai_api = ("baidu", BaiduAPI), ("openai", OpenAIAPI)
+        return (baidu, openai_api) if Config.USE_BAIDU else (openai_api, baidu)
+
+    @classmethod
+    def cache_identity(cls) -> Tuple:
+        """应答可能来自任一提供商，缓存键包含两者"""
+        (_, primary), (_, secondary) = cls.providers()
+        return ("hedged",) + tuple(primary.cache_identity()) + tuple(secondary.cache_identity())
+
+    @classmethod
+    def reset(cls) -> None:
+        """清空统计（保留耗时样本）"""
+        with cls._stats_lock:
+            cls._stats = {}
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """请求数、触发对冲次数和各提供商胜出次数"""
+        with cls._stats_lock:
+            return dict(cls._stats)
+
+    @staticmethod
+    def _valid(result: Any) -> bool:
+        return isinstance(result, str) and bool(result.strip())
+
+    @classmethod
+    def _finish(cls, task: str, winner: str, hedged: bool) -> None:
+        """记录一次对冲调用的结果"""
+        with cls._stats_lock:
+            for name in ("requests", f"wins_{winner}") + (("hedged",) if hedged else ()):
+                cls._stats[name] = cls._stats.get(name, 0) + 1
+        metrics.inc("hedge_requests_total", task=task, hedged=str(hedged).lower())
+        metrics.inc("hedge_wins_total", task=task, provider=winner)
+
+    @classmethod
+    def _settle(cls, task: str, name: str, primary_name: str, started: float, outcome: str) -> None:
+        """记录一方的耗时；主提供商被取消时的耗时作为下限计入样本"""
+        elapsed = time.perf_counter() - started
+        metrics.observe("hedge_provider_seconds", elapsed, provider=name, outcome=outcome)
+        if name == primary_name and outcome != "error":
+            cls.latency.record(task, elapsed)
+
+    @staticmethod
+    def _start(provider, prompt: str, profile: Optional[GenerationProfile]) -> Tuple[Future, threading.Event]:
+        """在后台线程中调用提供商，返回结果Future和取消事件"""
+        future: Future = Future()
+        cancel_event = threading.Event()
+
+        def run() -> None:
+            request_cancel_event.set(cancel_event)
+            try:
+                future.set_result(provider.call_api(prompt, profile))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future, cancel_event
+
+    @classmethod
+    def call_api(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """对冲调用，返回先得到的有效应答"""
+        task = profile.name if profile else "default"
+        (primary_name, primary), (secondary_name, secondary) = cls.providers()
+        deadline = cls.latency.deadline(task)
+        future, cancel_event = cls._start(primary, prompt, profile)
+        running = {future: (primary_name, cancel_event, time.perf_counter())}
+        wait([future], timeout=deadline)
+
+        errors: List[BaseException] = []
+        hedged = False
+        while True:
+            for finished in [item for item in running if item.done()]:
+                name, _, started = running.pop(finished)
+                error = finished.exception()
+                if error is None and cls._valid(finished.result()):
+                    for other_name, other_cancel, other_started in running.values():
+                        other_cancel.set()
+                        cls._settle(task, other_name, primary_name, other_started, "cancelled")
+                    cls._settle(task, name, primary_name, started, "win")
+                    cls._finish(task, name, hedged)
+                    return finished.result()
+                errors.append(error or Exception(f"{name}返回空应答"))
+                cls._settle(task, name, primary_name, started, "error")
+            if not hedged:
+                hedged = True
+                print(f"{primary_name}{'调用失败' if errors else f'超过{deadline:.1f}秒未应答'}，"
+                      f"向{secondary_name}发送对冲请求")
+                future, cancel_event = cls._start(secondary, prompt, profile)
+                running[future] = (secondary_name, cancel_event, time.perf_counter())
+            if not running:
+                raise errors[0]
+            wait(list(running), return_when=FIRST_COMPLETED)
+
+    @classmethod
+    async def acall_api(cls, prompt: str, profile: Optional[GenerationProfile] = None) -> str:
+        """异步对冲调用，落败的请求直接取消"""
+        task = profile.name if profile else "default"
+        (primary_name, primary), (secondary_name, secondary) = cls.providers()
+        deadline = cls.latency.deadline(task)
+        primary_task = asyncio.ensure_future(primary.acall_api(prompt, profile))
+        running = {primary_task: (primary_name, time.perf_counter())}
+        await asyncio.wait([primary_task], timeout=deadline)
+
+        errors: List[BaseException] = []
+        hedged = False
+        try:
+            while True:
+                for done_task in [item for item in running if item.done()]:
+                    name, started = running.pop(done_task)
+                    error = done_task.exception()
+                    if error is None and cls._valid(done_task.result()):
+                        for other_task, (other_name, other_started) in running.items():
+                            other_task.cancel()
+                            cls._settle(task, other_name, primary_name, other_started, "cancelled")
+                        running.clear()
+                        cls._settle(task, name, primary_name, started, "win")
+                        cls._finish(task, name, hedged)
+                        return done_task.result()
+                    errors.append(error or Exception(f"{name}返回空应答"))
+                    cls._settle(task, name, primary_name, started, "error")
+                if not hedged:
+                    hedged = True
+                    print(f"{primary_name}{'调用失败' if errors else f'超过{deadline:.1f}秒未应答'}，"
+                          f"向{secondary_name}发送对冲请求")
+                    running[asyncio.ensure_future(secondary.acall_api(prompt, profile))] = (
+                        secondary_name, time.perf_counter())
+                if not running:
+                    raise errors[0]
+                await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # 外部取消（如整批失败）时不遗留请求
+            for pending_task in running:
+                pending_task.cancel()
+
+
+class ResponseCache:
+    """AI应答持久化缓存类
+
+    以（提供商, 模型, 温度, 提示词模板, 输入文本）的哈希为键，将应答保存在SQLite中，
+    按条目年龄和总大小淘汰旧数据。启动、关闭时淘汰一次；运行中每写入EVICT_INTERVAL条，
+    或写入量达到大小上限的10%时也淘汰一次，使文件大小在长时间运行中不超出上限太多。
+    """
+
+    EVICT_INTERVAL = 100  # 运行中每写入多少条检查一次大小
+
+    def __init__(self, db_path: Path, max_mb: float = 256, max_age_days: float = 90):
+        self.db_path = Path(db_path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        # 上次淘汰后写入的条数和字节数
+        self._pending_writes = 0
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(identity: Tuple, template: str, text: Any) -> str:
+        """生成内容寻址的缓存键"""
+        material = json.dumps([list(identity), template, str(text)], ensure_ascii=False)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """写入缓存，写入量达到阈值时淘汰旧数据"""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now))
+            self._conn.commit()
+            self.writes += 1
+            self._pending_writes += 1
+            self._pending_bytes += size
+            due = (self._pending_writes >= self.EVICT_INTERVAL
+                   or self._pending_bytes >= self.max_bytes * 0.1)
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """淘汰过期条目，并在超出大小上限时按最近访问时间删除最旧的条目
+
+        Returns:
+            删除的条目数
+        """
+        with self._lock:
+            self._pending_writes = 0
+            self._pending_bytes = 0
+            removed = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)).rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # 删除到上限的90%，避免每次写入后都触发淘汰
+                excess = total - int(self.max_bytes * 0.9)
+                stale_keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    stale_keys.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+                removed += len(stale_keys)
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中统计"""
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+    def close(self) -> None:
+        """淘汰旧数据并关闭数据库"""
+        self.evict()
+        with self._lock:
+            self._conn.close()
+
 
 class AIService:
     """AI服务类，处理所有AI相关的操作"""
 
+    # 应答缓存，由main()按配置打开
+    cache: Optional[ResponseCache] = None
+
     @staticmethod
     def get_ai_provider():
-        """获取AI提供商"""
+        """获取AI提供商，开启对冲时返回对冲调用类"""
+        if Config.HEDGE_ENABLED:
+            return HedgedProvider
         return BaiduAPI if Config.USE_BAIDU else OpenAIAPI
 
+    @staticmethod
+    def get_provider_name() -> str:
+        """当前AI提供商名称，用作指标标签"""
+        if Config.HEDGE_ENABLED:
+            return "hedged"
+        return "baidu" if Config.USE_BAIDU else "openai"
+
+    @staticmethod
+    def check_prompt_size(prompt: str, profile: GenerationProfile, label: str = "") -> bool:
+        """估算提示词加输出上限是否超出模型上下文，超出时告警并返回False"""
+        budget = profile.budget(prompt)
+        if budget > Config.MODEL_CONTEXT_TOKENS:
+            print(f"警告: {label or profile.name}提示词约{budget - profile.max_tokens}令牌，"
+                  f"加上输出上限{profile.max_tokens}超出模型上下文{Config.MODEL_CONTEXT_TOKENS}令牌")
+            return False
+        return True
+
     @classmethod
-    def generate_solution(cls, content: str) -> str:
-        """生成解决方案"""
+    def warn_oversized_requirements(cls, requirements: List[Tuple[int, Any]]) -> List[int]:
+        """生成前检查C列需求，返回提示词可能超出模型上下文的行号
+
+        Args:
+            requirements: （行号, C列内容）列表
+        """
+        profiles = [(GenerationProfile.for_task("title"), Config.PROMPT_TITLE),
+                    (GenerationProfile.for_task("solution"), Config.PROMPT_CONTENT)]
+        oversized = []
+        for index, text in requirements:
+            if text is None:
+                continue
+            for profile, template in profiles:
+                prompt = f"{template} {profile.truncate(text)}"
+                if not cls.check_prompt_size(prompt, profile, f"第{index}行{profile.name}"):
+                    oversized.append(index)
+                    break
+        return oversized
+
+    @classmethod
+    def _call_provider(cls, ai_provider, prompt: str, operation: str,
+                       profile: Optional[GenerationProfile] = None) -> str:
+        """调用提供商并记录耗时和成败"""
+        with metrics.track("llm_call", provider=cls.get_provider_name(), operation=operation):
+            return ai_provider.call_api(prompt, profile)
+
+    @classmethod
+    async def _acall_provider(cls, ai_provider, prompt: str, operation: str,
+                              profile: Optional[GenerationProfile] = None) -> str:
+        """_call_provider的异步版本"""
+        with metrics.track("llm_call", provider=cls.get_provider_name(), operation=operation):
+            return await ai_provider.acall_api(prompt, profile)
+
+    @classmethod
+    def _cache_key(cls, ai_provider, template: str, text: Any,
+                   profile: Optional[GenerationProfile] = None) -> Optional[str]:
+        """生成缓存键，未启用缓存时返回None；生成限制不同的请求互不复用"""
+        if cls.cache is None:
+            return None
+        identity = tuple(ai_provider.cache_identity())
+        if profile is not None:
+            identity += profile.cache_identity()
+        return ResponseCache.make_key(identity, template, text)
+
+    @classmethod
+    def _cache_get(cls, key: Optional[str]) -> Optional[str]:
+        """读取缓存，重新生成模式下始终未命中"""
+        if key is None or Config.RE_GENERATE_TEXT:
+            return None
+        return cls.cache.get(key)
+
+    @classmethod
+    def _cache_put(cls, key: Optional[str], result: str) -> None:
+        """写入缓存"""
+        if key is not None:
+            cls.cache.put(key, result)
+
+    @classmethod
+    def call_with_cache(cls, template: str, text: Any, prompt: str, operation: str = "call",
+                        profile: Optional[GenerationProfile] = None) -> str:
+        """调用AI提供商，命中缓存时直接返回已保存的应答
+
+        Args:
+            template: 提示词模板
+            text: 输入文本
+            prompt: 完整提示词
+            operation: 操作名称，用作指标标签
+            profile: 生成限制，为空时沿用全局配置
+        """
         ai_provider = cls.get_ai_provider()
-        prompt = f"{Config.PROMPT_CONTENT} {content}"
-        return ai_provider.call_api(prompt)
+        key = cls._cache_key(ai_provider, template, text, profile)
+        cached = cls._cache_get(key)
+        if cached is not None:
+            return cached
+
+        cls.check_prompt_size(prompt, profile or GenerationProfile.default(), operation)
+        result = cls._call_provider(ai_provider, prompt, operation, profile)
+        cls._cache_put(key, result)
+        return result
 
     @classmethod
-    def shorten_text(cls, text: str) -> str:
-        """将文本缩减为标题"""
+    async def acall_with_cache(cls, template: str, text: Any, prompt: str, operation: str = "call",
+                               profile: Optional[GenerationProfile] = None) -> str:
+        """call_with_cache的异步版本"""
         ai_provider = cls.get_ai_provider()
-        prompt = f"{Config.PROMPT_TITLE}'{text}'"
-        result = ai_provider.call_api(prompt)
+        key = cls._cache_key(ai_provider, template, text, profile)
+        cached = cls._cache_get(key)
+        if cached is not None:
+            return cached
+
+        cls.check_prompt_size(prompt, profile or GenerationProfile.default(), operation)
+        result = await cls._acall_provider(ai_provider, prompt, operation, profile)
+        cls._cache_put(key, result)
+        return result
+
+    @staticmethod
+    def _title_batch_prompt(texts: List[Any], profile: GenerationProfile) -> str:
+        """把多条需求打包成一个结构化提示词"""
+        items = [{"id": i + 1, "text": profile.truncate(text)} for i, text in enumerate(texts)]
+        return f"{Config.PROMPT_TITLE_BATCH}{json.dumps(items, ensure_ascii=False)}"
+
+    @staticmethod
+    def parse_title_batch(result: str, expected: int) -> List[Optional[str]]:
+        """解析批量标题应答
+
+        优先按id对齐；模型只返回字符串数组且长度一致时按顺序对齐。无法解析的条目为None。
+        """
+        titles: List[Optional[str]] = [None] * expected
+        start, end = result.find('['), result.rfind(']')
+        if start < 0 or end <= start:
+            return titles
+        try:
+            items = json.loads(result[start:end + 1])
+        except ValueError:
+            return titles
+        if not isinstance(items, list):
+            return titles
+
+        for position, item in enumerate(items):
+            if isinstance(item, dict):
+                index, title = item.get('id'), item.get('title')
+                index = index - 1 if isinstance(index, int) else None
+            elif isinstance(item, str) and len(items) == expected:
+                index, title = position, item
+            else:
+                continue
+            if index is not None and 0 <= index < expected and isinstance(title, str) and title.strip():
+                titles[index] = title.strip()
+        return titles
+
+    @classmethod
+    def _prepare_title_batch(cls, texts: List[Any]):
+        """查询缓存，返回（提供商, 生成限制, 缓存键, 已有结果, 待生成的下标）
+
+        缓存键与逐条生成标题时相同，批量和逐条的结果可以互相复用。
+        """
+        ai_provider = cls.get_ai_provider()
+        profile = GenerationProfile.for_task("title")
+        keys = [cls._cache_key(ai_provider, Config.PROMPT_TITLE, text, profile) for text in texts]
+        results = [cls._cache_get(key) for key in keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        return ai_provider, profile, keys, results, pending
+
+    @classmethod
+    def _merge_title_batch(cls, response: str, keys: List[Optional[str]],
+                           results: List[Optional[str]], pending: List[int]) -> None:
+        """把批量应答写回结果列表和缓存"""
+        parsed = cls.parse_title_batch(response, len(pending))
+        failed = sum(1 for title in parsed if title is None)
+        if failed:
+            print(f"批量标题中有{failed}条解析失败，将逐条重新生成")
+        for index, title in zip(pending, parsed):
+            if title is not None:
+                results[index] = title
+                cls._cache_put(keys[index], title)
+
+    @classmethod
+    def shorten_texts(cls, texts: List[Any]) -> List[str]:
+        """批量将文本缩减为标题，一次请求处理多条，解析失败的条目逐条重试"""
+        ai_provider, profile, keys, results, pending = cls._prepare_title_batch(texts)
+        if len(pending) > 1:
+            response = cls._call_provider(
+                ai_provider, cls._title_batch_prompt([texts[i] for i in pending], profile),
+                "shorten_texts", profile.for_batch(len(pending)))
+            cls._merge_title_batch(response, keys, results, pending)
+
+        return [cls._clean_title(text, result) if result is not None else cls.shorten_text(text)
+                for text, result in zip(texts, results)]
+
+    @classmethod
+    async def ashorten_texts(cls, texts: List[Any]) -> List[str]:
+        """shorten_texts的异步版本"""
+        ai_provider, profile, keys, results, pending = cls._prepare_title_batch(texts)
+        if len(pending) > 1:
+            response = await cls._acall_provider(
+                ai_provider, cls._title_batch_prompt([texts[i] for i in pending], profile),
+                "shorten_texts", profile.for_batch(len(pending)))
+            cls._merge_title_batch(response, keys, results, pending)
+
+        titles = []
+        for text, result in zip(texts, results):
+            titles.append(cls._clean_title(text, result) if result is not None
+                          else await cls.ashorten_text(text))
+        return titles
+
+    @staticmethod
+    def _clean_title(text: str, result: str) -> str:
+        """清理模型返回的标题，按需保留★/▲标记"""
         cleaned_title = result.replace("。", "")
 
         if Config.KEY_FLAG == 1:
@@ -205,12 +1612,72 @@ class AIService:
                 cleaned_title = f"▲{cleaned_title}"
         return cleaned_title
 
+    @classmethod
+    def generate_solution(cls, content: str) -> str:
+        """生成解决方案"""
+        profile = GenerationProfile.for_task("solution")
+        prompt = f"{Config.PROMPT_CONTENT} {profile.truncate(content)}"
+        return cls.call_with_cache(Config.PROMPT_CONTENT, content, prompt, "generate_solution", profile)
+
+    @classmethod
+    def shorten_text(cls, text: str) -> str:
+        """将文本缩减为标题"""
+        profile = GenerationProfile.for_task("title")
+        prompt = f"{Config.PROMPT_TITLE}'{profile.truncate(text)}'"
+        result = cls.call_with_cache(Config.PROMPT_TITLE, text, prompt, "shorten_text", profile)
+        return cls._clean_title(text, result)
+
     @classmethod
     def optimize_description(cls, text: str) -> str:
         """优化需求说明"""
-        ai_provider = cls.get_ai_provider()
-        prompt = f"{Config.PROMPT_ANSWER}'{text}'"
-        return ai_provider.call_api(prompt)
+        profile = GenerationProfile.for_task("answer")
+        prompt = f"{Config.PROMPT_ANSWER}'{profile.truncate(text)}'"
+        return cls.call_with_cache(Config.PROMPT_ANSWER, text, prompt, "optimize_description", profile)
+
+    @classmethod
+    def _adapt_prompt(cls, text: str, source_text: str, source_answer: str,
+                      profile: GenerationProfile) -> Tuple[str, str]:
+        """生成改写提示词，返回（缓存用文本, 提示词）"""
+        cache_text = json.dumps([source_answer, text], ensure_ascii=False)
+        prompt = (f"{Config.PROMPT_ADAPT}\n原需求：{profile.truncate(source_text)}\n原介绍：{source_answer}"
+                  f"\n新需求：{profile.truncate(text)}")
+        return cache_text, prompt
+
+    @classmethod
+    def adapt_solution(cls, text: str, source_text: str, source_answer: str) -> str:
+        """根据相似需求的应答改写出本需求的应答"""
+        profile = GenerationProfile.for_task("solution")
+        cache_text, prompt = cls._adapt_prompt(text, source_text, source_answer, profile)
+        return cls.call_with_cache(Config.PROMPT_ADAPT, cache_text, prompt, "adapt_solution", profile)
+
+    @classmethod
+    async def agenerate_solution(cls, content: str) -> str:
+        """异步生成解决方案"""
+        profile = GenerationProfile.for_task("solution")
+        prompt = f"{Config.PROMPT_CONTENT} {profile.truncate(content)}"
+        return await cls.acall_with_cache(Config.PROMPT_CONTENT, content, prompt, "generate_solution", profile)
+
+    @classmethod
+    async def ashorten_text(cls, text: str) -> str:
+        """异步将文本缩减为标题"""
+        profile = GenerationProfile.for_task("title")
+        prompt = f"{Config.PROMPT_TITLE}'{profile.truncate(text)}'"
+        result = await cls.acall_with_cache(Config.PROMPT_TITLE, text, prompt, "shorten_text", profile)
+        return cls._clean_title(text, result)
+
+    @classmethod
+    async def aoptimize_description(cls, text: str) -> str:
+        """异步优化需求说明"""
+        profile = GenerationProfile.for_task("answer")
+        prompt = f"{Config.PROMPT_ANSWER}'{profile.truncate(text)}'"
+        return await cls.acall_with_cache(Config.PROMPT_ANSWER, text, prompt, "optimize_description", profile)
+
+    @classmethod
+    async def aadapt_solution(cls, text: str, source_text: str, source_answer: str) -> str:
+        """异步根据相似需求的应答改写出本需求的应答"""
+        profile = GenerationProfile.for_task("solution")
+        cache_text, prompt = cls._adapt_prompt(text, source_text, source_answer, profile)
+        return await cls.acall_with_cache(Config.PROMPT_ADAPT, cache_text, prompt, "adapt_solution", profile)
 
 
 class DocumentProcessor:
@@ -218,13 +1685,18 @@ class DocumentProcessor:
 
     @staticmethod
     def get_image_from_run(run) -> Optional[tuple]:
-        """从run中提取图片"""
+        """从run中提取图片，返回 (数据, 类型, 宽厘米, 高厘米)
+
+        尺寸优先取 wp:extent，缺失时只读取图片文件头，不解码像素。
+        """
         try:
-            for item in run._r.drawing_lst:
-                if item.graphic.graphicData.pic is not None:
-                    rId = item.graphic.graphicData.pic.blipFill.blip.embed
-                    image = run.part.get_or_add_image(rId)
-                    return image.blob, image.content_type
+            found = find_run_image(run._r)
+            if found is None:
+                return None
+            embed, width_cm, height_cm = found
+            image_part = run.part.related_parts[embed]
+            width_cm, height_cm = run_image_size_cm(run, embed, width_cm, height_cm)
+            return image_part.blob, image_part.content_type, width_cm, height_cm
         except Exception as e:
             print(f"提取图片失败: {str(e)}")
         return None
@@ -248,8 +1720,9 @@ class ExcelProcessor:
     """Excel处理类"""
 
     @staticmethod
-    def load_excel(file_path: str) -> Workbook:
+    def load_excel(file_path: str) -> "Workbook":
         """加载Excel文件"""
+        from openpyxl import load_workbook
         try:
             return load_workbook(file_path)
         except Exception as e:
@@ -257,7 +1730,17 @@ class ExcelProcessor:
             raise
 
     @staticmethod
-    def get_sheet(workbook: Workbook) -> Worksheet:
+    def load_excel_readonly(file_path: str) -> "Workbook":
+        """以只读流式方式加载Excel文件"""
+        from openpyxl import load_workbook
+        try:
+            return load_workbook(file_path, read_only=True)
+        except Exception as e:
+            print(f"加载Excel文件失败: {str(e)}")
+            raise
+
+    @staticmethod
+    def get_sheet(workbook: "Workbook") -> "Worksheet":
         """获取Excel工作表"""
         try:
             return workbook.active
@@ -266,6 +1749,236 @@ class ExcelProcessor:
             raise
 
 
+class StreamingExcelWriter:
+    """只写模式的输出表格写入类
+
+    按原工作簿的工作表顺序创建只写工作表：其他工作表原样复制数值，需求表先写入表头，
+    之后每完成一行追加一行。行数据由openpyxl直接写入临时文件，内存占用与表格大小无关。
+    """
+
+    def __init__(self, source_workbook: "Workbook", source_sheet, output_path: Path):
+        from openpyxl import Workbook
+        self.output_path = output_path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.rows_written = 0
+        for worksheet in source_workbook.worksheets:
+            target = self.workbook.create_sheet(title=worksheet.title)
+            if worksheet.title == source_sheet.title:
+                self.sheet = target
+                for header in worksheet.iter_rows(max_row=1, values_only=True):
+                    target.append(header)
+            else:
+                for values in worksheet.iter_rows(values_only=True):
+                    target.append(values)
+
+    def append_row(self, values: List[Any]) -> None:
+        """追加一行数据"""
+        self.sheet.append(values)
+        self.rows_written += 1
+
+    def save(self) -> None:
+        """保存输出文件，只写工作簿只能保存一次"""
+        self.workbook.save(self.output_path)
+
+
+class SectionIndex:
+    """产品手册章节索引类
+
+    启动时一次性读取Extract_Word.py生成的章节清单（版本号 → 路径、标题、大小、哈希），
+    之后按G列值在内存字典中查找。没有清单时扫描一次章节目录，兼容"1.2.3- 标题.docx"
+    和"1.2.3.docx"两种文件名。
+    """
+
+    MANIFEST_NAME = "sections_manifest.json"
+    VERSION_PATTERN = re.compile(r'^\d+(\.\d+)*$')
+
+    _default: Optional["SectionIndex"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, base_dir: Path, sections: Dict[str, Dict[str, Any]]):
+        self.base_dir = Path(base_dir)
+        self.sections = sections
+
+    @classmethod
+    def load(cls, base_dir: Path) -> "SectionIndex":
+        """读取章节清单，不存在时扫描目录"""
+        base_dir = Path(base_dir)
+        manifest_file = base_dir / cls.MANIFEST_NAME
+        if manifest_file.exists():
+            with open(manifest_file, encoding='utf-8') as f:
+                sections = json.load(f).get('sections', {})
+            print(f"章节清单加载完成: {manifest_file}（{len(sections)}个章节）")
+            return cls(base_dir, sections)
+
+        sections = {}
+        if base_dir.is_dir():
+            for entry in os.scandir(base_dir):
+                if not entry.name.endswith('.docx') or entry.name.startswith('~$'):
+                    continue
+                version, _, title = entry.name[:-len('.docx')].partition('- ')
+                if cls.VERSION_PATTERN.match(version):
+                    sections.setdefault(version, {'path': entry.name, 'title': title,
+                                                  'size': entry.stat().st_size})
+        print(f"未找到章节清单，扫描目录得到{len(sections)}个章节: {base_dir}")
+        return cls(base_dir, sections)
+
+    @classmethod
+    def default(cls) -> "SectionIndex":
+        """按Config.SECTIONS_DIR加载并缓存的共享索引"""
+        with cls._default_lock:
+            if cls._default is None or cls._default.base_dir != Path(Config.SECTIONS_DIR):
+                cls._default = cls.load(Config.SECTIONS_DIR)
+            return cls._default
+
+    @staticmethod
+    def normalize_key(g_column_value: Any) -> Optional[str]:
+        """把G列的值规范为版本号文本，空值或'X'返回None"""
+        if g_column_value is None:
+            return None
+        if isinstance(g_column_value, float) and g_column_value.is_integer():
+            g_column_value = int(g_column_value)
+        key = str(g_column_value).strip()
+        if key.lower().endswith('.docx'):
+            key = key[:-len('.docx')]
+        if not key or key.upper() == 'X':
+            return None
+        return key
+
+    def lookup(self, g_column_value: Any) -> Optional[Path]:
+        """查找G列值对应的章节文件"""
+        key = self.normalize_key(g_column_value)
+        entry = self.sections.get(key) if key else None
+        return self.base_dir / entry['path'] if entry else None
+
+    def load_search(self) -> Optional[BM25Index]:
+        """读取Extract_Word.py生成的章节检索索引，不存在或无法读取时返回None"""
+        index_file = self.base_dir / INDEX_NAME
+        if not index_file.exists():
+            return None
+        try:
+            search = BM25Index.load(index_file)
+        except Exception as e:
+            print(f"读取章节检索索引失败，跳过自动匹配: {str(e)}")
+            return None
+        print(f"章节检索索引加载完成: {index_file}（{len(search)}个章节）")
+        return search
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+
+@dataclass
+class ParsedSection:
+    """解析后的章节内容
+
+    heading_styles为全部标题段落的样式名，用于推算章节号；fragment为可直接写入标书的内容片段，
+    遇到无法识别级别的标题时在该处截断并设置truncated。
+    """
+
+    # 引用其他文档部件的元素，复制到另一文档后关系ID会失效
+    PART_REFERENCE_TAGS = (
+        qn('w:drawing'), qn('w:pict'), qn('w:object'),
+        qn('w:commentRangeStart'), qn('w:commentRangeEnd'), qn('w:commentReference'),
+        qn('w:footnoteReference'), qn('w:endnoteReference'),
+        '{http://schemas.openxmlformats.org/markup-compatibility/2006}AlternateContent',
+    )
+
+    heading_styles: List[str]
+    fragment: List[list]
+    truncated: bool = False
+    size: int = 0
+
+    @classmethod
+    def parse(cls, section_file: str) -> "ParsedSection":
+        """解析章节Word文件"""
+        section_document = WordProcessor.load_word(section_file)
+        heading_styles: List[str] = []
+        fragment: List[list] = []
+        truncated = False
+        for block in DocumentProcessor.iter_block_items(section_document):
+            if isinstance(block, docx.text.paragraph.Paragraph):
+                paragraph = block
+                style_name = paragraph.style.name
+                if style_name.startswith('Heading'):
+                    heading_styles.append(style_name)
+                    if truncated:
+                        continue
+                    try:
+                        fragment.append(["heading", int(style_name[-1]), paragraph.text])
+                    except ValueError:
+                        truncated = True
+                elif not truncated:
+                    fragment.append(["paragraph", paragraph.text])
+            elif isinstance(block, docx.table.Table) and not truncated:
+                fragment.append(["table_xml", cls.portable_table_xml(block)])
+        size = len(json.dumps(fragment, ensure_ascii=False).encode('utf-8'))
+        return cls(heading_styles, fragment, truncated, size)
+
+    @classmethod
+    def portable_table_xml(cls, table: docx.table.Table) -> str:
+        """序列化表格XML，保留合并单元格和样式
+
+        图片、批注、脚注等通过关系ID引用原文档其他部件的元素在目标文档中无法解析，
+        复制前移除；超链接只保留文字。
+        """
+        tbl = copy.deepcopy(table._tbl)
+        for element in list(tbl.iter(*cls.PART_REFERENCE_TAGS)):
+            parent = element.getparent()
+            if parent is not None:
+                parent.remove(element)
+        for hyperlink in tbl.iter(qn('w:hyperlink')):
+            hyperlink.attrib.pop(qn('r:id'), None)
+        return etree.tostring(tbl, encoding='unicode')
+
+
+class SectionCache:
+    """已解析章节的LRU缓存类
+
+    以（路径, 修改时间）为键，文件更新后自动失效；按条数和内容大小两个上限淘汰最久未用的章节。
+    同一章节被多行引用时只解压、解析一次。
+    """
+
+    def __init__(self, max_entries: int = 256, max_mb: float = 64):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Tuple[str, int], ParsedSection]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, section_file: str) -> ParsedSection:
+        """读取章节，未命中时解析并放入缓存"""
+        key = (os.path.abspath(section_file), os.stat(section_file).st_mtime_ns)
+        with self._lock:
+            section = self._entries.get(key)
+            if section is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return section
+            self.misses += 1
+
+        with metrics.timer("docx_seconds", operation="parse_section"):
+            section = ParsedSection.parse(section_file)
+        with self._lock:
+            if key not in self._entries and self.max_entries > 0 and section.size <= self.max_bytes:
+                self._entries[key] = section
+                self.current_bytes += section.size
+                while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted.size
+                    self.evictions += 1
+        return section
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中统计"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self.current_bytes}
+
+
 class WordProcessor:
     """Word文档处理类"""
 
@@ -278,6 +1991,12 @@ class WordProcessor:
             print(f"加载Word文件失败: {str(e)}")
             raise
 
+    @staticmethod
+    def new_document() -> docx.Document:
+        """从模板池克隆空白文档，模板为Config.TEMPLATE_FILE，不存在时使用python-docx默认模板"""
+        template = Config.TEMPLATE_FILE if Path(Config.TEMPLATE_FILE).exists() else None
+        return TemplatePool.shared(template).new_document()
+
     @staticmethod
     def save_word(document: docx.Document, file_path: str) -> None:
         """保存Word文件"""
@@ -291,16 +2010,10 @@ class WordProcessor:
     def find_word_file(g_column_value: str) -> str:
         """根据G列值找到对应的Word文件"""
         try:
-            # 移除可能存在的文件扩展名
-            g_column_value = str(g_column_value).split('.')[0]
-
-            # 在当前目录查找匹配的文件
-            for file in os.listdir():
-                if file.endswith('.docx'):
-                    file_prefix = file.split('-')[0]
-                    if file_prefix == g_column_value:
-                        return file
-            raise FileNotFoundError(f"未找到对应的Word文件: {g_column_value}")
+            section_file = SectionIndex.default().lookup(g_column_value)
+            if section_file is None:
+                raise FileNotFoundError(f"未找到对应的Word文件: {g_column_value}")
+            return str(section_file)
         except Exception as e:
             print(f"查找Word文件失败: {str(e)}")
             raise
@@ -320,23 +2033,17 @@ class WordProcessor:
                         # 处理图片
                         image_data = DocumentProcessor.get_image_from_run(run)
                         if image_data:
-                            blob, content_type = image_data
+                            blob, content_type, width_cm, _ = image_data
                             if blob:
                                 image_stream = io.BytesIO(blob)
-                                width = None
-
-                                # 检查图片宽度是否超过最大宽度
-                                try:
-                                    from PIL import Image
-                                    with Image.open(image_stream) as img:
-                                        width_cm = img.width / 37.795275591  # 将像素转换为厘米
-                                        if width_cm > Config.MAX_WIDTH_CM:
-                                            width = Cm(Config.MAX_WIDTH_CM)
-                                    image_stream.seek(0)
-                                except Exception as e:
-                                    print(f"处理图片尺寸时出错: {str(e)}")
-
-                                if width:
+                                # 显示尺寸未知时按文件头的像素和分辨率换算
+                                if not width_cm:
+                                    info = image_info_cache.get(blob)
+                                    width_cm = info.size_cm()[0] if info else None
+
+                                # 始终显式指定宽度，否则python-docx按像素尺寸插入，宽度不超过最大宽度
+                                if width_cm:
+                                    width = Cm(min(width_cm, Config.MAX_WIDTH_CM))
                                     p.add_run().add_picture(image_stream, width=width)
                                 else:
                                     p.add_run().add_picture(image_stream)
@@ -347,135 +2054,869 @@ class WordProcessor:
             raise
 
 
-def main():
-    """主函数"""
+@dataclass
+class RowPlan:
+    """单行需求的大纲规划结果
+
+    在生成内容之前确定每一行的标题层级、章节号以及关联的产品手册章节，
+    使各行的处理不再依赖Config上可变的标题计数器。
+    matched_section为G列为空时按需求文本自动匹配并采用的章节号。
+    """
+
+    index: int
+    row: tuple
+    b_content: Any
+    c_content: Any
+    g_value: Any
+    chapter: str
+    title_level: int
+    title_prefix: str = ""
+    group_heading: Optional[str] = None
+    section_file: Optional[str] = None
+    matched_section: Optional[str] = None
+
+    def title_heading(self, title: str) -> str:
+        """生成标题文本"""
+        return f"{self.title_prefix}{title}"
+
+
+class OutlinePlanner:
+    """大纲规划类，按表格顺序预先计算标题编号
+
+    提供章节检索索引时，G列为空的行按C列文本检索章节：得分不低于阈值的结果记入matches，
+    match_mode为fill时直接采用（影响后续章节号），为suggest时只作为建议。
+    """
+
+    def __init__(self, more_section: int, heading_1: int, heading_2: int, heading_3: int,
+                 section_index: Optional[SectionIndex] = None,
+                 section_cache: Optional[SectionCache] = None,
+                 section_search: Optional[BM25Index] = None,
+                 match_mode: str = "suggest", match_threshold: float = 0.25):
+        self.more_section = more_section
+        self.heading_1 = heading_1
+        self.heading_2 = heading_2
+        self.heading_3 = heading_3
+        self.section_index = section_index
+        self.section_cache = section_cache or SectionCache(max_entries=0)
+        self.section_search = section_search
+        self.match_mode = match_mode
+        self.match_threshold = match_threshold
+        self.matches: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_config(cls, section_index: Optional[SectionIndex] = None,
+                    section_cache: Optional[SectionCache] = None,
+                    section_search: Optional[BM25Index] = None) -> "OutlinePlanner":
+        """根据当前配置创建规划器"""
+        return cls(Config.MORE_SECTION, Config.LAST_HEADING_1,
+                   Config.LAST_HEADING_2, Config.LAST_HEADING_3, section_index, section_cache,
+                   section_search, Config.SECTION_MATCH_MODE, Config.SECTION_MATCH_THRESHOLD)
+
+    def resolve_section_file(self, g_column_value: Any) -> Optional[str]:
+        """根据G列值确定关联的Word文件"""
+        if self.section_index is None:
+            return None
+        section_file = self.section_index.lookup(g_column_value)
+        if section_file is None:
+            if SectionIndex.normalize_key(g_column_value):
+                print(f"G列值未匹配到章节文件: {g_column_value}")
+            return None
+        return str(section_file)
+
+    def match_section(self, index: int, c_column_content: Any) -> Optional[str]:
+        """按需求文本检索章节，得分达到阈值时记录匹配，fill模式下返回章节号"""
+        if self.section_search is None or self.section_index is None or self.match_mode == "off":
+            return None
+        results = self.section_search.search(c_column_content, top_k=1)
+        if not results:
+            return None
+        key, score, normalized = results[0]
+        if normalized < self.match_threshold or self.section_index.lookup(key) is None:
+            return None
+        applied = self.match_mode == "fill"
+        self.matches.append({"row": index, "section": key, "score": round(normalized, 4),
+                             "title": self.section_index.sections[key].get('title'), "applied": applied})
+        print(f"第{index}行{'自动匹配' if applied else '建议'}章节: {key}（得分{normalized:.2f}）")
+        metrics.inc("section_matches_total", mode=self.match_mode)
+        return key if applied else None
+
+    def section_heading_styles(self, section_file: str) -> List[str]:
+        """读取关联Word文件中的标题样式名，用于推算后续章节号"""
+        return self.section_cache.get(section_file).heading_styles
+
+    @staticmethod
+    def cell_value(row, index: int) -> Any:
+        """读取单元格的值；只读模式下缺少<dimension>时末尾空列不会补齐，行可能比表头短"""
+        return row[index].value if index < len(row) else None
+
+    def plan(self, rows) -> List[RowPlan]:
+        """规划所有行的标题与章节号
+
+        Args:
+            rows: Excel数据行（不含表头）
+
+        Returns:
+            按表格顺序排列的行规划列表
+        """
+        plans = []
+        for index, row in enumerate(rows, start=1):
+            b_column_content = self.cell_value(row, 1)
+            c_column_content = self.cell_value(row, 2)
+            g_column_value = self.cell_value(row, 6)
+
+            group_heading = None
+            if self.more_section == 1:
+                if b_column_content:
+                    self.heading_2 += 1
+                    self.heading_3 = 1
+                    group_heading = f" {b_column_content}"
+                    title_prefix = ""
+                else:
+                    self.heading_3 += 1
+                    title_prefix = " "
+                chapter = f"{self.heading_1}.{self.heading_2}.{self.heading_3}"
+                title_level = 3
+            else:
+                self.heading_2 += 1
+                title_prefix = f"{self.heading_2}. "
+                chapter = f"{self.heading_1}.{self.heading_2}"
+                title_level = 2
+
+            section_file = self.resolve_section_file(g_column_value)
+            matched_section = None
+            if g_column_value is None or not str(g_column_value).strip():
+                matched_section = self.match_section(index, c_column_content)
+                if matched_section:
+                    section_file = self.resolve_section_file(matched_section)
+            if section_file:
+                for style_name in self.section_heading_styles(section_file):
+                    if style_name == 'Heading 2':
+                        self.heading_2 += 1
+                        self.heading_3 = 1
+                    elif style_name == 'Heading 3':
+                        self.heading_3 += 1
+
+            plans.append(RowPlan(
+                index=index,
+                row=row,
+                b_content=b_column_content,
+                c_content=c_column_content,
+                g_value=g_column_value,
+                chapter=chapter,
+                title_level=title_level,
+                title_prefix=title_prefix,
+                group_heading=group_heading,
+                section_file=section_file,
+                matched_section=matched_section,
+            ))
+        return plans
+
+
+class RowCompletionTracker:
+    """汇总每行的标题和应答，两者都生成后回调一次"""
+
+    def __init__(self, on_row_done: Optional[Callable[[RowPlan, str, str], None]]):
+        self.on_row_done = on_row_done
+        self._parts: Dict[int, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, plan: RowPlan, part: str, value: str) -> None:
+        """记录一行的标题（title）或应答（solution）"""
+        if self.on_row_done is None:
+            return
+        with self._lock:
+            parts = self._parts.setdefault(plan.index, {})
+            parts[part] = value
+            if len(parts) < 2:
+                return
+            del self._parts[plan.index]
+        self.on_row_done(plan, parts['title'], parts['solution'])
+
+
+class ReorderBuffer:
+    """按表格顺序放行乱序完成的行
+
+    put()接收任意顺序完成的行，之前的行全部完成后才按顺序调用emit（同一时间只有一个线程在emit）；
+    admit()在请求的行超出待输出的第一行之后capacity行时阻塞，使缓冲的行数不超过capacity。
+    任一生成任务失败时调用abort()，唤醒等待中的admit()。
+    """
+
+    def __init__(self, order: List[int], emit: Callable[[int, Any], None], capacity: int = 64):
+        self.order = order
+        self.position = {index: position for position, index in enumerate(order)}
+        self.emit = emit
+        self.capacity = max(1, capacity)
+        self.pending: Dict[int, Any] = {}
+        self.next_position = 0
+        self.peak = 0
+        self.aborted = False
+        self._condition = threading.Condition()
+        self._emit_lock = threading.Lock()
+        self._progress: Optional[asyncio.Event] = None
+
+    @property
+    def done(self) -> bool:
+        """是否所有行都已输出"""
+        return self.next_position >= len(self.order)
+
+    def _admissible(self, index: int) -> bool:
+        return self.aborted or self.position[index] < self.next_position + self.capacity
+
+    def admit(self, index: int) -> bool:
+        """等待行进入缓冲窗口，已中止时返回False"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._admissible(index))
+            return not self.aborted
+
+    async def aadmit(self, index: int) -> bool:
+        """admit的异步版本，put和abort须在同一事件循环中调用"""
+        while not self._admissible(index):
+            if self._progress is None:
+                self._progress = asyncio.Event()
+            self._progress.clear()
+            await self._progress.wait()
+        return not self.aborted
+
+    def _notify(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+        if self._progress is not None:
+            self._progress.set()
+
+    def abort(self) -> None:
+        """中止等待"""
+        self.aborted = True
+        self._notify()
+
+    def put(self, index: int, item: Any) -> None:
+        """登记完成的行，并按顺序输出已连续完成的前缀"""
+        with self._emit_lock:
+            self.pending[index] = item
+            self.peak = max(self.peak, len(self.pending))
+            advanced = False
+            while not self.done and self.order[self.next_position] in self.pending:
+                next_index = self.order[self.next_position]
+                self.emit(next_index, self.pending.pop(next_index))
+                with self._condition:
+                    self.next_position += 1
+                advanced = True
+            if advanced:
+                self._notify()
+
+
+class RowGenerator:
+    """行内容生成类，可并发调用AI服务生成标题和应答
+
+    传入followers（代表行号 -> 近似重复的行规划）时只为代表行生成应答，
+    其余行复用代表的应答（dedup_mode为adapt时按差异改写）。
+    """
+
+    def __init__(self, max_workers: int = 1, use_async: bool = False, title_batch_size: int = 1,
+                 dedup_mode: str = "reuse"):
+        self.max_workers = max(1, max_workers)
+        self.use_async = use_async
+        self.title_batch_size = max(1, title_batch_size)
+        self.dedup_mode = dedup_mode
+
+    @staticmethod
+    def _leaders(plans: List[RowPlan], followers: Dict[int, List[RowPlan]]) -> List[RowPlan]:
+        """需要实际生成应答的行"""
+        follower_indexes = {plan.index for members in followers.values() for plan in members}
+        return [plan for plan in plans if plan.index not in follower_indexes]
+
+    def _title_batches(self, plans: List[RowPlan]) -> List[List[RowPlan]]:
+        """按批量大小切分标题请求"""
+        size = self.title_batch_size
+        return [plans[i:i + size] for i in range(0, len(plans), size)]
+
+    @staticmethod
+    def _shorten(batch: List[RowPlan], tracker: RowCompletionTracker) -> List[str]:
+        if len(batch) == 1:
+            print(f"处理第{batch[0].index}行 - 正在生成标题...")
+            titles = [AIService.shorten_text(batch[0].c_content)]
+        else:
+            print(f"处理第{batch[0].index}-{batch[-1].index}行 - 正在批量生成标题...")
+            titles = AIService.shorten_texts([plan.c_content for plan in batch])
+        for plan, title in zip(batch, titles):
+            tracker.set(plan, 'title', title)
+        return titles
+
+    def _solve(self, plan: RowPlan, tracker: RowCompletionTracker,
+               followers: Dict[int, List[RowPlan]]) -> Dict[int, str]:
+        """生成代表行的应答并分发给近似重复的行，返回{行号: 应答}"""
+        print(f"处理第{plan.index}行 - 正在生成解决方案...")
+        solution = AIService.generate_solution(plan.c_content)
+        tracker.set(plan, 'solution', solution)
+        solutions = {plan.index: solution}
+        for follower in followers.get(plan.index, ()):
+            if self.dedup_mode == "adapt":
+                print(f"处理第{follower.index}行 - 正在根据第{plan.index}行的应答改写...")
+                answer = AIService.adapt_solution(follower.c_content, plan.c_content, solution)
+            else:
+                print(f"处理第{follower.index}行 - 复用第{plan.index}行的应答")
+                answer = solution
+            tracker.set(follower, 'solution', answer)
+            solutions[follower.index] = answer
+        return solutions
+
+    def _work_units(self, plans: List[RowPlan], followers: Dict[int, List[RowPlan]]):
+        """按行顺序交错排列标题批次和应答请求，产出（行规划, 标题批次或None, 是否生成应答）"""
+        batches = {batch[0].index: batch for batch in self._title_batches(plans)}
+        leader_indexes = {plan.index for plan in self._leaders(plans, followers)}
+        for plan in plans:
+            yield plan, batches.get(plan.index), plan.index in leader_indexes
+
+    @staticmethod
+    def _guarded(func: Callable, gate: Optional[ReorderBuffer]) -> Callable:
+        """任务失败时中止gate上的等待，避免提交线程一直阻塞"""
+        def run(*args):
+            try:
+                return func(*args)
+            except BaseException:
+                if gate is not None:
+                    gate.abort()
+                raise
+        return run
+
+    def generate(self, plans: List[RowPlan],
+                 on_row_done: Optional[Callable[[RowPlan, str, str], None]] = None,
+                 followers: Optional[Dict[int, List[RowPlan]]] = None,
+                 gate: Optional[ReorderBuffer] = None) -> List[Tuple[str, str]]:
+        """为每一行生成（标题, 应答）
+
+        请求按行顺序提交，先完成的行可以先回调；传入gate时超出其缓冲窗口的行要等前面的行输出后才提交。
+
+        Args:
+            plans: 行规划列表
+            on_row_done: 某一行的标题和应答都生成后调用，参数为（行规划, 标题, 应答）
+            followers: 近似重复需求，代表行号 -> 复用其应答的行规划
+            gate: 有序输出缓冲，限制已生成但尚未输出的行数
+
+        Returns:
+            与plans顺序一致的（标题, 应答）列表
+        """
+        if self.use_async:
+            return asyncio.run(self.agenerate(plans, on_row_done, followers, gate))
+        followers = followers or {}
+        tracker = RowCompletionTracker(on_row_done)
+        titles: Dict[int, str] = {}
+        solutions: Dict[int, str] = {}
+
+        def shorten(batch: List[RowPlan]) -> Dict[int, str]:
+            return dict(zip((plan.index for plan in batch), self._shorten(batch, tracker)))
+
+        if self.max_workers == 1:
+            for plan, batch, solve in self._work_units(plans, followers):
+                if batch:
+                    titles.update(shorten(batch))
+                if solve:
+                    solutions.update(self._solve(plan, tracker, followers))
+            return [(titles[plan.index], solutions[plan.index]) for plan in plans]
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = []
+            for plan, batch, solve in self._work_units(plans, followers):
+                if gate is not None and not gate.admit(plan.index):
+                    break
+                if batch:
+                    futures.append((titles, executor.submit(self._guarded(shorten, gate), batch)))
+                if solve:
+                    futures.append((solutions, executor.submit(
+                        self._guarded(self._solve, gate), plan, tracker, followers)))
+            for target, future in futures:
+                target.update(future.result())
+            return [(titles[plan.index], solutions[plan.index]) for plan in plans]
+        finally:
+            # 出错时取消尚未开始的请求
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def agenerate(self, plans: List[RowPlan],
+                        on_row_done: Optional[Callable[[RowPlan, str, str], None]] = None,
+                        followers: Optional[Dict[int, List[RowPlan]]] = None,
+                        gate: Optional[ReorderBuffer] = None) -> List[Tuple[str, str]]:
+        """在单个事件循环内并发生成，最多同时保持max_workers个请求"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+        tracker = RowCompletionTracker(on_row_done)
+        followers = followers or {}
+
+        async def shorten(batch: List[RowPlan]) -> List[str]:
+            async with semaphore:
+                if len(batch) == 1:
+                    print(f"处理第{batch[0].index}行 - 正在生成标题...")
+                    titles = [await AIService.ashorten_text(batch[0].c_content)]
+                else:
+                    print(f"处理第{batch[0].index}-{batch[-1].index}行 - 正在批量生成标题...")
+                    titles = await AIService.ashorten_texts([plan.c_content for plan in batch])
+            for plan, title in zip(batch, titles):
+                tracker.set(plan, 'title', title)
+            return titles
+
+        async def solve(plan: RowPlan) -> Dict[int, str]:
+            async with semaphore:
+                print(f"处理第{plan.index}行 - 正在生成解决方案...")
+                solution = await AIService.agenerate_solution(plan.c_content)
+            tracker.set(plan, 'solution', solution)
+            solutions = {plan.index: solution}
+            for follower in followers.get(plan.index, ()):
+                if self.dedup_mode == "adapt":
+                    async with semaphore:
+                        print(f"处理第{follower.index}行 - 正在根据第{plan.index}行的应答改写...")
+                        answer = await AIService.aadapt_solution(follower.c_content, plan.c_content, solution)
+                else:
+                    print(f"处理第{follower.index}行 - 复用第{plan.index}行的应答")
+                    answer = solution
+                tracker.set(follower, 'solution', answer)
+                solutions[follower.index] = answer
+            return solutions
+
+        async def guarded(coroutine):
+            try:
+                return await coroutine
+            except BaseException:
+                if gate is not None:
+                    gate.abort()
+                raise
+
+        title_tasks: List[asyncio.Future] = []
+        solution_tasks: List[asyncio.Future] = []
+        try:
+            try:
+                for plan, batch, solve_row in self._work_units(plans, followers):
+                    if gate is not None and not await gate.aadmit(plan.index):
+                        break
+                    if batch:
+                        title_tasks.append(asyncio.ensure_future(guarded(shorten(batch))))
+                    if solve_row:
+                        solution_tasks.append(asyncio.ensure_future(guarded(solve(plan))))
+                await asyncio.gather(*title_tasks, *solution_tasks)
+            except BaseException:
+                for task in title_tasks + solution_tasks:
+                    task.cancel()
+                raise
+            titles = [title for task in title_tasks for title in task.result()]
+            solutions = {index: answer for task in solution_tasks for index, answer in task.result().items()}
+            return list(zip(titles, [solutions[plan.index] for plan in plans]))
+        finally:
+            await AsyncHTTPClient.aclose()
+
+
+@dataclass
+class RowResult:
+    """单行需求的生成结果，即断点续跑日志中的一条记录
+
+    fragment为该行写入标书的内容片段，每项为以下之一：
+    ["heading", 级别, 文本]、["paragraph", 文本]、["table_xml", 表格XML]，
+    以及旧版日志中的["table", 列数, [[单元格文本, ...], ...]]
+    """
+
+    index: int
+    title: str
+    answer: str
+    chapter: str
+    fragment: List[list]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": "row", "index": self.index, "title": self.title, "answer": self.answer,
+                "chapter": self.chapter, "fragment": self.fragment}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RowResult":
+        return cls(data["index"], data["title"], data["answer"], data["chapter"], data["fragment"])
+
+
+class RunJournal:
+    """断点续跑日志类
+
+    每完成一行就向output目录下的JSON Lines文件追加一条记录。写入立即进入操作系统缓冲区，
+    fsync按条数或时间间隔批量执行，避免每行一次磁盘同步。首行记录输入文件指纹，
+    续跑时只有指纹一致才复用已有记录。
+    """
+
+    def __init__(self, path: Path, fingerprint: str,
+                 fsync_every: int = 20, fsync_interval: float = 2.0):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @staticmethod
+    def make_fingerprint(*paths: Path, **settings: Any) -> str:
+        """根据输入文件内容和影响输出的配置生成指纹"""
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def load(self) -> Dict[int, RowResult]:
+        """读取已完成的行，指纹不一致或日志不存在时返回空字典"""
+        completed: Dict[int, RowResult] = {}
+        if not self.path.exists():
+            return completed
+        with open(self.path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时可能留下写了一半的末行
+                    break
+                if line_number == 0:
+                    if record.get("type") != "header" or record.get("fingerprint") != self.fingerprint:
+                        print("断点日志与当前输入不一致，忽略已有记录")
+                        return {}
+                elif record.get("type") == "row":
+                    result = RowResult.from_dict(record)
+                    completed[result.index] = result
+        return completed
+
+    def start(self, resume: bool) -> Dict[int, RowResult]:
+        """打开日志，续跑时返回已完成的行并保留原有记录"""
+        completed = self.load() if resume else {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if completed:
+            # 重写日志以去掉可能残缺的末行
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({"type": "header", "fingerprint": self.fingerprint}) + "\n")
+                for result in completed.values():
+                    f.write(json.dumps(result.to_dict(), ensure_ascii=False) + "\n")
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({"type": "header", "fingerprint": self.fingerprint}) + "\n")
+        self.sync()
+        return completed
+
+    def record(self, result: RowResult) -> None:
+        """追加一行记录，按批次执行fsync"""
+        line = json.dumps(result.to_dict(), ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync_locked()
+
+    def _sync_locked(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self) -> None:
+        """立即把已写入的记录同步到磁盘"""
+        with self._lock:
+            self._sync_locked()
+
+    def close(self) -> None:
+        """同步并关闭日志"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class ProposalAssembler:
+    """标书组装类，按规划顺序写入标题、章节号和关联内容"""
+
+    def __init__(self, document: docx.Document, word_processor: "WordProcessor",
+                 section_cache: Optional[SectionCache] = None,
+                 excel_writer: Optional[StreamingExcelWriter] = None):
+        self.document = document
+        self.word_processor = word_processor
+        self.section_cache = section_cache or SectionCache(max_entries=0)
+        self.excel_writer = excel_writer
+
+    def read_section(self, plan: RowPlan) -> List[list]:
+        """读取关联Word文件的标题、段落和表格，返回内容片段"""
+        section = self.section_cache.get(plan.section_file)
+        if section.truncated:
+            print(f"处理第{plan.index}行时出错 - G列值转换失败: {plan.g_value}")
+        return section.fragment
+
+    def build_result(self, plan: RowPlan, shortened_title: str, optimized_description: str) -> RowResult:
+        """生成一行需求要写入标书的全部内容"""
+        fragment: List[list] = []
+        if plan.group_heading is not None:
+            fragment.append(["heading", 2, plan.group_heading])
+        fragment.append(["heading", plan.title_level, plan.title_heading(shortened_title)])
+
+        if plan.section_file:
+            print(f"处理第{plan.index}行 - 正在处理关联Word文件: {plan.section_file}")
+            fragment.extend(self.read_section(plan))
+        return RowResult(plan.index, shortened_title, optimized_description, plan.chapter, fragment)
+
+    def assemble_row(self, plan: RowPlan, result: RowResult) -> None:
+        """写入一行需求对应的Excel单元格和Word内容"""
+        if self.excel_writer is not None:
+            # 流式模式：复制原行的值并填入D、E、F列后追加到输出表
+            values = [cell.value for cell in plan.row]
+            # 只读模式下的行可能比表头短，补齐到G列
+            values += [None] * (7 - len(values))
+            values[3], values[4], values[5] = result.title, result.answer, result.chapter
+            if plan.matched_section:
+                values[6] = plan.matched_section
+            self.excel_writer.append_row(values)
+        else:
+            row = plan.row
+            # 将优化后的说明写入E列
+            row[4].value = result.answer
+            # 将需求写入到D列
+            row[3].value = result.title
+            # 将章节号写入F列
+            row[5].value = result.chapter
+            # 将自动匹配的章节号写入G列
+            if plan.matched_section:
+                row[6].value = plan.matched_section
+
+        self.apply_fragment(result.fragment)
+
+    def save_checkpoint(self, file_path: Path) -> None:
+        """把已组装的部分保存到输出文件，先写临时文件再替换，审阅者打开的总是完整的文件"""
+        file_path = Path(file_path)
+        tmp_path = file_path.with_name(f"~${file_path.name}.tmp")
+        self.document.save(str(tmp_path))
+        os.replace(tmp_path, file_path)
+
+    def apply_fragment(self, fragment: List[list]) -> None:
+        """把内容片段追加到标书"""
+        document = self.document
+        for item in fragment:
+            kind = item[0]
+            if kind == "heading":
+                document.add_heading(item[2], level=item[1])
+            elif kind == "paragraph":
+                document.add_paragraph(item[1], style='Normal')
+            elif kind == "table_xml":
+                # 直接插入表格XML，耗时与单元格数成正比
+                document.element.body._insert_tbl(parse_xml(item[1]))
+            elif kind == "table":
+                # 一次取得单元格网格后按下标填写，避免document.tables和Table.cell反复重建
+                cols, cells = item[1], item[2]
+                grid = document.add_table(rows=len(cells), cols=cols)._cells
+                for i, table_row in enumerate(cells):
+                    for j, cell_text in enumerate(table_row[:cols]):
+                        grid[i * cols + j].text = cell_text
+
+
+def main(resume: bool = False):
+    """主函数
+
+    Args:
+        resume: 是否从断点日志续跑，跳过已完成的行
+    """
     start_time = time.time()
+    journal = None
+    ensure_directories()
+    metrics.reset()
+    if Config.METRICS_ENABLED:
+        metrics.register_collector("image_info_cache", lambda: {
+            "hits": image_info_cache.hits, "misses": image_info_cache.misses})
+        metrics.start_periodic_flush(Config.METRICS_JSON_FILE, Config.METRICS_PROM_FILE,
+                                     Config.METRICS_FLUSH_INTERVAL)
     try:
         print("开始执行主程序...")
         # 检查环境变量是否已配置
         if not Config.BAIDU_API_KEY or not Config.BAIDU_SECRET_KEY:
             raise ValueError("请在.env文件中配置BAIDU_API_KEY和BAIDU_SECRET_KEY")
-
-        # 加载配置
-        config = Config()
         print("配置加载完成")
 
+        if Config.HEDGE_ENABLED:
+            HedgedProvider.reset()
+            metrics.register_collector("hedge", HedgedProvider.stats)
+            primary, secondary = HedgedProvider.providers()
+            print(f"对冲请求已启用: 主提供商{primary[0]}，备用提供商{secondary[0]}，"
+                  f"等待时间取近期耗时的P{Config.HEDGE_PERCENTILE * 100:g}")
+
+        if Config.LLM_CACHE_ENABLED:
+            AIService.cache = ResponseCache(
+                Config.LLM_CACHE_FILE, Config.LLM_CACHE_MAX_MB, Config.LLM_CACHE_MAX_AGE_DAYS)
+            metrics.register_collector("llm_cache", AIService.cache.stats)
+            print(f"AI应答缓存已启用: {Config.LLM_CACHE_FILE}"
+                  f"{'（重新生成模式，仅写入）' if Config.RE_GENERATE_TEXT else ''}")
+
         # 加载Excel文件
         excel_file = Config.EXCEL_FILE
         if not os.path.exists(excel_file):
             raise FileNotFoundError(f"未找到Excel文件: {excel_file}")
 
         excel_processor = ExcelProcessor()
-        workbook = excel_processor.load_excel(excel_file)
-        sheet = excel_processor.get_sheet(workbook)
-        print(f"Excel文件加载完成: {excel_file}")
+        excel_writer = None
+        with metrics.timer("excel_seconds", operation="load"):
+            if Config.EXCEL_STREAMING:
+                workbook = excel_processor.load_excel_readonly(excel_file)
+                sheet = excel_processor.get_sheet(workbook)
+                excel_writer = StreamingExcelWriter(workbook, sheet, Config.OUTPUT_EXCEL_FILE)
+            else:
+                workbook = excel_processor.load_excel(excel_file)
+                sheet = excel_processor.get_sheet(workbook)
+        print(f"Excel文件加载完成: {excel_file}{'（流式模式）' if excel_writer else ''}")
 
         # 加载Word文件
         word_file = Config.WORD_FILE
         word_processor = WordProcessor()
-        document = word_processor.load_word(word_file)
+        with metrics.timer("docx_seconds", operation="load"):
+            document = word_processor.load_word(word_file)
         print(f"Word文件加载完成: {word_file}")
 
-        # 处理Excel数据
-        row_count = 0
-        print("开始处理Excel数据...")
-        for row in sheet.iter_rows(min_row=2):  # 从第二行开始，跳过表头
-            row_count += 1
+        # 第一遍：规划大纲，确定每行的标题层级和章节号
+        section_index = SectionIndex.load(Config.SECTIONS_DIR)
+        section_cache = SectionCache(Config.SECTION_CACHE_MAX_ENTRIES, Config.SECTION_CACHE_MAX_MB)
+        metrics.register_collector("section_cache", section_cache.stats)
+        section_search = section_index.load_search() if Config.SECTION_MATCH_MODE != "off" else None
+        planner = OutlinePlanner.from_config(section_index, section_cache, section_search)
+        plans = planner.plan(sheet.iter_rows(min_row=2))  # 从第二行开始，跳过表头
+        row_count = len(plans)
+        print(f"大纲规划完成，共{row_count}行")
+        if planner.matches:
+            with open(Config.SECTION_MATCH_REPORT_FILE, 'w', encoding='utf-8') as f:
+                json.dump({"mode": Config.SECTION_MATCH_MODE, "threshold": Config.SECTION_MATCH_THRESHOLD,
+                           "matches": planner.matches}, f, ensure_ascii=False, indent=2)
+            print(f"G列为空的行中有{len(planner.matches)}行匹配到章节"
+                  f"{'并已填入' if Config.SECTION_MATCH_MODE == 'fill' else '（仅建议）'}，报告: "
+                  f"{Config.SECTION_MATCH_REPORT_FILE}")
+
+        # 打开断点日志，续跑时跳过已完成的行
+        settings = {"more_section": Config.MORE_SECTION,
+                    "heading": [Config.LAST_HEADING_1, Config.LAST_HEADING_2, Config.LAST_HEADING_3]}
+        if Config.SECTION_MATCH_MODE == "fill":
+            # 自动填入的章节会改变章节号，阈值不同时不能续跑
+            settings["section_match"] = Config.SECTION_MATCH_THRESHOLD
+        fingerprint = RunJournal.make_fingerprint(excel_file, word_file, **settings)
+        journal = RunJournal(Config.JOURNAL_FILE, fingerprint,
+                             Config.JOURNAL_FSYNC_EVERY, Config.JOURNAL_FSYNC_INTERVAL)
+        completed = journal.start(resume)
+        pending_plans = [plan for plan in plans if plan.index not in completed]
+        if resume:
+            print(f"从断点日志恢复{len(completed)}行，剩余{len(pending_plans)}行待处理")
+        oversized = AIService.warn_oversized_requirements(
+            [(plan.index, plan.c_content) for plan in pending_plans])
+        if oversized:
+            print(f"共{len(oversized)}行需求可能超出模型上下文，可调整*_MAX_INPUT_CHARS截断输入")
+
+        # 合并近似重复的需求，每簇只生成一次应答
+        followers: Dict[int, List[RowPlan]] = {}
+        if Config.DEDUP_ENABLED:
+            plans_by_index = {plan.index: plan for plan in pending_plans}
+            clusters = find_near_duplicates([(plan.index, plan.c_content) for plan in pending_plans],
+                                            Config.DEDUP_THRESHOLD)
+            followers = {cluster.leader: [plans_by_index[index] for index in cluster.members]
+                         for cluster in clusters}
+            merged = sum(len(cluster.members) for cluster in clusters)
+            write_cluster_report(Config.DEDUP_REPORT_FILE, clusters,
+                                 {index: plan.c_content for index, plan in plans_by_index.items()},
+                                 Config.DEDUP_THRESHOLD, Config.DEDUP_MODE)
+            metrics.inc("rows_total", merged, stage="deduplicated")
+            print(f"近似重复需求: {len(clusters)}簇，{merged}行复用应答"
+                  f"（阈值{Config.DEDUP_THRESHOLD}，模式{Config.DEDUP_MODE}），报告: {Config.DEDUP_REPORT_FILE}")
+
+        assembler = ProposalAssembler(document, word_processor, section_cache, excel_writer)
+        plans_by_index = {plan.index: plan for plan in plans}
+        last_checkpoint = time.time()
+
+        def assemble(index: int, result: RowResult) -> None:
+            """按表格顺序把一行写入标书，并定期保存已写入的部分"""
+            nonlocal last_checkpoint
             process_start_time = time.time()
-            
-            b_column_content = row[1].value
-            c_column_content = row[2].value
-            g_column_value = row[6].value
-
-            # 调用百度API，缩减C列内容
-            print(f"处理第{row_count}行 - 正在生成标题...")
-            shortened_title = AIService.shorten_text(c_column_content)
-
-            # 调用OpenAI API，对C列做应答
-            print(f"处理第{row_count}行 - 正在生成解决方案...")
-            optimized_description = AIService.generate_solution(c_column_content)
-
-            # 将优化后的说明写入E列
-            row[4].value = optimized_description
-            # 将需求写入到D列
-            row[3].value = shortened_title
-
-            # 根据MoreSection逻辑生成标题，并处理标题二和标题三的级联关系
-            if config.MORE_SECTION == 1:
-                if b_column_content:
-                    config.LAST_HEADING_2 += 1
-                    config.LAST_HEADING_3 = 1
-                    document.add_heading(f" {b_column_content}", level=2)
-
-                    # 将当前标题二章节号写入F列
-                    row[5].value = f"{config.LAST_HEADING_1}.{config.LAST_HEADING_2}.{config.LAST_HEADING_3}"
-
-                    # 生成标题三的小节，标题基于C列内容
-                    document.add_heading(f"{shortened_title}", level=3)
-                else:
-                    config.LAST_HEADING_3 += 1
-                    document.add_heading(f" {shortened_title}", level=3)
-
-                    # 将当前标题三章节号写入F列
-                    row[5].value = f"{config.LAST_HEADING_1}.{config.LAST_HEADING_2}.{config.LAST_HEADING_3}"
-            else:
-                config.LAST_HEADING_2 += 1
-                document.add_heading(f"{config.LAST_HEADING_2}. {shortened_title}", level=2)
-
-                # 将当前标题二章节号写入F列
-                row[5].value = f"{config.LAST_HEADING_1}.{config.LAST_HEADING_2}"
-
-            # 将G列内容转换为整数，作为要打开的Word文档名
-            try:
-                x_word_file = f"{g_column_value}.docx"
-                # 检查对应的Word文件是否存在
-                if os.path.exists(x_word_file):
-                    print(f"处理第{row_count}行 - 正在处理关联Word文件: {x_word_file}")
-                    x_document = word_processor.load_word(x_word_file)
-                    # 复制文件和图片
-                    for block in DocumentProcessor.iter_block_items(x_document):
-                        if isinstance(block, docx.text.paragraph.Paragraph):
-                            paragraph = block
-                            if paragraph.style.name.startswith('Heading'):
-                                if paragraph.style.name == 'Heading 2':
-                                    config.LAST_HEADING_2 += 1
-                                    config.LAST_HEADING_3 = 1
-                                elif paragraph.style.name == 'Heading 3':
-                                    config.LAST_HEADING_3 += 1
-                                document.add_heading(paragraph.text, level=int(paragraph.style.name[-1]))
-                            else:
-                                document.add_paragraph(paragraph.text, style='Normal')
-                        elif isinstance(block, docx.table.Table):
-                            table = block
-                            document.add_table(rows=len(table.rows), cols=len(table.columns))
-                            for i, row in enumerate(table.rows):
-                                for j, cell in enumerate(row.cells):
-                                    document.tables[-1].cell(i, j).text = cell.text
-            except ValueError:
-                print(f"处理第{row_count}行时出错 - G列值转换失败: {g_column_value}")
-                continue
-                
-            process_end_time = time.time()
-            print(f"第{row_count}行处理完成，耗时: {process_end_time - process_start_time:.2f}秒")
+            with metrics.timer("docx_seconds", operation="copy"):
+                assembler.assemble_row(plans_by_index[index], result)
+            metrics.inc("rows_total", stage="assembled")
+            print(f"第{index}行已写入标书，耗时: {time.time() - process_start_time:.2f}秒")
+            if (Config.PARTIAL_SAVE_INTERVAL > 0 and index != plans[-1].index
+                    and time.time() - last_checkpoint >= Config.PARTIAL_SAVE_INTERVAL):
+                try:
+                    with metrics.timer("docx_seconds", operation="checkpoint"):
+                        assembler.save_checkpoint(Config.OUTPUT_WORD_FILE)
+                    print(f"已保存前{reorder.next_position + 1}行的部分标书: {Config.OUTPUT_WORD_FILE}")
+                except OSError as e:
+                    # 审阅者在Windows上打开文件时无法替换，下次再试
+                    print(f"保存部分标书失败: {str(e)}")
+                last_checkpoint = time.time()
+
+        # 生成与组装同时进行：每行生成后写入断点日志，之前的行都写入标书后按顺序写入
+        reorder = ReorderBuffer([plan.index for plan in plans], assemble, Config.REORDER_BUFFER_SIZE)
+        for plan in plans:
+            if plan.index in completed:
+                reorder.put(plan.index, completed.pop(plan.index))
+
+        def on_row_done(plan: RowPlan, shortened_title: str, optimized_description: str) -> None:
+            result = assembler.build_result(plan, shortened_title, optimized_description)
+            journal.record(result)
+            metrics.inc("rows_total", stage="generated")
+            print(f"第{plan.index}行生成完成")
+            reorder.put(plan.index, result)
+
+        print(f"开始处理Excel数据（并发数: {Config.MAX_WORKERS}{'，异步模式' if Config.ASYNC_MODE else ''}）...")
+        generate_start_time = time.time()
+        RowGenerator(Config.MAX_WORKERS, Config.ASYNC_MODE, Config.TITLE_BATCH_SIZE, Config.DEDUP_MODE).generate(
+            pending_plans, on_row_done, followers, reorder)
+        journal.sync()
+        if not reorder.done:
+            raise RuntimeError(f"第{reorder.order[reorder.next_position]}行未生成，无法完成组装")
+        metrics.observe("stage_seconds", time.time() - generate_start_time, stage="generate")
+        print(f"AI内容生成和组装完成，耗时: {time.time() - generate_start_time:.2f}秒，"
+              f"缓冲峰值{reorder.peak}行")
 
         # 保存更新后的Excel文件到output目录
-        workbook.save(Config.OUTPUT_EXCEL_FILE)
+        with metrics.timer("excel_seconds", operation="save"):
+            if excel_writer is not None:
+                excel_writer.save()
+                workbook.close()
+            else:
+                workbook.save(Config.OUTPUT_EXCEL_FILE)
         print(f"Excel文件保存完成: {Config.OUTPUT_EXCEL_FILE}")
 
         # 保存最终Word文档到output目录
-        word_processor.save_word(document, Config.OUTPUT_WORD_FILE)
+        with metrics.timer("docx_seconds", operation="save"):
+            word_processor.save_word(document, Config.OUTPUT_WORD_FILE)
         print(f"Word文件保存完成: {Config.OUTPUT_WORD_FILE}")
 
         end_time = time.time()
         total_time = end_time - start_time
         print(f"\n程序执行完成!")
         print(f"总共处理了{row_count}行数据")
+        cache_stats = section_cache.stats()
+        print(f"章节缓存: 命中{cache_stats['hits']}次, 解析{cache_stats['misses']}次, "
+              f"淘汰{cache_stats['evictions']}次")
+        if Config.HEDGE_ENABLED:
+            hedge_stats = HedgedProvider.stats()
+            requests_total = hedge_stats.get('requests', 0)
+            wins = ", ".join(f"{name}胜出{hedge_stats.get(f'wins_{name}', 0)}次"
+                             f"（{hedge_stats.get(f'wins_{name}', 0) / requests_total * 100 if requests_total else 0:.0f}%）"
+                             for name in ("baidu", "openai"))
+            print(f"对冲请求: 共{requests_total}次，触发对冲{hedge_stats.get('hedged', 0)}次，{wins}")
         print(f"总耗时: {total_time:.2f}秒")
 
     except Exception as e:
         print(f"程序执行出错: {str(e)}")
         raise
+    finally:
+        if Config.METRICS_ENABLED:
+            metrics.stop_periodic_flush()
+            metrics.observe("stage_seconds", time.time() - start_time, stage="total")
+            try:
+                metrics.write(Config.METRICS_JSON_FILE, Config.METRICS_PROM_FILE)
+                print(f"运行指标已导出: {Config.METRICS_JSON_FILE}, {Config.METRICS_PROM_FILE}")
+            except Exception as e:
+                print(f"导出运行指标失败: {str(e)}")
+        if journal is not None:
+            journal.close()
+        if AIService.cache is not None:
+            stats = AIService.cache.stats()
+            print(f"AI应答缓存: 命中{stats['hits']}次, 未命中{stats['misses']}次, 写入{stats['writes']}次")
+            AIService.cache.close()
+            AIService.cache = None
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="根据需求对应表生成标书")
+    parser.add_argument("--resume", action="store_true", help="从断点日志续跑，跳过已完成的行")
+    args = parser.parse_args()
+    main(resume=args.resume)
@@ -0,0 +1,227 @@
+"""
+图片元数据工具
+
+只读取图片文件头获取尺寸，不解码像素，供 Generate.py 和 Extract_Word.py 共用。
+
+主要功能：
+- 解析 PNG/JPEG/GIF/BMP/EMF 文件头中的宽高和分辨率
+- 按图片部件内容哈希缓存解析结果
+- 一次遍历 run 元素同时取得 a:blip 引用和 wp:extent 尺寸
+"""
+
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from docx.oxml.ns import qn
+
+EMU_PER_CM = 360000
+CM_PER_INCH = 2.54
+DEFAULT_DPI = 96.0
+
+BLIP_TAG = qn('a:blip')
+EXTENT_TAG = qn('wp:extent')
+EMBED_ATTR = qn('r:embed')
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    """图片文件头中读取的尺寸信息"""
+    format: str
+    width_px: int
+    height_px: int
+    dpi_x: float = DEFAULT_DPI
+    dpi_y: float = DEFAULT_DPI
+
+    def size_cm(self, dpi: Optional[float] = None) -> Tuple[float, float]:
+        """按分辨率换算为厘米，dpi 为空时使用文件头中的分辨率"""
+        dpi_x = dpi or self.dpi_x or DEFAULT_DPI
+        dpi_y = dpi or self.dpi_y or DEFAULT_DPI
+        return (self.width_px / dpi_x * CM_PER_INCH,
+                self.height_px / dpi_y * CM_PER_INCH)
+
+
+def _probe_png(data: bytes) -> Optional[ImageInfo]:
+    if len(data) < 24 or data[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', data[16:24])
+    dpi_x = dpi_y = DEFAULT_DPI
+    # pHYs 必须出现在 IDAT 之前，只扫描像素数据之前的块
+    pos = 8
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+        if chunk_type == b'pHYs' and length >= 9 and pos + 17 <= len(data):
+            ppu_x, ppu_y, unit = struct.unpack('>IIB', data[pos + 8:pos + 17])
+            if unit == 1 and ppu_x and ppu_y:  # 每米像素数
+                dpi_x, dpi_y = ppu_x * 0.0254, ppu_y * 0.0254
+            break
+        pos += 12 + length
+    return ImageInfo('png', width, height, dpi_x, dpi_y)
+
+
+# 携带图像尺寸的 SOF 标记（排除 DHT/JPG/DAC）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                     0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _probe_jpeg(data: bytes) -> Optional[ImageInfo]:
+    dpi_x = dpi_y = DEFAULT_DPI
+    pos = 2
+    size = len(data)
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # 填充字节
+            pos += 1
+            continue
+        if marker in (0x01,) or 0xD0 <= marker <= 0xD7:  # 无长度字段的标记
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):  # EOI/SOS 之后是压缩数据
+            return None
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        segment = data[pos + 4:pos + 2 + length]
+        if marker == 0xE0 and segment[:5] == b'JFIF\x00' and len(segment) >= 12:
+            unit, density_x, density_y = struct.unpack('>BHH', segment[7:12])
+            if density_x and density_y:
+                if unit == 1:
+                    dpi_x, dpi_y = float(density_x), float(density_y)
+                elif unit == 2:
+                    dpi_x, dpi_y = density_x * CM_PER_INCH, density_y * CM_PER_INCH
+        elif marker in _JPEG_SOF_MARKERS and len(segment) >= 5:
+            height, width = struct.unpack('>HH', segment[1:5])
+            return ImageInfo('jpeg', width, height, dpi_x, dpi_y)
+        pos += 2 + length
+    return None
+
+
+def _probe_gif(data: bytes) -> Optional[ImageInfo]:
+    if len(data) < 10:
+        return None
+    width, height = struct.unpack('<HH', data[6:10])
+    return ImageInfo('gif', width, height)
+
+
+def _probe_bmp(data: bytes) -> Optional[ImageInfo]:
+    if len(data) < 26:
+        return None
+    header_size = struct.unpack('<I', data[14:18])[0]
+    if header_size == 12:  # OS/2 BITMAPCOREHEADER
+        width, height = struct.unpack('<HH', data[18:22])
+        return ImageInfo('bmp', width, height)
+    width, height = struct.unpack('<ii', data[18:26])
+    dpi_x = dpi_y = DEFAULT_DPI
+    if header_size >= 40 and len(data) >= 46:
+        ppm_x, ppm_y = struct.unpack('<ii', data[38:46])
+        if ppm_x > 0 and ppm_y > 0:
+            dpi_x, dpi_y = ppm_x * 0.0254, ppm_y * 0.0254
+    return ImageInfo('bmp', abs(width), abs(height), dpi_x, dpi_y)
+
+
+def _probe_emf(data: bytes) -> Optional[ImageInfo]:
+    if len(data) < 44 or data[40:44] != b' EMF':
+        return None
+    # rclFrame 以 0.01 毫米为单位，按默认分辨率折算为像素
+    left, top, right, bottom = struct.unpack('<iiii', data[24:40])
+    width_px = round((right - left) / 1000 / CM_PER_INCH * DEFAULT_DPI)
+    height_px = round((bottom - top) / 1000 / CM_PER_INCH * DEFAULT_DPI)
+    return ImageInfo('emf', abs(width_px), abs(height_px))
+
+
+def probe_image(data: bytes) -> Optional[ImageInfo]:
+    """根据文件头识别图片格式并读取尺寸，无法识别时返回None"""
+    try:
+        if data.startswith(b'\x89PNG\r\n\x1a\n'):
+            return _probe_png(data)
+        if data.startswith(b'\xff\xd8'):
+            return _probe_jpeg(data)
+        if data[:6] in (b'GIF87a', b'GIF89a'):
+            return _probe_gif(data)
+        if data.startswith(b'BM'):
+            return _probe_bmp(data)
+        if data[:4] == b'\x01\x00\x00\x00':
+            return _probe_emf(data)
+    except struct.error:
+        pass
+    return None
+
+
+class ImageInfoCache:
+    """按内容哈希缓存图片尺寸，同一截图在多个章节出现时只解析一次"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Optional[ImageInfo]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, blob: bytes, content_hash: Optional[str] = None) -> Optional[ImageInfo]:
+        """读取图片尺寸，content_hash 为空时按 sha1 计算"""
+        key = content_hash or hashlib.sha1(blob).hexdigest()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        info = probe_image(blob)
+        with self._lock:
+            self._entries[key] = info
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return info
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+image_info_cache = ImageInfoCache()
+
+
+def image_part_info(image_part) -> Optional[ImageInfo]:
+    """读取图片部件的尺寸，优先使用 python-docx 已计算的 sha1 作为缓存键"""
+    content_hash = getattr(image_part, 'sha1', None)
+    return image_info_cache.get(image_part.blob, content_hash)
+
+
+def find_run_image(run_element) -> Optional[Tuple[str, Optional[float], Optional[float]]]:
+    """一次遍历 run 元素，返回 (关系ID, 宽厘米, 高厘米)，没有图片时返回None
+
+    wp:extent 存在时直接使用文档中记录的显示尺寸，否则宽高为None。
+    """
+    embed = None
+    extent = None
+    for element in run_element.iter(BLIP_TAG, EXTENT_TAG):
+        if element.tag == BLIP_TAG:
+            if embed is None:
+                embed = element.get(EMBED_ATTR)
+        elif extent is None:
+            extent = element
+        if embed is not None and extent is not None:
+            break
+    if embed is None:
+        return None
+    if extent is None:
+        return embed, None, None
+    return (embed, int(extent.get('cx')) / EMU_PER_CM,
+            int(extent.get('cy')) / EMU_PER_CM)
+
+
+def run_image_size_cm(run, embed: str, width_cm: Optional[float],
+                      height_cm: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+    """补全缺失的显示尺寸：没有 wp:extent 时按文件头的像素和分辨率换算"""
+    if width_cm is not None and height_cm is not None:
+        return width_cm, height_cm
+    info = image_part_info(run.part.related_parts[embed])
+    if info is None:
+        return None, None
+    return info.size_cm()
@@ -0,0 +1,183 @@
+"""
+大模型调用压测工具
+
+通过Generate.py中的百度/OpenAI调用类向替身服务（或任意兼容服务）发送请求，
+统计吞吐量和延迟分位数，用于调优并发数、限流和重试配置。
+
+用法：
+    python Load_Test.py --provider baidu --requests 200 --concurrency 16 --throttle-rate 0.05
+    python Load_Test.py --provider openai --url http://127.0.0.1:8765/ --async --concurrency 64
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.request import urlopen
+
+from Fake_LLM_Server import FakeLLMServer, add_settings_arguments, settings_from_args
+from Generate import BaiduAPI, Config, GenerationProfile, OpenAIAPI, RateLimiter
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    """最近秩法计算分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # 最近秩：第ceil(p*n)个值（从1计数）；先舍入消除浮点误差，例如0.28*25=7.000000000000001
+    index = min(len(ordered) - 1, max(0, math.ceil(round(ratio * len(ordered), 9)) - 1))
+    return ordered[index]
+
+
+def build_prompts(count: int, title_ratio: float = 0.5) -> List[Tuple[str, GenerationProfile]]:
+    """生成标题和方案两类提示词及其生成限制，按title_ratio交替"""
+    title_profile = GenerationProfile.for_task("title")
+    solution_profile = GenerationProfile.for_task("solution")
+    prompts = []
+    for i in range(count):
+        requirement = f"需求{i + 1}：支持可视化创建不同类型数据源，包括传统数据库、文件系统、消息队列等"
+        if (i * title_ratio) % 1 + title_ratio >= 1:
+            prompts.append((f"{Config.PROMPT_TITLE}'{requirement}'", title_profile))
+        else:
+            prompts.append((f"{Config.PROMPT_CONTENT} {requirement}", solution_profile))
+    return prompts
+
+
+def configure(provider: str, url: str) -> type:
+    """把调用类指向压测地址，返回调用类"""
+    Config.USE_BAIDU = provider == "baidu"
+    if provider == "baidu":
+        Config.BAIDU_API_BASE = url
+        Config.BAIDU_API_KEY = Config.BAIDU_API_KEY or "load-test"
+        Config.BAIDU_SECRET_KEY = Config.BAIDU_SECRET_KEY or "load-test"
+        BaiduAPI.token_manager.invalidate()
+    else:
+        Config.OPENAI_API_BASE = f"{url.rstrip('/')}/v1/"
+        Config.OPENAI_API_KEY = Config.OPENAI_API_KEY or "load-test"
+        OpenAIAPI.reset_client()
+    RateLimiter.reset()
+    return BaiduAPI if provider == "baidu" else OpenAIAPI
+
+
+def run_threads(api, prompts: List[Tuple[str, GenerationProfile]], concurrency: int) -> List[Tuple[float, bool]]:
+    """用线程池并发调用，返回每个请求的（耗时, 是否成功）"""
+    def call(item: Tuple[str, GenerationProfile]) -> Tuple[float, bool]:
+        start = time.perf_counter()
+        try:
+            api.call_api(*item)
+            return time.perf_counter() - start, True
+        except Exception:
+            return time.perf_counter() - start, False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(call, prompts))
+
+
+def run_async(api, prompts: List[Tuple[str, GenerationProfile]], concurrency: int) -> List[Tuple[float, bool]]:
+    """用异步HTTP并发调用，返回每个请求的（耗时, 是否成功）"""
+    async def run_all() -> List[Tuple[float, bool]]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(item: Tuple[str, GenerationProfile]) -> Tuple[float, bool]:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await api.acall_api(*item)
+                    return time.perf_counter() - start, True
+                except Exception:
+                    return time.perf_counter() - start, False
+
+        return await asyncio.gather(*(call(item) for item in prompts))
+
+    return asyncio.run(run_all())
+
+
+def summarize(samples: List[Tuple[float, bool]], elapsed: float) -> Dict[str, float]:
+    """汇总吞吐量和延迟分位数（只统计成功的请求）"""
+    latencies = [seconds for seconds, ok in samples if ok]
+    return {
+        "requests": len(samples),
+        "succeeded": len(latencies),
+        "failed": len(samples) - len(latencies),
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p90": percentile(latencies, 0.90),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies, default=0.0),
+    }
+
+
+def fetch_server_stats(url: str) -> Optional[Dict[str, int]]:
+    """读取替身服务的统计，非替身服务时返回None"""
+    try:
+        with urlopen(f"{url.rstrip('/')}/stats", timeout=5) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except Exception:
+        return None
+
+
+def run_load_test(provider: str, url: str, requests: int, concurrency: int,
+                  use_async: bool = False, title_ratio: float = 0.5, quiet: bool = True) -> Dict:
+    """对指定地址压测，返回汇总结果"""
+    api = configure(provider, url)
+    prompts = build_prompts(requests, title_ratio)
+    output = io.StringIO() if quiet else sys.stdout
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        samples = (run_async if use_async else run_threads)(api, prompts, max(1, concurrency))
+    summary = summarize(samples, time.perf_counter() - start)
+    summary.update({"provider": provider, "concurrency": concurrency, "async": use_async})
+    return summary
+
+
+def print_summary(summary: Dict, server_stats: Optional[Dict[str, int]]) -> None:
+    print(f"提供商: {summary['provider']}，并发: {summary['concurrency']}"
+          f"{'（异步）' if summary['async'] else ''}")
+    print(f"请求: {summary['requests']}，成功: {summary['succeeded']}，失败: {summary['failed']}，"
+          f"耗时: {summary['elapsed_seconds']:.2f}秒，吞吐: {summary['throughput_rps']:.1f}次/秒")
+    print(f"延迟(秒): p50={summary['p50']:.3f} p90={summary['p90']:.3f} p95={summary['p95']:.3f} "
+          f"p99={summary['p99']:.3f} max={summary['max']:.3f}")
+    if server_stats:
+        print(f"服务端: {json.dumps(server_stats, ensure_ascii=False)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数"""
+    parser = argparse.ArgumentParser(description='大模型调用压测（默认启动内置替身服务）')
+    parser.add_argument('--provider', choices=['baidu', 'openai'], default='baidu', help='调用的提供商接口')
+    parser.add_argument('--url', help='已运行的服务地址；不指定时在本进程内启动替身服务')
+    parser.add_argument('--requests', type=int, default=200, help='请求总数')
+    parser.add_argument('--concurrency', type=int, default=Config.MAX_WORKERS, help='并发数')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='使用异步HTTP并发')
+    parser.add_argument('--title-ratio', type=float, default=0.5, help='标题类请求的比例')
+    parser.add_argument('--json', dest='json_output', help='把结果写入JSON文件')
+    parser.add_argument('--verbose', action='store_true', help='显示调用过程中的重试日志')
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        url = args.url
+        if url is None:
+            url = stack.enter_context(FakeLLMServer(settings_from_args(args))).url
+            print(f"已启动内置替身服务: {url}")
+        summary = run_load_test(args.provider, url, args.requests, args.concurrency,
+                                args.use_async, args.title_ratio, quiet=not args.verbose)
+        server_stats = fetch_server_stats(url)
+
+    print_summary(summary, server_stats)
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({"summary": summary, "server": server_stats}, f, ensure_ascii=False, indent=2)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+需求近似重复检测
+
+需求对应表中同一条需求常在不同章节换个说法重复出现。本模块在本地对C列文本做
+字符shingle和MinHash签名，用LSH分桶找出候选，再按精确Jaccard相似度确认，
+把近似重复的需求聚成一簇，生成时每簇只调用一次大模型。
+
+主要功能：
+- 文本归一化（忽略空白、标点和大小写）并切分字符shingle
+- MinHash签名与LSH分桶，避免两两比较
+- 以每簇第一条需求为代表的聚类，簇内每条需求都与代表足够相似
+- 输出合并情况的JSON报告
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+NORMALIZE_PATTERN = re.compile(r'[\W_]+', re.UNICODE)
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_text(text: Any) -> str:
+    """去掉空白和标点并转为小写，中文字符保持不变"""
+    if text is None:
+        return ""
+    return NORMALIZE_PATTERN.sub("", str(text)).lower()
+
+
+def shingles(text: Any, size: int = 3) -> Set[str]:
+    """切分字符shingle，文本短于size时整体作为一个shingle"""
+    normalized = normalize_text(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """精确Jaccard相似度"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash签名和LSH分桶
+
+    签名长度为bands * rows，相似度为s的两条文本至少有一个分桶相同的概率为
+    1 - (1 - s^rows)^bands；分桶只用于找候选，是否合并由精确相似度决定。
+    """
+
+    def __init__(self, bands: int = 8, rows: int = 4, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+                             for _ in range(bands * rows)]
+
+    @staticmethod
+    def hash_shingle(shingle: str) -> int:
+        """shingle的64位稳定哈希（不受PYTHONHASHSEED影响）"""
+        return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def signature(self, shingle_set: Set[str]) -> Tuple[int, ...]:
+        """计算MinHash签名"""
+        hashes = [self.hash_shingle(shingle) for shingle in shingle_set]
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.permutations)
+
+    def band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        """把签名切分为LSH分桶键"""
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+
+@dataclass
+class RequirementCluster:
+    """一簇近似重复需求，代表需求负责生成，其余成员复用其应答"""
+    leader: int
+    members: List[int] = field(default_factory=list)
+    similarities: Dict[int, float] = field(default_factory=dict)
+
+
+def find_near_duplicates(items: Sequence[Tuple[int, Any]], threshold: float = 0.85,
+                         shingle_size: int = 3, hasher: Optional[MinHasher] = None) -> List[RequirementCluster]:
+    """按表格顺序聚类近似重复需求
+
+    每条需求只与已有各簇的代表比较，取相似度最高且不低于threshold的一簇加入，
+    否则自成一簇；这样簇内每条需求都与代表足够相似，不会因传递链合并无关需求。
+
+    Args:
+        items: （行号, 需求文本）列表，按表格顺序
+        threshold: Jaccard相似度阈值，1表示仅合并归一化后完全相同的需求
+        shingle_size: 字符shingle长度
+        hasher: MinHash参数，为空时使用默认参数
+
+    Returns:
+        含至少一个成员的簇列表，按代表行号排列
+    """
+    hasher = hasher or MinHasher()
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    leader_shingles: Dict[int, Set[str]] = {}
+    clusters: Dict[int, RequirementCluster] = {}
+
+    for index, text in items:
+        shingle_set = shingles(text, shingle_size)
+        if not shingle_set:
+            continue
+        keys = hasher.band_keys(hasher.signature(shingle_set))
+
+        best_leader, best_similarity = None, 0.0
+        candidates = {leader for key in keys for leader in buckets.get(key, ())}
+        for leader in sorted(candidates):
+            similarity = jaccard(shingle_set, leader_shingles[leader])
+            if similarity >= threshold and similarity > best_similarity:
+                best_leader, best_similarity = leader, similarity
+
+        if best_leader is None:
+            leader_shingles[index] = shingle_set
+            for key in keys:
+                buckets.setdefault(key, []).append(index)
+            continue
+        cluster = clusters.setdefault(best_leader, RequirementCluster(best_leader))
+        cluster.members.append(index)
+        cluster.similarities[index] = round(best_similarity, 4)
+
+    return [clusters[leader] for leader in sorted(clusters)]
+
+
+def write_cluster_report(path: Path, clusters: List[RequirementCluster], texts: Dict[int, Any],
+                         threshold: float, mode: str) -> None:
+    """把合并的簇写入JSON报告，便于人工核对复用是否合理"""
+    report = {
+        "threshold": threshold,
+        "mode": mode,
+        "clusters": len(clusters),
+        "merged_rows": sum(len(cluster.members) for cluster in clusters),
+        "items": [{
+            "leader": {"row": cluster.leader, "text": texts.get(cluster.leader)},
+            "members": [{"row": member, "similarity": cluster.similarities[member], "text": texts.get(member)}
+                        for member in cluster.members],
+        } for cluster in clusters],
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
@@ -0,0 +1,98 @@
+"""
+命令行入口
+
+把拆分、建索引、生成、批量生成、基准测试和压测汇总为子命令。各子命令在执行时才导入对应模块，
+只拆分文档或查看帮助时不会加载大模型SDK、HTTP客户端和openpyxl，也不会读取.env或创建目录。
+
+用法：
+    python ProposalLLM.py extract data/input/产品说明书.docx --output-dir data/sections
+    python ProposalLLM.py index --output-dir data/sections
+    python ProposalLLM.py generate --resume
+    python ProposalLLM.py batch data/batch --workers 4
+    python ProposalLLM.py benchmark --rows 200
+    python ProposalLLM.py load-test --provider openai --async
+    python ProposalLLM.py fake-server --port 8765
+"""
+
+import argparse
+import sys
+from typing import List, Optional
+
+
+def run_extract(args: argparse.Namespace, rest: List[str]) -> int:
+    from Extract_Word import main as extract_main
+    extract_main(rest)
+    return 0
+
+
+def run_index(args: argparse.Namespace, rest: List[str]) -> int:
+    from Extract_Word import main as extract_main
+    extract_main(['--reindex'] + rest)
+    return 0
+
+
+def run_generate(args: argparse.Namespace, rest: List[str]) -> int:
+    from Generate import main as generate_main
+    generate_main(resume=args.resume)
+    return 0
+
+
+def run_batch(args: argparse.Namespace, rest: List[str]) -> int:
+    from Batch_Generate import main as batch_main
+    return batch_main(rest)
+
+
+def run_benchmark(args: argparse.Namespace, rest: List[str]) -> int:
+    from Benchmark import main as benchmark_main
+    return benchmark_main(rest)
+
+
+def run_load_test(args: argparse.Namespace, rest: List[str]) -> int:
+    from Load_Test import main as load_test_main
+    return load_test_main(rest)
+
+
+def run_fake_server(args: argparse.Namespace, rest: List[str]) -> int:
+    from Fake_LLM_Server import main as fake_server_main
+    fake_server_main(rest)
+    return 0
+
+
+# 子命令 -> (说明, 处理函数)；这些子命令的参数原样交给对应模块解析
+PASSTHROUGH_COMMANDS = {
+    'extract': ('按标题层级拆分产品说明书，生成章节清单和检索索引（Extract_Word.py）', run_extract),
+    'index': ('根据已拆分的章节重建检索索引，不重新拆分', run_index),
+    'batch': ('多标书批量生成（Batch_Generate.py）', run_batch),
+    'benchmark': ('文档流水线基准测试（Benchmark.py）', run_benchmark),
+    'load-test': ('大模型调用压测（Load_Test.py）', run_load_test),
+    'fake-server': ('启动本地大模型替身服务（Fake_LLM_Server.py）', run_fake_server),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构造命令行解析器"""
+    parser = argparse.ArgumentParser(prog='ProposalLLM', description='标书生成工具')
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='命令')
+
+    generate = subparsers.add_parser('generate', help='根据需求对应表生成标书（Generate.py）')
+    generate.add_argument('--resume', action='store_true', help='从断点日志续跑，跳过已完成的行')
+    generate.set_defaults(handler=run_generate, passthrough=False)
+
+    for name, (help_text, handler) in PASSTHROUGH_COMMANDS.items():
+        # 不添加-h，帮助由对应模块输出
+        command = subparsers.add_parser(name, help=help_text, add_help=False)
+        command.set_defaults(handler=handler, passthrough=True)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数，返回退出码"""
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if rest and not args.passthrough:
+        parser.error(f"无法识别的参数: {' '.join(rest)}")
+    return args.handler(args, rest) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
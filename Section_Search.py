@@ -0,0 +1,148 @@
+"""
+章节全文检索
+
+为Extract_Word.py拆分出的章节建立本地BM25倒排索引，供Generate.py在G列为空时
+按C列需求文本查找最匹配的产品手册章节。
+
+主要功能：
+- 中文按字二元组（bigram）切分，英文和数字按词切分并转为小写
+- 倒排表只保存词频，查询时按BM25公式累加得分，数千个章节时单次查询在毫秒级
+- 索引以JSON保存在章节目录中，与章节清单放在一起
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INDEX_NAME = 'sections_index.json'
+INDEX_VERSION = 1
+
+CJK_RANGES = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+TOKEN_PATTERN = re.compile(f'[{CJK_RANGES}]+|[0-9a-zA-Z]+')
+CJK_PATTERN = re.compile(f'[{CJK_RANGES}]')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """切分检索词：连续中文切为二元组（单字时保留单字），英文数字按词切分"""
+    if not text:
+        return []
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(str(text)):
+        word = match.group()
+        if CJK_PATTERN.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+class BM25Index:
+    """BM25倒排索引
+
+    倒排表保存每个词出现的（章节序号, 词频），章节长度归一化系数在加载时一次算好，
+    查询只需遍历查询词的倒排表累加得分。
+    归一化得分为原始得分除以各查询词的idf之和，即每个查询词在平均长度章节中恰好出现一次时为1，
+    与章节数量和查询长度无关，便于设定统一阈值（结果截断到1）。
+    出现在超过max_df_ratio比例章节中的词（如"支持""系统"）idf接近0，查询时跳过，
+    避免遍历最长的倒排表。
+    """
+
+    MAX_DF_RATIO = 0.5
+
+    def __init__(self, keys: List[str], lengths: List[int], postings: Dict[str, List[int]],
+                 k1: float = 1.5, b: float = 0.75):
+        self.keys = keys
+        self.lengths = lengths
+        self.postings = postings
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(keys)
+        avg_length = (sum(lengths) / self.doc_count) if self.doc_count else 0.0
+        self.norms = [k1 * (1 - b + b * length / avg_length) if avg_length else k1 for length in lengths]
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """根据（章节号, 文本）建立索引"""
+        keys: List[str] = []
+        lengths: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        for doc_id, (key, text) in enumerate(documents):
+            tokens = tokenize(text)
+            keys.append(key)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).extend((doc_id, tf))
+        return cls(keys, lengths, postings, k1, b)
+
+    def idf(self, term: str) -> float:
+        """词的逆文档频率，索引中没有的词按文档频率0计算"""
+        df = len(self.postings.get(term, ())) // 2
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, float, float]]:
+        """检索最匹配的章节
+
+        Returns:
+            （章节号, 原始得分, 归一化得分）列表，按得分从高到低
+        """
+        query_terms = Counter(tokenize(query))
+        if not query_terms or not self.doc_count:
+            return []
+        k1_plus_1 = self.k1 + 1
+        norms = self.norms
+        scores: Dict[int, float] = {}
+        ceiling = 0.0
+        max_entries = 2 * self.MAX_DF_RATIO * self.doc_count
+        for term, count in query_terms.items():
+            entries = self.postings.get(term, ())
+            if len(entries) > max_entries and self.doc_count > 1:
+                continue
+            idf = self.idf(term)
+            ceiling += idf * count
+            if not entries:
+                continue
+            factor = idf * k1_plus_1 * count
+            for i in range(0, len(entries), 2):
+                doc_id, tf = entries[i], entries[i + 1]
+                scores[doc_id] = scores.get(doc_id, 0.0) + factor * tf / (tf + norms[doc_id])
+        if not scores:
+            return []
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.keys[doc_id], score, min(1.0, score / ceiling)) for doc_id, score in best]
+
+    def to_dict(self) -> Dict:
+        """转换为可保存的字典"""
+        return {'version': INDEX_VERSION, 'k1': self.k1, 'b': self.b,
+                'keys': self.keys, 'lengths': self.lengths, 'postings': self.postings}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        """从字典恢复索引"""
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"不支持的章节索引版本: {data.get('version')}")
+        return cls(data['keys'], data['lengths'], data['postings'], data['k1'], data['b'])
+
+    def save(self, path: Path) -> None:
+        """原子写入索引文件"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        """读取索引文件"""
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def __len__(self) -> int:
+        return self.doc_count
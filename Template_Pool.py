@@ -0,0 +1,117 @@
+"""
+Word模板池
+
+每次调用docx.Document()都要从磁盘打开并解析整个模板包（样式、编号、主题、设置等）。
+模板池对每个模板只解析一次：清空正文，去掉正文不再引用的图片、超链接、页眉页脚等关系，
+得到一个只保留样式和页面设置的底板；之后每个新文档从底板克隆，XML部件用lxml深拷贝，
+图片等二进制部件共享只读的字节内容，不再解析模板。
+
+拆分章节（Extract_Word.py）和生成标书（Generate.py）共用本模块，输出文档使用模板中的样式。
+每个进程按模板路径缓存一个模板池，并行拆分的工作进程也只解析一次模板。
+
+用法：
+    pool = TemplatePool.shared('data/templates/Template.docx')
+    doc = pool.new_document()
+"""
+
+import copy
+import os
+import threading
+from typing import Dict, Optional
+
+from docx import Document
+from docx.document import Document as _Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part, XmlPart
+from docx.oxml.ns import qn
+from docx.package import Package
+
+# 由正文或节属性通过r:id引用的关系，清空正文后不再被引用的会被删除；
+# 样式、编号、设置、主题等文档级关系没有r:id引用，始终保留
+BODY_RELATIONSHIPS = {
+    RT.IMAGE, RT.HYPERLINK, RT.HEADER, RT.FOOTER, RT.CHART, RT.OLE_OBJECT, RT.PACKAGE,
+    RT.DIAGRAM_DATA, RT.DIAGRAM_LAYOUT, RT.DIAGRAM_QUICK_STYLE, RT.DIAGRAM_COLORS,
+}
+
+
+class TemplatePool:
+    """解析一次模板，按需克隆新文档"""
+
+    _pools: Dict[Optional[str], 'TemplatePool'] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, template_path: Optional[str] = None):
+        """
+        Args:
+            template_path: 模板文件路径，为None时使用python-docx的默认模板
+        """
+        self.template_path = str(template_path) if template_path else None
+        self._base: Optional[_Document] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, template_path: Optional[str] = None) -> 'TemplatePool':
+        """返回本进程中该模板路径对应的模板池"""
+        key = os.path.abspath(template_path) if template_path else None
+        with cls._pools_lock:
+            if key not in cls._pools:
+                cls._pools[key] = cls(key)
+            return cls._pools[key]
+
+    def base_document(self) -> _Document:
+        """解析模板并清空正文，只在首次调用时执行"""
+        if self._base is None:
+            with self._lock:
+                if self._base is None:
+                    try:
+                        document = Document(self.template_path)
+                    except Exception as e:
+                        print(f"加载模板失败: {self.template_path}, {str(e)}")
+                        raise
+                    self._base = self.clear_body(document)
+        return self._base
+
+    @staticmethod
+    def clear_body(document: _Document) -> _Document:
+        """删除正文内容（保留节属性），并删除正文不再引用的关系"""
+        body = document.element.body
+        for child in list(body):
+            if child.tag != qn('w:sectPr'):
+                body.remove(child)
+
+        part = document.part
+        referenced = set(document.element.xpath('//@r:id | //@r:embed | //@r:link'))
+        for rId, rel in list(part.rels.items()):
+            if rel.reltype in BODY_RELATIONSHIPS and rId not in referenced:
+                part.drop_rel(rId)
+        return document
+
+    def new_document(self) -> _Document:
+        """克隆一个空白文档"""
+        return clone_document(self.base_document())
+
+
+def clone_document(document: _Document) -> _Document:
+    """克隆文档包：XML部件深拷贝，二进制部件共享字节内容，关系和rId保持不变"""
+    package = Package()
+    clones: Dict[Part, Part] = {}
+
+    def clone_part(part: Part) -> Part:
+        if part in clones:
+            return clones[part]
+        if isinstance(part, XmlPart):
+            clone = part.__class__(part.partname, part.content_type, copy.deepcopy(part.element), package)
+        else:
+            clone = part.__class__.load(part.partname, part.content_type, part.blob, package)
+        clones[part] = clone
+        for rId, rel in part.rels.items():
+            target = rel.target_ref if rel.is_external else clone_part(rel.target_part)
+            clone.load_rel(rel.reltype, target, rId, rel.is_external)
+        return clone
+
+    for rId, rel in document.part.package.rels.items():
+        target = rel.target_ref if rel.is_external else clone_part(rel.target_part)
+        package.load_rel(rel.reltype, target, rId, rel.is_external)
+    # 登记页眉页脚等部件中的图片，新插入的图片不会与其重名
+    package.after_unmarshal()
+    return package.main_document_part.document
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from Batch_Generate import discover_jobs, run_batch
+from Benchmark import build_matrix, build_proposal
+from Fake_LLM_Server import FakeLLMServer, ServerSettings
+from Generate import Config
+
+
+class TestBatchGenerate(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.jobs_dir = self.test_dir / "jobs"
+        for name, rows in (("A", 3), ("B", 5)):
+            job_dir = self.jobs_dir / name
+            job_dir.mkdir(parents=True)
+            build_matrix(job_dir / "需求对应表.xlsx", rows, [])
+            build_proposal(job_dir / "标书内容.docx")
+
+    def tearDown(self):
+        """测试后的清理"""
+        shutil.rmtree(self.test_dir)
+
+    def test_discover_jobs(self):
+        """测试从任务目录和JSON清单读取任务"""
+        print("\n开始测试任务发现...")
+        (self.jobs_dir / "empty").mkdir()
+        jobs = discover_jobs(self.jobs_dir, self.test_dir / "out")
+        self.assertEqual([job.name for job in jobs], ["A", "B"])
+        self.assertEqual(jobs[0].output_dir, self.test_dir / "out" / "A")
+        self.assertIsNone(jobs[0].sections_dir)
+
+        manifest = self.test_dir / "jobs.json"
+        manifest.write_text(json.dumps({"jobs": [
+            {"name": "B2", "excel": "jobs/B/需求对应表.xlsx", "word": "jobs/B/标书内容.docx", "sections": "manual"},
+            {"excel": "jobs/A/需求对应表.xlsx", "word": "jobs/A/标书内容.docx", "output_dir": "custom"},
+        ]}), encoding='utf-8')
+        jobs = discover_jobs(manifest, self.test_dir / "out")
+        self.assertEqual([job.name for job in jobs], ["B2", "A"])
+        self.assertEqual(jobs[0].sections_dir, self.test_dir / "manual")
+        self.assertEqual(jobs[1].output_dir, self.test_dir / "custom")
+        overrides = jobs[1].config_overrides()
+        self.assertEqual(overrides["OUTPUT_WORD_FILE"].parent, self.test_dir / "custom")
+        self.assertEqual(overrides["SECTIONS_DIR"], Config.SECTIONS_DIR)
+
+        manifest.write_text(json.dumps({"jobs": [
+            {"name": "A", "excel": "a.xlsx", "word": "a.docx"},
+            {"name": "A", "excel": "b.xlsx", "word": "b.docx"},
+        ]}), encoding='utf-8')
+        with self.assertRaises(ValueError):
+            discover_jobs(manifest, self.test_dir / "out")
+
+    def test_run_batch(self):
+        """测试两个进程并行执行任务，失败的任务不影响其他任务"""
+        print("\n开始测试批量生成...")
+        broken = self.jobs_dir / "C"
+        broken.mkdir()
+        (broken / "需求对应表.xlsx").write_bytes(b"not a workbook")
+        build_proposal(broken / "标书内容.docx")
+        output_root = self.test_dir / "out"
+
+        with FakeLLMServer(ServerSettings(latency="fixed", latency_ms=0)) as server:
+            env = {"USE_BAIDU": "true", "BAIDU_API_BASE": server.url, "BAIDU_API_KEY": "test",
+                   "BAIDU_SECRET_KEY": "test", "LLM_CACHE_ENABLED": "false", "HEDGE_ENABLED": "false",
+                   "SECTIONS_DIR": str(self.test_dir / "sections")}
+            with patch.dict(os.environ, env):
+                status = run_batch(discover_jobs(self.jobs_dir, output_root), output_root, workers=2)
+
+        self.assertEqual(status["summary"]["succeeded"], 2)
+        self.assertEqual(status["summary"]["failed"], 1)
+        self.assertEqual(status["summary"]["rows"], 8)
+        self.assertEqual(status["jobs"]["A"]["rows"], 3)
+        self.assertEqual(status["jobs"]["C"]["status"], "failed")
+        for name in ("A", "B"):
+            self.assertTrue((output_root / name / "标书内容_输出.docx").exists())
+            self.assertTrue((output_root / name / "run.log").exists())
+        saved = json.loads((output_root / "batch_status.json").read_text(encoding='utf-8'))
+        self.assertEqual(saved["summary"]["rows"], 8)
+
+    def test_config_restored_between_jobs(self):
+        """测试同一工作进程先后执行两个任务，后一个任务不沿用前一个任务的章节目录"""
+        print("\n开始测试任务间配置恢复...")
+        (self.jobs_dir / "A" / "sections").mkdir()
+        output_root = self.test_dir / "out"
+        default_sections = self.test_dir / "sections"
+
+        with FakeLLMServer(ServerSettings(latency="fixed", latency_ms=0)) as server:
+            env = {"USE_BAIDU": "true", "BAIDU_API_BASE": server.url, "BAIDU_API_KEY": "test",
+                   "BAIDU_SECRET_KEY": "test", "LLM_CACHE_ENABLED": "false", "HEDGE_ENABLED": "false",
+                   "SECTIONS_DIR": str(default_sections)}
+            with patch.dict(os.environ, env):
+                jobs = discover_jobs(self.jobs_dir, output_root)
+                status = run_batch(jobs, output_root, workers=1)
+
+        self.assertEqual(status["summary"]["succeeded"], 2)
+        self.assertEqual(jobs[0].sections_dir, self.jobs_dir / "A" / "sections")
+        self.assertIsNone(jobs[1].sections_dir)
+        self.assertEqual(status["jobs"]["A"]["pid"], status["jobs"]["B"]["pid"])
+        log_a = (output_root / "A" / "run.log").read_text(encoding='utf-8')
+        log_b = (output_root / "B" / "run.log").read_text(encoding='utf-8')
+        self.assertIn(str(jobs[0].sections_dir), log_a)
+        self.assertIn(str(default_sections), log_b)
+        self.assertNotIn(str(jobs[0].sections_dir), log_b)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from Benchmark import compare, run_benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmark_small(self):
+        """测试小规模输入跑通全部阶段"""
+        print("\n开始测试基准测试流程...")
+        params = {"headings": 7, "paragraphs": 2, "tables": 1, "images": 1, "rows": 6}
+        result = run_benchmark(params, repeat=1)
+        self.assertEqual(result["params"], params)
+        self.assertEqual(result["sections"], 7)
+        for stage in ("extract", "section_lookup", "section_search", "section_parse", "assemble",
+                      "docx_save", "excel_save"):
+            self.assertIn(stage, result["stages"])
+        self.assertGreater(result["stages"]["assemble"]["median"], 0)
+        print("基准测试流程测试完成")
+
+    def test_compare(self):
+        """测试超出容差的阶段才报告为回退"""
+        baseline = {"stages": {"extract": {"median": 1.0}, "assemble": {"median": 0.01}}}
+        result = {"stages": {"extract": {"median": 1.2}, "assemble": {"median": 0.03},
+                             "docx_save": {"median": 5.0}}}
+        self.assertEqual(compare(result, baseline, tolerance=0.25), [])
+
+        result["stages"]["extract"]["median"] = 1.5
+        regressions = compare(result, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("extract"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,17 @@
+import hashlib
+import io
+import json
+import tempfile
 import unittest
+import zipfile
 from pathlib import Path
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.shared import Cm
 from docx.table import _Cell
+from Benchmark import make_png
 from Extract_Word import DocumentProcessor
+from Section_Search import BM25Index
 
 class TestDocumentProcessor(unittest.TestCase):
     def setUp(self):
@@ -85,5 +94,137 @@ class TestDocumentProcessor(unittest.TestCase):
                 self.assertEqual(run.font.name, "宋体")
         print("单元格字体设置功能测试完成")
 
+    def test_process_document_manifest(self):
+        """测试拆分文档并生成章节清单"""
+        print("\n开始测试章节清单生成...")
+        doc = Document()
+        doc.add_heading("概述", level=1)
+        doc.add_paragraph("概述内容")
+        doc.add_heading("功能", level=2)
+        doc.add_paragraph("功能内容")
+        doc.add_heading("结尾", level=2)
+        doc.save(str(self.test_doc_path))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            processor = DocumentProcessor(output_dir)
+            processor.process_document(str(self.test_doc_path))
+
+            with open(Path(output_dir) / DocumentProcessor.MANIFEST_NAME, encoding='utf-8') as f:
+                sections = json.load(f)['sections']
+            print(f"章节清单: {sections}")
+            self.assertEqual(sorted(sections), ['1', '1.1'])
+            for entry in sections.values():
+                section_file = Path(output_dir) / entry['path']
+                self.assertTrue(section_file.exists())
+                self.assertEqual(entry['size'], section_file.stat().st_size)
+
+            index = BM25Index.load(Path(output_dir) / DocumentProcessor.INDEX_NAME)
+            self.assertEqual(index.search("功能内容")[0][0], '1.1')
+            processor.rebuild_search_index()
+            self.assertEqual(BM25Index.load(Path(output_dir) / DocumentProcessor.INDEX_NAME).keys,
+                             index.keys)
+        print("章节清单生成测试完成")
+
+    def test_streaming_extraction(self):
+        """测试流式拆分与常规拆分输出相同的图片和尺寸，超出预算的章节分块写入"""
+        print("\n开始测试流式拆分...")
+        doc = Document()
+        pictures = [make_png(64, 48, seed) for seed in range(3)]
+        for i in range(3):
+            doc.add_heading(f"模块{i + 1}", level=1)
+            doc.add_paragraph(f"模块{i + 1}内容")
+            for picture in pictures + pictures[:1]:
+                doc.add_paragraph().add_run().add_picture(io.BytesIO(picture), width=Cm(20))
+        doc.add_heading("附录", level=1)
+        doc.save(str(self.test_doc_path))
+
+        def media(path):
+            with zipfile.ZipFile(path) as archive:
+                return sorted(archive.read(name) for name in archive.namelist() if name.startswith('word/media/'))
+
+        with tempfile.TemporaryDirectory() as eager_dir, tempfile.TemporaryDirectory() as stream_dir:
+            DocumentProcessor(eager_dir).process_document(str(self.test_doc_path))
+            processor = DocumentProcessor(stream_dir, memory_budget_mb=0.0001)
+            processor.process_document(str(self.test_doc_path))
+            self.assertIsNone(processor.source_archive)
+
+            for key, entry in processor.manifest.items():
+                eager_file = Path(eager_dir) / entry['path']
+                stream_file = Path(stream_dir) / entry['path']
+                self.assertEqual(media(stream_file), media(eager_file))
+                self.assertEqual(len(media(stream_file)), 3)
+                self.assertEqual([(shape.width, shape.height) for shape in Document(str(stream_file)).inline_shapes],
+                                 [(shape.width, shape.height) for shape in Document(str(eager_file)).inline_shapes])
+                self.assertEqual(entry['sha256'], hashlib.sha256(stream_file.read_bytes()).hexdigest())
+                self.assertEqual(entry['size'], stream_file.stat().st_size)
+            self.assertEqual(processor.section_texts.keys(), {'1', '2', '3'})
+        print("流式拆分测试完成")
+
+    def test_parallel_extraction(self):
+        """测试并行拆分的文件名、编号、清单顺序和检索文本与顺序拆分相同"""
+        print("\n开始测试并行拆分...")
+        doc = Document()
+        picture = make_png(32, 32, 1)
+        for i in range(12):
+            doc.add_heading(f"模块{i + 1}", level=1 if i % 4 == 0 else 2)
+            doc.add_paragraph(f"模块{i + 1}内容")
+            doc.add_paragraph(f"模块{i + 1}列表项", style='List Paragraph')
+            doc.add_paragraph().add_run().add_picture(io.BytesIO(picture), width=Cm(4))
+        doc.add_heading("附录", level=1)
+        doc.save(str(self.test_doc_path))
+
+        with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as parallel_dir:
+            serial = DocumentProcessor(serial_dir)
+            serial.process_document(str(self.test_doc_path))
+            parallel = DocumentProcessor(parallel_dir, workers=2)
+            parallel.MAX_PENDING_PER_WORKER = 1
+            parallel.process_document(str(self.test_doc_path))
+
+            self.assertEqual(list(parallel.manifest), list(serial.manifest))
+            self.assertEqual([entry['path'] for entry in parallel.manifest.values()],
+                             [entry['path'] for entry in serial.manifest.values()])
+            self.assertEqual(parallel.section_texts, serial.section_texts)
+            self.assertIsNone(parallel.executor)
+            for entry in parallel.manifest.values():
+                section_file = Path(parallel_dir) / entry['path']
+                self.assertEqual(entry['sha256'], hashlib.sha256(section_file.read_bytes()).hexdigest())
+                self.assertEqual([p.text for p in Document(str(section_file)).paragraphs],
+                                 [p.text for p in Document(str(Path(serial_dir) / entry['path'])).paragraphs])
+        print("并行拆分测试完成")
+
+    def test_template_sections(self):
+        """测试章节文档使用模板样式，不带模板正文和正文图片，保留页眉图片且新图片不重名"""
+        print("\n开始测试章节模板...")
+        template = Document()
+        template.styles.add_style('House Body', WD_STYLE_TYPE.PARAGRAPH)
+        template.add_paragraph("模板正文")
+        template.add_paragraph().add_run().add_picture(io.BytesIO(make_png(16, 16, 2)))
+        template.sections[0].header.paragraphs[0].add_run().add_picture(io.BytesIO(make_png(8, 8, 3)))
+        template_path = self.test_dir / "template.docx"
+        template.save(str(template_path))
+
+        doc = Document()
+        doc.add_heading("模块", level=1)
+        doc.add_paragraph("模块内容")
+        doc.add_paragraph().add_run().add_picture(io.BytesIO(make_png(32, 32, 1)), width=Cm(4))
+        doc.add_heading("附录", level=1)
+        doc.save(str(self.test_doc_path))
+
+        try:
+            with tempfile.TemporaryDirectory() as output_dir:
+                processor = DocumentProcessor(output_dir, memory_budget_mb=0.0001, template=str(template_path))
+                processor.process_document(str(self.test_doc_path))
+                section = Document(str(Path(output_dir) / processor.manifest['1']['path']))
+                self.assertIn('House Body', [style.name for style in section.styles])
+                self.assertEqual([p.text for p in section.paragraphs], ["模块内容", ""])
+                with zipfile.ZipFile(Path(output_dir) / processor.manifest['1']['path']) as archive:
+                    media = sorted(name for name in archive.namelist() if name.startswith('word/media/'))
+                self.assertEqual(len(media), 2)
+                self.assertEqual(len(section.inline_shapes), 1)
+                self.assertEqual(len(section.sections[0].header.part.package.image_parts), 2)
+        finally:
+            template_path.unlink()
+        print("章节模板测试完成")
+
 if __name__ == '__main__':
     unittest.main()
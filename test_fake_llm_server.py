@@ -0,0 +1,131 @@
+import asyncio
+import json
+import unittest
+from urllib.request import Request, urlopen
+
+from Fake_LLM_Server import FakeLLMServer, ServerSettings, canned_answer
+from Generate import (BaiduAPI, Config, GenerationProfile, HedgedProvider, LatencyTracker, OpenAIAPI,
+                      RateLimiter, RetryableAPIError)
+from Load_Test import percentile, run_load_test
+
+
+class TestFakeLLMServer(unittest.TestCase):
+    CONFIG_KEYS = ['BAIDU_API_BASE', 'BAIDU_API_KEY', 'BAIDU_SECRET_KEY', 'OPENAI_API_BASE',
+                   'OPENAI_API_KEY', 'USE_BAIDU', 'RETRY_MAX_ATTEMPTS', 'RETRY_BASE_DELAY',
+                   'HEDGE_MIN_SAMPLES', 'HEDGE_INITIAL_DELAY', 'HEDGE_MIN_DELAY', 'HEDGE_PERCENTILE']
+
+    def setUp(self):
+        """测试前的设置"""
+        self.original = {key: getattr(Config, key) for key in self.CONFIG_KEYS}
+        Config.RETRY_BASE_DELAY = 0.01
+
+    def tearDown(self):
+        """测试后的清理"""
+        for key, value in self.original.items():
+            setattr(Config, key, value)
+        BaiduAPI.token_manager.invalidate()
+        OpenAIAPI.reset_client()
+        RateLimiter.reset()
+
+    def test_baidu_and_openai(self):
+        """测试百度令牌、百度对话和OpenAI对话接口返回确定的应答"""
+        print("\n开始测试替身服务...")
+        prompt = f"{Config.PROMPT_TITLE}'支持多数据源'"
+        with FakeLLMServer(ServerSettings(latency="fixed", latency_ms=0)) as server:
+            Config.BAIDU_API_BASE = server.url
+            Config.BAIDU_API_KEY = Config.BAIDU_SECRET_KEY = "test"
+            BaiduAPI.token_manager.invalidate()
+            self.assertEqual(BaiduAPI.call_api(prompt), canned_answer(prompt))
+
+            Config.OPENAI_API_BASE = f"{server.url}v1/"
+            Config.OPENAI_API_KEY = "test"
+            OpenAIAPI.reset_client()
+            self.assertEqual(OpenAIAPI.call_api(prompt), canned_answer(prompt))
+            self.assertEqual(asyncio.run(OpenAIAPI.acall_api(prompt)), canned_answer(prompt))
+
+            with urlopen(Request(f"{server.url}stats")) as response:
+                stats = json.loads(response.read().decode('utf-8'))
+        self.assertEqual((stats["token"], stats["baidu"], stats["openai"]), (1, 1, 2))
+        print("替身服务测试完成")
+
+    def test_throttling(self):
+        """测试限流错误被识别为可重试错误"""
+        Config.RETRY_MAX_ATTEMPTS = 2
+        with FakeLLMServer(ServerSettings(latency="fixed", latency_ms=0, throttle_rate=1.0)) as server:
+            Config.BAIDU_API_BASE = server.url
+            Config.BAIDU_API_KEY = Config.BAIDU_SECRET_KEY = "test"
+            BaiduAPI.token_manager.invalidate()
+            with self.assertRaises(RetryableAPIError):
+                BaiduAPI.call_api("需求")
+            self.assertEqual(server.stats()["throttled"], 2)
+
+    def test_hedged_requests(self):
+        """测试主提供商超时后备用提供商胜出，主提供商失败时立即改用备用提供商"""
+        print("\n开始测试对冲请求...")
+        prompt = f"{Config.PROMPT_TITLE}'支持多数据源'"
+        profile = GenerationProfile.for_task("title")
+        Config.HEDGE_MIN_SAMPLES = 100
+        Config.HEDGE_INITIAL_DELAY = 0.05
+        with FakeLLMServer(ServerSettings(latency="fixed", latency_ms=1000)) as slow, \
+                FakeLLMServer(ServerSettings(latency="fixed", latency_ms=0)) as fast:
+            Config.USE_BAIDU = True
+            Config.BAIDU_API_BASE = slow.url
+            Config.BAIDU_API_KEY = Config.BAIDU_SECRET_KEY = "test"
+            Config.OPENAI_API_BASE = f"{fast.url}v1/"
+            Config.OPENAI_API_KEY = "test"
+            BaiduAPI.token_manager.invalidate()
+            OpenAIAPI.reset_client()
+            HedgedProvider.reset()
+
+            self.assertEqual(HedgedProvider.call_api(prompt, profile), canned_answer(prompt))
+            self.assertEqual(asyncio.run(HedgedProvider.acall_api(prompt, profile)), canned_answer(prompt))
+            self.assertEqual(HedgedProvider.stats(), {"requests": 2, "hedged": 2, "wins_openai": 2})
+
+            Config.USE_BAIDU = False
+            Config.RETRY_MAX_ATTEMPTS = 1
+            Config.OPENAI_API_BASE = "http://127.0.0.1:9/v1/"
+            OpenAIAPI.reset_client()
+            Config.HEDGE_INITIAL_DELAY = 30
+            self.assertEqual(HedgedProvider.call_api(prompt, profile), canned_answer(prompt))
+            self.assertEqual(HedgedProvider.stats()["wins_baidu"], 1)
+        print("对冲请求测试完成")
+
+    def test_latency_deadline(self):
+        """测试等待时间取近期耗时的分位数"""
+        Config.HEDGE_MIN_SAMPLES = 5
+        Config.HEDGE_INITIAL_DELAY = 30
+        Config.HEDGE_MIN_DELAY = 0.5
+        Config.HEDGE_PERCENTILE = 0.9
+        tracker = LatencyTracker()
+        self.assertEqual(tracker.deadline("title"), 30)
+        for seconds in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]:
+            tracker.record("title", seconds)
+        self.assertEqual(tracker.deadline("title"), 9)
+        for _ in range(5):
+            tracker.record("solution", 0.1)
+        self.assertEqual(tracker.deadline("solution"), 0.5)
+
+    def test_canned_title_batch(self):
+        """测试批量标题返回可解析的JSON数组"""
+        prompt = f"{Config.PROMPT_TITLE_BATCH}" + json.dumps([{"id": 1, "text": "a"}, {"id": 2, "text": "b"}])
+        items = json.loads(canned_answer(prompt))
+        self.assertEqual([item["id"] for item in items], [1, 2])
+
+    def test_load_test(self):
+        """测试压测汇总"""
+        self.assertEqual(percentile([0.3, 0.1, 0.2, 0.4], 0.5), 0.2)
+        self.assertEqual(percentile([0.3, 0.1, 0.2, 0.4], 0.99), 0.4)
+        self.assertEqual(percentile(range(1, 11), 0.9), 9)
+        self.assertEqual(percentile(range(1, 11), 0.5), 5)
+        self.assertEqual(percentile(range(1, 7), 0.5), 3)
+        self.assertEqual(percentile(range(1, 26), 0.28), 7)
+        self.assertEqual(percentile(range(1, 11), 0.0), 1)
+        self.assertEqual(percentile(range(1, 11), 1.0), 10)
+        with FakeLLMServer(ServerSettings(latency="uniform", latency_ms=5, seed=1)) as server:
+            summary = run_load_test("openai", server.url, requests=20, concurrency=4, use_async=True)
+        self.assertEqual((summary["succeeded"], summary["failed"]), (20, 0))
+        self.assertGreater(summary["throughput_rps"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
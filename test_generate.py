@@ -1,8 +1,31 @@
+import asyncio
+import email.utils
+import io
+import json
 import unittest
 import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from unittest.mock import patch, MagicMock
+import docx
+import httpx
 import openai
-from Generate import Config, BaiduAPI, OpenAIAPI, AIService
+from openpyxl import Workbook, load_workbook
+from Generate import (Config, BaiduAPI, OpenAIAPI, AIService, OutlinePlanner, RowGenerator,
+                      ResponseCache, TokenBucket, RetryPolicy, RetryableAPIError, AsyncHTTPClient,
+                      RunJournal, RowResult, SectionIndex, SectionCache, StreamingExcelWriter,
+                      ProposalAssembler, ParsedSection, Metrics, metrics, GenerationProfile,
+                      ReorderBuffer, WordProcessor, parse_retry_after)
+from Benchmark import make_png
+from Section_Search import BM25Index
+
+
+def make_row(b_value=None, c_value=None, g_value=None):
+    """构造模拟的Excel数据行"""
+    values = [None, b_value, c_value, None, None, None, g_value]
+    return tuple(MagicMock(value=value) for value in values)
 
 class TestConfig(unittest.TestCase):
     """测试配置类"""
@@ -51,10 +74,46 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(Config.OPENAI_MAX_TOKENS, 1000)
         print("配置初始化测试完成")
 
+    def test_invalid_stop_sequences(self):
+        """测试停止序列格式错误时报告配置项名称"""
+        try:
+            for value in ('[oops', '"\\n"', '[1]'):
+                with patch.dict(os.environ, {'SOLUTION_STOP': value}):
+                    with self.assertRaisesRegex(ValueError, 'SOLUTION_STOP'):
+                        Config.reload()
+            with patch.dict(os.environ, {'TITLE_STOP': '["。", "\\n"]'}):
+                Config.reload()
+            self.assertEqual(Config.TITLE_STOP, ['。', '\n'])
+        finally:
+            # 按恢复后的环境变量重新加载，避免配置泄漏到后续测试
+            Config.reload()
+
+    def test_invalid_modes(self):
+        """测试取值有限的配置项拒绝未知取值"""
+        try:
+            for name in ('DEDUP_MODE', 'SECTION_MATCH_MODE'):
+                with patch.dict(os.environ, {name: 'adapted'}):
+                    with self.assertRaisesRegex(ValueError, name):
+                        Config.reload()
+            with patch.dict(os.environ, {'DEDUP_MODE': 'Adapt'}):
+                Config.reload()
+            self.assertEqual(Config.DEDUP_MODE, 'adapt')
+        finally:
+            # 按恢复后的环境变量重新加载，避免配置泄漏到后续测试
+            Config.reload()
+
 class TestBaiduAPI(unittest.TestCase):
     """测试百度API类"""
 
-    @patch('requests.post')
+    def setUp(self):
+        """测试前的设置"""
+        BaiduAPI.token_manager.invalidate()
+
+    def tearDown(self):
+        """测试后的清理"""
+        BaiduAPI.token_manager.invalidate()
+
+    @patch('requests.Session.post')
     def test_get_access_token(self, mock_post):
         """测试获取访问令牌"""
         print("\n开始测试获取访问令牌...")
@@ -67,6 +126,7 @@ class TestBaiduAPI(unittest.TestCase):
         self.assertEqual(token, 'test_token')
         
         # 模拟失败响应
+        BaiduAPI.token_manager.invalidate()
         mock_post.return_value.json.return_value = {
             'error': 'error',
             'error_description': 'test error'
@@ -76,6 +136,42 @@ class TestBaiduAPI(unittest.TestCase):
             BaiduAPI.get_access_token()
         print("获取访问令牌测试完成")
 
+    @patch('requests.Session.post')
+    def test_access_token_cached(self, mock_post):
+        """测试访问令牌缓存与失效"""
+        print("\n开始测试访问令牌缓存...")
+        mock_post.return_value.json.return_value = {
+            'access_token': 'test_token',
+            'expires_in': 3600
+        }
+
+        self.assertEqual(BaiduAPI.get_access_token(), 'test_token')
+        self.assertEqual(BaiduAPI.get_access_token(), 'test_token')
+        self.assertEqual(mock_post.call_count, 1)
+
+        # 失效后重新获取
+        BaiduAPI.token_manager.invalidate('test_token')
+        BaiduAPI.get_access_token()
+        self.assertEqual(mock_post.call_count, 2)
+        print("访问令牌缓存测试完成")
+
+    @patch('time.sleep')
+    @patch('Generate.BaiduAPI.get_access_token')
+    def test_call_api_retries_qps_limit(self, mock_get_token, mock_sleep):
+        """测试QPS超限时退避重试"""
+        print("\n开始测试百度API限流重试...")
+        mock_get_token.return_value = 'test_token'
+        throttled = MagicMock(status_code=200)
+        throttled.json.return_value = {'error_code': 18, 'error_msg': 'Open api qps request limit reached'}
+        succeeded = MagicMock(status_code=200)
+        succeeded.json.return_value = {'result': 'test result', 'usage': {'total_tokens': 10}}
+
+        with patch('requests.Session.post') as mock_post:
+            mock_post.side_effect = [throttled, throttled, succeeded]
+            self.assertEqual(BaiduAPI.call_api('test prompt'), 'test result')
+            self.assertEqual(mock_post.call_count, 3)
+        print("百度API限流重试测试完成")
+
     @patch('Generate.BaiduAPI.get_access_token')
     def test_call_api(self, mock_get_token):
         """测试API调用"""
@@ -84,7 +180,7 @@ class TestBaiduAPI(unittest.TestCase):
         mock_get_token.return_value = 'test_token'
         
         # 模拟请求失败
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_post.side_effect = Exception('test error')
             with self.assertRaises(Exception):
                 BaiduAPI.call_api('test prompt')
@@ -93,6 +189,14 @@ class TestBaiduAPI(unittest.TestCase):
 class TestOpenAIAPI(unittest.TestCase):
     """测试OpenAI API类"""
 
+    def setUp(self):
+        """测试前的设置"""
+        OpenAIAPI.reset_client()
+
+    def tearDown(self):
+        """测试后的清理"""
+        OpenAIAPI.reset_client()
+
     def test_initialize(self):
         """测试初始化"""
         print("\n开始测试OpenAI API初始化...")
@@ -101,19 +205,92 @@ class TestOpenAIAPI(unittest.TestCase):
         self.assertEqual(openai.api_base, Config.OPENAI_API_BASE)
         print("OpenAI API初始化测试完成")
 
-    @patch('openai.ChatCompletion.create')
-    def test_call_api(self, mock_create):
+    @patch('openai.OpenAI')
+    def test_call_api(self, mock_client_class):
         """测试API调用"""
         print("\n开始测试OpenAI API调用...")
         # 模拟OpenAI API响应
-        mock_create.return_value = MagicMock(
-            choices=[MagicMock(message=MagicMock(content='test response'))]
+        mock_client_class.return_value.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content='test response'))],
+            usage=MagicMock(total_tokens=10)
         )
         
         response = OpenAIAPI.call_api('test prompt')
         self.assertEqual(response, 'test response')
         print("OpenAI API调用测试完成")
 
+class TestAsyncProviders(unittest.TestCase):
+    """测试异步HTTP调用"""
+
+    def run_with_transport(self, handler, coro_func):
+        """使用模拟传输层执行异步调用"""
+        async def runner():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with patch.object(AsyncHTTPClient, 'get_client', return_value=client):
+                try:
+                    return await coro_func()
+                finally:
+                    await client.aclose()
+        return asyncio.run(runner())
+
+    def test_openai_acall_api(self):
+        """测试异步OpenAI调用"""
+        print("\n开始测试异步OpenAI调用...")
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request)
+            return httpx.Response(200, json={
+                'choices': [{'message': {'content': ' async response '}}],
+                'usage': {'total_tokens': 10}
+            })
+
+        result = self.run_with_transport(handler, lambda: OpenAIAPI.acall_api('test prompt'))
+        self.assertEqual(result, 'async response')
+        self.assertTrue(str(requests_seen[0].url).endswith('/chat/completions'))
+        self.assertEqual(requests_seen[0].headers['Authorization'], f"Bearer {Config.OPENAI_API_KEY}")
+        print("异步OpenAI调用测试完成")
+
+    @patch('asyncio.sleep')
+    @patch('Generate.BaiduAPI.get_access_token')
+    def test_baidu_acall_api_retries(self, mock_get_token, mock_sleep):
+        """测试异步百度调用在服务端错误后重试"""
+        mock_get_token.return_value = 'test_token'
+        responses = [httpx.Response(503), httpx.Response(200, json={'result': 'async result'})]
+
+        result = self.run_with_transport(lambda request: responses.pop(0),
+                                         lambda: BaiduAPI.acall_api('test prompt'))
+        self.assertEqual(result, 'async result')
+        self.assertEqual(responses, [])
+
+    @patch('asyncio.sleep')
+    @patch('Generate.BaiduAPI.get_access_token')
+    def test_non_json_and_http_date_responses(self, mock_get_token, mock_sleep):
+        """测试Retry-After为HTTP日期时仍按429重试，非JSON错误内容给出明确错误"""
+        print("\n开始测试非JSON响应...")
+        mock_get_token.return_value = 'test_token'
+        responses = [httpx.Response(429, headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}),
+                     httpx.Response(200, json={'result': 'async result'})]
+        result = self.run_with_transport(lambda request: responses.pop(0),
+                                         lambda: BaiduAPI.acall_api('test prompt'))
+        self.assertEqual(result, 'async result')
+
+        html = lambda request: httpx.Response(404, text='<html>Not Found</html>')
+        with self.assertRaises(Exception) as context:
+            self.run_with_transport(html, lambda: OpenAIAPI.acall_api('test prompt'))
+        self.assertNotIsInstance(context.exception, ValueError)
+        self.assertIn('HTTP 404 返回内容不是JSON', str(context.exception))
+
+        forbidden = MagicMock(status_code=403, text='<html>Forbidden</html>')
+        forbidden.json.side_effect = ValueError('Expecting value')
+        with patch('requests.Session.post', return_value=forbidden):
+            with self.assertRaises(Exception) as context:
+                BaiduAPI.call_api('test prompt')
+        self.assertNotIsInstance(context.exception, ValueError)
+        self.assertIn('HTTP 403 返回内容不是JSON', str(context.exception))
+        print("非JSON响应测试完成")
+
+
 class TestAIService(unittest.TestCase):
     """测试AI服务类"""
 
@@ -155,5 +332,710 @@ class TestAIService(unittest.TestCase):
         self.assertEqual(result, 'short text')
         print("文本缩短测试完成")
 
+    @patch('Generate.AIService.get_ai_provider')
+    def test_shorten_texts_batch(self, mock_get_provider):
+        """测试批量生成标题及解析失败时逐条回退"""
+        print("\n开始测试批量标题生成...")
+        mock_provider = MagicMock()
+        mock_provider.call_api.side_effect = [
+            '结果如下：[{"id": 1, "title": "标题一。"}, {"id": 3, "title": "标题三"}]',
+            '标题二',
+        ]
+        mock_get_provider.return_value = mock_provider
+
+        result = AIService.shorten_texts(['需求一', '需求二', '需求三'])
+        self.assertEqual(result, ['标题一', '标题二', '标题三'])
+        self.assertEqual(mock_provider.call_api.call_count, 2)
+        print("批量标题生成测试完成")
+
+    def test_parse_title_batch(self):
+        """测试批量标题应答解析"""
+        self.assertEqual(AIService.parse_title_batch('["甲", "乙"]', 2), ['甲', '乙'])
+        self.assertEqual(AIService.parse_title_batch('["甲"]', 2), [None, None])
+        self.assertEqual(AIService.parse_title_batch('无法解析', 2), [None, None])
+
+class TestGenerationProfile(unittest.TestCase):
+    """测试按任务区分的生成限制"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.original = {key: getattr(Config, key) for key in [
+            'TITLE_MAX_TOKENS', 'TITLE_STOP', 'TITLE_MAX_INPUT_CHARS', 'MODEL_CONTEXT_TOKENS',
+            'SOLUTION_MAX_INPUT_CHARS']}
+
+    def tearDown(self):
+        """测试后的清理"""
+        for key, value in self.original.items():
+            setattr(Config, key, value)
+
+    def test_profiles(self):
+        """测试读取配置、截断输入和批量放大"""
+        print("\n开始测试生成限制...")
+        Config.TITLE_MAX_TOKENS = 20
+        Config.TITLE_STOP = ["\n"]
+        Config.TITLE_MAX_INPUT_CHARS = 5
+        profile = GenerationProfile.for_task("title")
+        self.assertEqual((profile.max_tokens, profile.stop), (20, ("\n",)))
+        self.assertEqual(profile.truncate("一二三四五六七"), "一二三四五…")
+        batch = profile.for_batch(3)
+        self.assertEqual(batch.stop, ())
+        self.assertEqual(batch.max_tokens, (20 + GenerationProfile.BATCH_ITEM_OVERHEAD) * 3)
+        self.assertNotEqual(profile.cache_identity(), GenerationProfile.for_task("solution").cache_identity())
+
+        payload = BaiduAPI.build_payload("提示词", profile)
+        self.assertEqual((payload["max_output_tokens"], payload["stop"]), (20, ["\n"]))
+        self.assertEqual(BaiduAPI.build_payload("提示词", None), {"messages": [{"role": "user", "content": "提示词"}]})
+        self.assertEqual(OpenAIAPI.build_options(profile)["max_tokens"], 20)
+        print("生成限制测试完成")
+
+    @patch('Generate.AIService.get_ai_provider')
+    def test_shorten_text_uses_title_profile(self, mock_get_provider):
+        """测试标题请求使用标题限制并截断输入"""
+        Config.TITLE_MAX_INPUT_CHARS = 4
+        mock_provider = MagicMock()
+        mock_provider.call_api.return_value = '标题'
+        mock_get_provider.return_value = mock_provider
+
+        AIService.shorten_text('很长很长的需求说明')
+        prompt, profile = mock_provider.call_api.call_args[0]
+        self.assertEqual(profile.name, "title")
+        self.assertTrue(prompt.endswith("'很长很长…'"))
+
+    def test_warn_oversized_requirements(self):
+        """测试生成前检查超出上下文的需求"""
+        Config.MODEL_CONTEXT_TOKENS = 2000
+        Config.SOLUTION_MAX_INPUT_CHARS = 0
+        oversized = AIService.warn_oversized_requirements([(1, '短需求'), (2, '长' * 3000), (3, None)])
+        self.assertEqual(oversized, [2])
+        Config.SOLUTION_MAX_INPUT_CHARS = 200
+        Config.TITLE_MAX_INPUT_CHARS = 200
+        self.assertEqual(AIService.warn_oversized_requirements([(2, '长' * 3000)]), [])
+
+
+class TestRateLimiting(unittest.TestCase):
+    """测试限流与重试"""
+
+    @patch('time.monotonic')
+    def test_token_bucket(self, mock_monotonic):
+        """测试令牌桶预约等待时间"""
+        print("\n开始测试令牌桶...")
+        mock_monotonic.return_value = 100.0
+        bucket = TokenBucket(60, burst=2)  # 每秒1个令牌
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        self.assertAlmostEqual(bucket.reserve(), 2.0)
+
+        mock_monotonic.return_value = 103.0
+        self.assertEqual(bucket.reserve(), 0.0)
+        print("令牌桶测试完成")
+
+    @patch('time.sleep')
+    def test_retry_policy(self, mock_sleep):
+        """测试可重试错误的退避重试"""
+        policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=10)
+        func = MagicMock(side_effect=[RetryableAPIError('429'), 'ok'])
+        self.assertEqual(policy.run(func), 'ok')
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertGreaterEqual(policy.delay(0, retry_after=5), 5)
+
+        func = MagicMock(side_effect=RetryableAPIError('429'))
+        with self.assertRaises(RetryableAPIError):
+            policy.run(func)
+        self.assertEqual(func.call_count, 3)
+
+        # 不可重试的错误直接抛出
+        func = MagicMock(side_effect=ValueError('bad request'))
+        with self.assertRaises(ValueError):
+            policy.run(func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_parse_retry_after(self):
+        """测试Retry-After的秒数和HTTP日期两种格式"""
+        self.assertEqual(parse_retry_after('5'), 5.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        future = email.utils.format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(future), 30, delta=2)
+
+
+class TestResponseCache(unittest.TestCase):
+    """测试AI应答缓存类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(Path(self.temp_dir.name) / "cache.sqlite3")
+
+    def tearDown(self):
+        """测试后的清理"""
+        AIService.cache = None
+        Config.RE_GENERATE_TEXT = 0
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_get_put(self):
+        """测试缓存读写与命中统计"""
+        print("\n开始测试应答缓存读写...")
+        key = ResponseCache.make_key(('openai', 'gpt-4', 0.7), '模板', '需求')
+        self.assertNotEqual(key, ResponseCache.make_key(('openai', 'gpt-4', 0.5), '模板', '需求'))
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, '应答')
+        self.assertEqual(self.cache.get(key), '应答')
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'writes': 1})
+        print("应答缓存读写测试完成")
+
+    def test_evict(self):
+        """测试按年龄和大小淘汰"""
+        self.cache.put('old', 'x')
+        self.cache.max_age = -1
+        self.assertEqual(self.cache.evict(), 1)
+
+        self.cache.max_age = 3600
+        self.cache.max_bytes = 10
+        for i in range(5):
+            self.cache.put(f'key{i}', 'abcd')
+        self.cache.evict()
+        self.assertIsNone(self.cache.get('key0'))
+        self.assertEqual(self.cache.get('key4'), 'abcd')
+
+    def test_evict_during_run(self):
+        """测试运行中写入时按大小上限淘汰，不必等到关闭"""
+        self.cache.max_bytes = 1000
+        for i in range(300):
+            self.cache.put(f'key{i}', 'x' * 10)
+        total = self.cache._conn.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+        self.assertLessEqual(total, 1000 * 1.1)
+        self.assertEqual(self.cache.get('key299'), 'x' * 10)
+
+    @patch('Generate.AIService.get_ai_provider')
+    def test_ai_service_uses_cache(self, mock_get_provider):
+        """测试AI服务命中缓存与重新生成开关"""
+        mock_provider = MagicMock()
+        mock_provider.cache_identity.return_value = ('test', 'model', None)
+        mock_provider.call_api.return_value = 'test solution'
+        mock_get_provider.return_value = mock_provider
+        AIService.cache = self.cache
+
+        AIService.generate_solution('test content')
+        AIService.generate_solution('test content')
+        self.assertEqual(mock_provider.call_api.call_count, 1)
+
+        Config.RE_GENERATE_TEXT = 1
+        AIService.generate_solution('test content')
+        self.assertEqual(mock_provider.call_api.call_count, 2)
+
+
+class TestRunJournal(unittest.TestCase):
+    """测试断点续跑日志"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "journal.jsonl"
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def write_rows(self, fingerprint, count):
+        journal = RunJournal(self.path, fingerprint, fsync_every=2)
+        journal.start(resume=False)
+        for index in range(1, count + 1):
+            journal.record(RowResult(index, f"标题{index}", f"应答{index}", f"2.1.{index}",
+                                     [["heading", 3, f"标题{index}"]]))
+        journal.close()
+
+    def test_resume(self):
+        """测试续跑时读取已完成的行并容忍残缺末行"""
+        print("\n开始测试断点续跑日志...")
+        self.write_rows('abc', 3)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"type": "row", "index": 4, "ti')
+
+        journal = RunJournal(self.path, 'abc')
+        completed = journal.start(resume=True)
+        journal.close()
+        self.assertEqual(sorted(completed), [1, 2, 3])
+        self.assertEqual(completed[2].fragment, [["heading", 3, "标题2"]])
+        self.assertEqual(len(self.path.read_text(encoding='utf-8').splitlines()), 4)
+        print("断点续跑日志测试完成")
+
+    def test_fingerprint_mismatch(self):
+        """测试输入变化后不复用旧记录"""
+        self.write_rows('abc', 2)
+        journal = RunJournal(self.path, 'def')
+        self.assertEqual(journal.start(resume=True), {})
+        journal.close()
+
+
+class TestMetrics(unittest.TestCase):
+    """测试运行指标"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        metrics.reset()
+
+    def tearDown(self):
+        """测试后的清理"""
+        metrics.reset()
+        self.temp_dir.cleanup()
+
+    def test_export(self):
+        """测试计数器、直方图和采集值导出为JSON和Prometheus格式"""
+        print("\n开始测试运行指标导出...")
+        registry = Metrics()
+        registry.inc("rows_total", stage="generated")
+        registry.inc("rows_total", 2, stage="generated")
+        registry.observe("docx_seconds", 0.02, operation="save")
+        registry.observe("docx_seconds", 3.0, operation="save")
+        registry.register_collector("section_cache", lambda: {"hits": 5})
+        json_path = Path(self.temp_dir.name) / "metrics.json"
+        prom_path = Path(self.temp_dir.name) / "metrics.prom"
+        registry.write(json_path, prom_path)
+
+        snapshot = json.loads(json_path.read_text(encoding='utf-8'))
+        self.assertEqual(snapshot["counters"][0]["value"], 3)
+        histogram = snapshot["histograms"][0]
+        self.assertEqual((histogram["count"], histogram["max"]), (2, 3.0))
+        self.assertEqual(histogram["buckets"]["0.025"], 1)
+        self.assertEqual(histogram["buckets"]["5.0"], 2)
+
+        text = prom_path.read_text(encoding='utf-8')
+        self.assertIn('# TYPE proposalllm_rows_total counter', text)
+        self.assertIn('proposalllm_rows_total{stage="generated"} 3', text)
+        self.assertIn('proposalllm_docx_seconds_bucket{operation="save",le="+Inf"} 2', text)
+        self.assertIn('proposalllm_section_cache{stat="hits"} 5', text)
+        print("运行指标导出测试完成")
+
+    @patch.object(Config, 'USE_BAIDU', True)
+    @patch('Generate.AIService.get_ai_provider')
+    def test_llm_call_metrics(self, mock_get_provider):
+        """测试按提供商和操作统计AI调用耗时与成败"""
+        mock_provider = MagicMock()
+        mock_provider.call_api.side_effect = ['solution', RuntimeError('boom')]
+        mock_get_provider.return_value = mock_provider
+
+        AIService.generate_solution('需求1')
+        with self.assertRaises(RuntimeError):
+            AIService.generate_solution('需求2')
+
+        snapshot = metrics.snapshot()
+        statuses = {item["labels"]["status"]: item["value"] for item in snapshot["counters"]
+                    if item["name"] == "llm_call_total"}
+        self.assertEqual(statuses, {"ok": 1, "error": 1})
+        histogram = snapshot["histograms"][0]
+        self.assertEqual(histogram["labels"], {"operation": "generate_solution", "provider": "baidu"})
+        self.assertEqual(histogram["count"], 2)
+
+
+class TestSectionIndex(unittest.TestCase):
+    """测试章节索引类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_load_manifest(self):
+        """测试读取章节清单"""
+        print("\n开始测试章节清单读取...")
+        manifest = {'sections': {'1.2': {'path': '1.2- 标题.docx', 'title': '标题'},
+                                 '3': {'path': '3- 概述.docx', 'title': '概述'}}}
+        (self.base_dir / SectionIndex.MANIFEST_NAME).write_text(
+            json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+
+        index = SectionIndex.load(self.base_dir)
+        self.assertEqual(index.lookup(1.2), self.base_dir / '1.2- 标题.docx')
+        self.assertEqual(index.lookup(3.0), self.base_dir / '3- 概述.docx')
+        self.assertEqual(index.lookup(' 1.2.docx '), self.base_dir / '1.2- 标题.docx')
+        self.assertIsNone(index.lookup('X'))
+        self.assertIsNone(index.lookup('9.9'))
+        print("章节清单读取测试完成")
+
+    def test_scan_without_manifest(self):
+        """测试没有清单时扫描目录"""
+        for name in ['1.2.3- 标题.docx', '2.1.docx', 'notes.docx', '1.2.3- 标题.txt']:
+            (self.base_dir / name).write_bytes(b'')
+
+        index = SectionIndex.load(self.base_dir)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.lookup('1.2.3'), self.base_dir / '1.2.3- 标题.docx')
+        self.assertEqual(index.lookup(2.1), self.base_dir / '2.1.docx')
+
+
+class TestSectionCache(unittest.TestCase):
+    """测试已解析章节的LRU缓存"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for i in range(3):
+            document = docx.Document()
+            document.add_heading(f"标题{i}", level=2)
+            document.add_paragraph(f"内容{i}")
+            document.add_table(rows=1, cols=2).cell(0, 1).text = f"单元格{i}"
+            path = str(Path(self.temp_dir.name) / f"{i}.docx")
+            document.save(path)
+            self.files.append(path)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_hits_and_eviction(self):
+        """测试命中统计和按条数淘汰"""
+        print("\n开始测试章节缓存...")
+        cache = SectionCache(max_entries=2)
+        section = cache.get(self.files[0])
+        self.assertEqual(section.heading_styles, ['Heading 2'])
+        self.assertEqual(section.fragment[:2], [["heading", 2, "标题0"], ["paragraph", "内容0"]])
+        self.assertEqual(section.fragment[2][0], "table_xml")
+        self.assertIs(cache.get(self.files[0]), section)
+
+        cache.get(self.files[1])
+        cache.get(self.files[2])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['entries']), (1, 3, 1, 2))
+        print("章节缓存测试完成")
+
+    def test_invalidated_on_change(self):
+        """测试文件修改后重新解析"""
+        cache = SectionCache()
+        cache.get(self.files[0])
+        stat = os.stat(self.files[0])
+        os.utime(self.files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        cache.get(self.files[0])
+        self.assertEqual(cache.stats()['misses'], 2)
+
+
+class TestStreamingExcel(unittest.TestCase):
+    """测试Excel流式读写"""
+
+    def test_streaming_roundtrip(self):
+        """测试只读加载、逐行写出并保留其他工作表"""
+        print("\n开始测试Excel流式读写...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_file = Path(temp_dir) / "source.xlsx"
+            output_file = Path(temp_dir) / "output.xlsx"
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.title = "需求"
+            sheet.append(['序号', '类型', '说明', None, None, None, '章节'])
+            sheet.append([1, '概述', '需求一', None, None, None, 'X'])
+            sheet.append([2, None, '需求二'])
+            workbook.create_sheet("提示词").append(['提示', '内容'])
+            workbook.save(source_file)
+
+            source = load_workbook(source_file, read_only=True)
+            writer = StreamingExcelWriter(source, source.active, output_file)
+            plans = OutlinePlanner(1, 2, 0, 0).plan(source.active.iter_rows(min_row=2))
+            assembler = ProposalAssembler(docx.Document(), None, excel_writer=writer)
+            for plan in plans:
+                assembler.assemble_row(plan, RowResult(plan.index, f"标题{plan.index}", "应答", plan.chapter, []))
+            writer.save()
+            source.close()
+
+            output = load_workbook(output_file)
+            self.assertEqual(output.sheetnames, ["需求", "提示词"])
+            rows = list(output["需求"].iter_rows(values_only=True))
+            self.assertEqual(rows[0][2], '说明')
+            self.assertEqual(rows[1], (1, '概述', '需求一', '标题1', '应答', '2.1.1', 'X'))
+            self.assertEqual(rows[2][:6], (2, None, '需求二', '标题2', '应答', '2.1.2'))
+            self.assertEqual(list(output["提示词"].iter_rows(values_only=True)), [('提示', '内容')])
+        print("Excel流式读写测试完成")
+
+    def test_streaming_short_rows(self):
+        """测试只读模式下文件没有<dimension>时，末尾空列缺失的短行也能规划和写出"""
+        print("\n开始测试Excel流式短行...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_file = Path(temp_dir) / "source.xlsx"
+            output_file = Path(temp_dir) / "output.xlsx"
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.append(['序号', '类型', '说明', None, None, None, '章节'])
+            sheet.append([1, '概述', '需求一'])
+            workbook.save(source_file)
+
+            source = load_workbook(source_file, read_only=True)
+            source.active.reset_dimensions()
+            rows = list(source.active.iter_rows(min_row=2))
+            self.assertEqual(len(rows[0]), 3)
+            plans = OutlinePlanner(1, 2, 0, 0).plan(rows)
+            self.assertIsNone(plans[0].g_value)
+
+            writer = StreamingExcelWriter(source, source.active, output_file)
+            ProposalAssembler(docx.Document(), None, excel_writer=writer).assemble_row(
+                plans[0], RowResult(1, "标题1", "应答", plans[0].chapter, []))
+            writer.save()
+            source.close()
+
+            rows = list(load_workbook(output_file).active.iter_rows(values_only=True))
+            self.assertEqual(rows[1][:6], (1, '概述', '需求一', '标题1', '应答', '2.1.1'))
+        print("Excel流式短行测试完成")
+
+
+class TestWordProcessor(unittest.TestCase):
+    """测试Word文档处理类"""
+
+    def test_copy_content_limits_image_width(self):
+        """测试复制图片时按显示尺寸插入，像素很大的图片宽度也不超过最大宽度"""
+        print("\n开始测试图片复制宽度...")
+        source = docx.Document()
+        source.add_paragraph().add_run().add_picture(io.BytesIO(make_png(2000, 100, 1)), width=docx.shared.Cm(10))
+        source.add_paragraph().add_run().add_picture(io.BytesIO(make_png(2000, 100, 2)))
+        target = docx.Document()
+        WordProcessor.copy_content_with_images(source, target)
+
+        widths = [shape.width.cm for shape in target.inline_shapes]
+        self.assertEqual(len(widths), 2)
+        self.assertAlmostEqual(widths[0], 10, places=2)
+        self.assertAlmostEqual(widths[1], Config.MAX_WIDTH_CM, places=2)
+        print("图片复制宽度测试完成")
+
+
+class TestProposalAssembler(unittest.TestCase):
+    """测试标书组装类"""
+
+    def test_apply_table_fragment(self):
+        """测试复制表格保留合并单元格，并移除无法解析的图片引用"""
+        print("\n开始测试表格复制...")
+        source = docx.Document()
+        table = source.add_table(rows=2, cols=3)
+        table.cell(0, 0).merge(table.cell(0, 1)).text = '合并'
+        table.cell(1, 2).text = '单元格'
+        table.cell(1, 0)._tc.append(docx.oxml.parse_xml(
+            '<w:p xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            '<w:r><w:drawing/></w:r></w:p>'))
+
+        target = docx.Document()
+        assembler = ProposalAssembler(target, None)
+        assembler.apply_fragment([["heading", 2, "标题"],
+                                  ["table_xml", ParsedSection.portable_table_xml(table)],
+                                  ["table", 2, [["甲", "乙"]]]])
+
+        self.assertEqual(len(target.tables), 2)
+        copied = target.tables[0]
+        self.assertEqual([cell.text for cell in copied.rows[0].cells], ['合并', '合并', ''])
+        self.assertEqual(copied.cell(1, 2).text, '单元格')
+        self.assertNotIn('w:drawing', copied._tbl.xml)
+        self.assertEqual([cell.text for cell in target.tables[1].rows[0].cells], ['甲', '乙'])
+        print("表格复制测试完成")
+
+    def test_assemble_into_template(self):
+        """测试从模板池新建的文档使用模板样式、不含模板正文，且各文档互不影响"""
+        print("\n开始测试模板新建文档...")
+        template = Path(__file__).parent / "data" / "templates" / "Template.docx"
+        with patch.object(Config, 'TEMPLATE_FILE', template):
+            first = WordProcessor.new_document()
+            second = WordProcessor.new_document()
+        ProposalAssembler(first, None).apply_fragment([["heading", 2, "标题"], ["paragraph", "正文"]])
+
+        self.assertEqual([p.text for p in first.paragraphs], ["标题", "正文"])
+        self.assertEqual(first.paragraphs[0].style.name, "Heading 2")
+        self.assertEqual(second.paragraphs, [])
+        self.assertEqual(len(first.part.package.image_parts), 0)
+        self.assertEqual({style.name for style in first.styles},
+                         {style.name for style in docx.Document(str(template)).styles})
+        print("模板新建文档测试完成")
+
+
+class TestOutlinePlanner(unittest.TestCase):
+    """测试大纲规划类"""
+
+    def test_plan_more_section(self):
+        """测试分节模式下的章节号规划"""
+        print("\n开始测试大纲规划...")
+        rows = [make_row('需求一', '内容1'), make_row(None, '内容2'), make_row('需求二', '内容3')]
+        plans = OutlinePlanner(1, 2, 0, 0).plan(rows)
+
+        self.assertEqual([plan.chapter for plan in plans], ['2.1.1', '2.1.2', '2.2.1'])
+        self.assertEqual(plans[0].group_heading, ' 需求一')
+        self.assertIsNone(plans[1].group_heading)
+        self.assertEqual(plans[1].title_heading('标题'), ' 标题')
+        print("大纲规划测试完成")
+
+    def test_plan_single_section(self):
+        """测试不分节模式下的章节号规划"""
+        rows = [make_row('需求一', '内容1'), make_row(None, '内容2')]
+        plans = OutlinePlanner(0, 2, 0, 0).plan(rows)
+
+        self.assertEqual([plan.chapter for plan in plans], ['2.1', '2.2'])
+        self.assertEqual(plans[1].title_heading('标题'), '2. 标题')
+        self.assertEqual(plans[1].title_level, 2)
+
+    @patch('Generate.OutlinePlanner.section_heading_styles')
+    @patch('Generate.OutlinePlanner.resolve_section_file')
+    def test_plan_counts_section_headings(self, mock_resolve, mock_styles):
+        """测试关联章节中的标题影响后续章节号"""
+        mock_resolve.side_effect = lambda value: f"{value}.docx" if value else None
+        mock_styles.return_value = ['Heading 2', 'Heading 3']
+        rows = [make_row('需求一', '内容1', '1.1'), make_row(None, '内容2')]
+        plans = OutlinePlanner(1, 2, 0, 0).plan(rows)
+
+        self.assertEqual(plans[0].section_file, '1.1.docx')
+        self.assertEqual([plan.chapter for plan in plans], ['2.1.1', '2.2.3'])
+
+
+    def test_plan_matches_empty_g_column(self):
+        """测试G列为空时按需求文本检索章节"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index = SectionIndex(Path(temp_dir), {'1.1': {'path': '1.1- 数据源.docx', 'title': '数据源'},
+                                                  '1.2': {'path': '1.2- 调度.docx', 'title': '调度'}})
+            search = BM25Index.build([('1.1', '数据源管理 支持可视化创建数据源'), ('1.2', '任务调度 支持失败重试')])
+            rows = [make_row('需求一', '可视化创建数据源'), make_row(None, '任务失败重试', 'X'),
+                    make_row(None, '无关内容')]
+
+            planner = OutlinePlanner(1, 2, 0, 0, index, section_search=search, match_mode="suggest")
+            with patch.object(OutlinePlanner, 'section_heading_styles', return_value=[]):
+                plans = planner.plan(rows)
+            self.assertEqual([match['section'] for match in planner.matches], ['1.1'])
+            self.assertIsNone(plans[0].section_file)
+
+            planner = OutlinePlanner(1, 2, 0, 0, index, section_search=search, match_mode="fill")
+            with patch.object(OutlinePlanner, 'section_heading_styles', return_value=[]):
+                plans = planner.plan(rows)
+            self.assertEqual(plans[0].matched_section, '1.1')
+            self.assertEqual(plans[0].section_file, str(Path(temp_dir) / '1.1- 数据源.docx'))
+            self.assertEqual([plan.matched_section for plan in plans[1:]], [None, None])
+
+
+class TestReorderBuffer(unittest.TestCase):
+    """测试有序输出缓冲"""
+
+    def test_put_emits_in_order(self):
+        """测试乱序完成的行按顺序输出，窗口外的行不放行"""
+        emitted = []
+        buffer = ReorderBuffer([1, 2, 3, 5], lambda index, item: emitted.append((index, item)), capacity=2)
+        self.assertTrue(buffer._admissible(2))
+        self.assertFalse(buffer._admissible(3))
+        buffer.put(2, 'b')
+        buffer.put(3, 'c')
+        self.assertEqual(emitted, [])
+        buffer.put(1, 'a')
+        self.assertEqual(emitted, [(1, 'a'), (2, 'b'), (3, 'c')])
+        self.assertTrue(buffer.admit(5))
+        buffer.put(5, 'e')
+        self.assertTrue(buffer.done)
+        self.assertEqual(buffer.peak, 3)
+
+    @patch('Generate.AIService.generate_solution')
+    @patch('Generate.AIService.shorten_text')
+    def test_generate_with_gate(self, mock_shorten, mock_solution):
+        """测试并发生成时按顺序输出，且缓冲不超过窗口"""
+        print("\n开始测试有序流式输出...")
+        def solve(text):
+            time.sleep(0.001 * (int(text) % 5))
+            return f"应答{text}"
+
+        mock_shorten.side_effect = lambda text: f"标题{text}"
+        mock_solution.side_effect = solve
+        plans = OutlinePlanner(1, 2, 0, 0).plan([make_row('需求', str(i)) for i in range(30)])
+        emitted = []
+        buffer = ReorderBuffer([plan.index for plan in plans], lambda index, item: emitted.append(index), 4)
+        on_row_done = lambda plan, title, answer: buffer.put(plan.index, (title, answer))
+
+        results = RowGenerator(8).generate(plans, on_row_done, gate=buffer)
+        self.assertEqual(emitted, [plan.index for plan in plans])
+        self.assertLessEqual(buffer.peak, 4)
+        self.assertEqual(results[7], ('标题7', '应答7'))
+        print("有序流式输出测试完成")
+
+    @patch('Generate.AIService.generate_solution')
+    @patch('Generate.AIService.shorten_text')
+    def test_generate_with_gate_failure(self, mock_shorten, mock_solution):
+        """测试某行失败时不会卡在等待窗口上"""
+        def solve(text):
+            if text == '0':
+                time.sleep(0.01)
+                raise RuntimeError("失败")
+            return f"应答{text}"
+
+        mock_shorten.side_effect = lambda text: f"标题{text}"
+        mock_solution.side_effect = solve
+        plans = OutlinePlanner(1, 2, 0, 0).plan([make_row('需求', str(i)) for i in range(20)])
+        buffer = ReorderBuffer([plan.index for plan in plans], lambda index, item: None, 2)
+        with self.assertRaises(RuntimeError):
+            RowGenerator(4).generate(plans, lambda plan, title, answer: buffer.put(plan.index, answer),
+                                     gate=buffer)
+        self.assertTrue(buffer.aborted)
+
+
+class TestRowGenerator(unittest.TestCase):
+    """测试行内容生成类"""
+
+    @patch('Generate.AIService.generate_solution')
+    @patch('Generate.AIService.shorten_text')
+    def test_generate_keeps_order(self, mock_shorten, mock_solution):
+        """测试并发生成结果与行顺序一致"""
+        print("\n开始测试并发生成...")
+        mock_shorten.side_effect = lambda text: f"标题{text}"
+        mock_solution.side_effect = lambda text: f"应答{text}"
+        plans = OutlinePlanner(1, 2, 0, 0).plan([make_row('需求', str(i)) for i in range(20)])
+
+        sequential = RowGenerator(1).generate(plans)
+        concurrent = RowGenerator(8).generate(plans)
+        self.assertEqual(sequential, concurrent)
+        self.assertEqual(concurrent[3], ('标题3', '应答3'))
+        print("并发生成测试完成")
+
+    @patch('Generate.AIService.agenerate_solution')
+    @patch('Generate.AIService.ashorten_text')
+    def test_generate_async(self, mock_shorten, mock_solution):
+        """测试异步模式生成结果与行顺序一致"""
+        async def shorten(text):
+            await asyncio.sleep(0.001 * (10 - int(text)))
+            return f"标题{text}"
+
+        async def solve(text):
+            return f"应答{text}"
+
+        mock_shorten.side_effect = shorten
+        mock_solution.side_effect = solve
+        plans = OutlinePlanner(1, 2, 0, 0).plan([make_row('需求', str(i)) for i in range(10)])
+
+        results = RowGenerator(4, use_async=True).generate(plans)
+        self.assertEqual(results, [(f"标题{i}", f"应答{i}") for i in range(10)])
+
+    @patch('Generate.AIService.generate_solution')
+    @patch('Generate.AIService.shorten_texts')
+    def test_generate_title_batches(self, mock_shorten_texts, mock_solution):
+        """测试按批量大小打包标题请求"""
+        mock_shorten_texts.side_effect = lambda texts: [f"标题{text}" for text in texts]
+        mock_solution.side_effect = lambda text: f"应答{text}"
+        plans = OutlinePlanner(1, 2, 0, 0).plan([make_row('需求', str(i)) for i in range(10)])
+
+        results = RowGenerator(4, title_batch_size=4).generate(plans)
+        self.assertEqual(results, [(f"标题{i}", f"应答{i}") for i in range(10)])
+        self.assertEqual(mock_shorten_texts.call_count, 3)
+
+    @patch('Generate.AIService.adapt_solution')
+    @patch('Generate.AIService.generate_solution')
+    @patch('Generate.AIService.shorten_text')
+    def test_generate_with_followers(self, mock_shorten, mock_solution, mock_adapt):
+        """测试近似重复的行复用或改写代表行的应答"""
+        mock_shorten.side_effect = lambda text: f"标题{text}"
+        mock_solution.side_effect = lambda text: f"应答{text}"
+        mock_adapt.side_effect = lambda text, source_text, answer: f"{answer}改{text}"
+        plans = OutlinePlanner(1, 2, 0, 0).plan([make_row('需求', str(i)) for i in range(4)])
+        followers = {plans[0].index: [plans[2], plans[3]]}
+        done = []
+
+        results = RowGenerator(4).generate(plans, lambda plan, title, answer: done.append(plan.index), followers)
+        self.assertEqual(results, [('标题0', '应答0'), ('标题1', '应答1'), ('标题2', '应答0'), ('标题3', '应答0')])
+        self.assertEqual(mock_solution.call_count, 2)
+        self.assertEqual(sorted(done), [1, 2, 3, 4])
+
+        results = RowGenerator(1, dedup_mode="adapt").generate(plans, followers=followers)
+        self.assertEqual(results[3], ('标题3', '应答0改3'))
+
+
 if __name__ == '__main__':
     unittest.main()
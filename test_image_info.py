@@ -0,0 +1,104 @@
+import io
+import struct
+import unittest
+import zlib
+
+from docx import Document
+from docx.shared import Cm
+
+from Image_Info import ImageInfoCache, find_run_image, probe_image, run_image_size_cm
+
+
+def png_chunk(chunk_type: bytes, payload: bytes) -> bytes:
+    return (struct.pack('>I', len(payload)) + chunk_type + payload
+            + struct.pack('>I', zlib.crc32(chunk_type + payload) & 0xFFFFFFFF))
+
+
+def make_png(width: int, height: int, dpi: int = None) -> bytes:
+    data = b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    if dpi:
+        ppm = round(dpi / 0.0254)
+        data += png_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1))
+    return data + png_chunk(b'IDAT', b'') + png_chunk(b'IEND', b'')
+
+
+class TestProbeImage(unittest.TestCase):
+    def test_png(self):
+        """测试PNG文件头和pHYs分辨率"""
+        info = probe_image(make_png(640, 480, dpi=144))
+        self.assertEqual((info.format, info.width_px, info.height_px), ('png', 640, 480))
+        self.assertAlmostEqual(info.dpi_x, 144, places=0)
+        self.assertAlmostEqual(info.size_cm()[0], 640 / 144 * 2.54, places=2)
+
+    def test_jpeg(self):
+        """测试JPEG跳过APP段读取SOF尺寸"""
+        jfif = b'JFIF\x00\x01\x01' + struct.pack('>BHH', 1, 300, 300) + b'\x00\x00'
+        sof = b'\x08' + struct.pack('>HH', 200, 320) + b'\x03' + b'\x00' * 9
+        data = (b'\xff\xd8'
+                + b'\xff\xe0' + struct.pack('>H', len(jfif) + 2) + jfif
+                + b'\xff\xe1' + struct.pack('>H', 6) + b'Exif'
+                + b'\xff\xc2' + struct.pack('>H', len(sof) + 2) + sof
+                + b'\xff\xda')
+        info = probe_image(data)
+        self.assertEqual((info.format, info.width_px, info.height_px), ('jpeg', 320, 200))
+        self.assertEqual(info.dpi_x, 300)
+
+    def test_gif_bmp_emf(self):
+        """测试GIF、BMP和EMF文件头"""
+        gif = probe_image(b'GIF89a' + struct.pack('<HH', 33, 44) + b'\x00' * 4)
+        self.assertEqual((gif.width_px, gif.height_px), (33, 44))
+
+        bmp = (b'BM' + b'\x00' * 12 + struct.pack('<Iii', 40, 100, -50)
+               + b'\x00' * 12 + struct.pack('<ii', 3780, 3780))
+        info = probe_image(bmp)
+        self.assertEqual((info.width_px, info.height_px), (100, 50))
+        self.assertAlmostEqual(info.dpi_x, 96, places=0)
+
+        # rclFrame 为 0~5080（0.01mm），即 2 英寸宽、1 英寸高
+        emf = (struct.pack('<II', 1, 108) + b'\x00' * 16
+               + struct.pack('<iiii', 0, 0, 5080, 2540) + b' EMF')
+        info = probe_image(emf)
+        self.assertEqual((info.format, info.width_px, info.height_px), ('emf', 192, 96))
+
+    def test_unknown_or_truncated(self):
+        """测试无法识别或截断的数据"""
+        self.assertIsNone(probe_image(b'not an image'))
+        self.assertIsNone(probe_image(b'\x89PNG\r\n\x1a\n\x00'))
+        self.assertIsNone(probe_image(b'\xff\xd8\xff\xe0\x00'))
+
+    def test_cache_by_content_hash(self):
+        """测试相同内容只解析一次"""
+        cache = ImageInfoCache(max_entries=2)
+        data = make_png(10, 20)
+        first = cache.get(data)
+        self.assertIs(cache.get(data), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.get(make_png(1, 1))
+        cache.get(make_png(2, 2))
+        cache.get(data)
+        self.assertEqual(cache.misses, 4)
+
+
+class TestRunImage(unittest.TestCase):
+    def test_find_run_image(self):
+        """测试优先使用wp:extent，缺失时读取文件头"""
+        doc = Document()
+        run = doc.add_paragraph().add_run()
+        run.add_picture(io.BytesIO(make_png(300, 150, dpi=72)), width=Cm(5))
+        embed, width_cm, height_cm = find_run_image(run._r)
+        self.assertAlmostEqual(width_cm, 5.0, places=3)
+        self.assertAlmostEqual(height_cm, 2.5, places=3)
+
+        for extent in run._r.iter('{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}extent'):
+            extent.getparent().remove(extent)
+        found = find_run_image(run._r)
+        self.assertEqual(found, (embed, None, None))
+        width_cm, height_cm = run_image_size_cm(run, *found)
+        self.assertAlmostEqual(width_cm, 300 / 72 * 2.54, places=2)
+
+        text_run = doc.add_paragraph().add_run('文字')
+        self.assertIsNone(find_run_image(text_run._r))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from Near_Duplicate import find_near_duplicates, jaccard, normalize_text, shingles, write_cluster_report
+
+
+class TestNearDuplicate(unittest.TestCase):
+    def test_normalize_and_shingles(self):
+        """测试归一化忽略空白和标点"""
+        self.assertEqual(normalize_text(" 支持 MySQL、Oracle。"), "支持mysqloracle")
+        self.assertEqual(shingles("支持，查询"), {"支持查", "持查询"})
+        self.assertEqual(shingles("查询"), {"查询"})
+        self.assertEqual(shingles(None), set())
+        self.assertEqual(jaccard({"a", "b"}, {"b", "c"}), 1 / 3)
+
+    def test_find_near_duplicates(self):
+        """测试只合并与代表足够相似的需求"""
+        print("\n开始测试近似重复检测...")
+        base = "支持可视化创建不同类型数据源，包括传统数据库、文件系统、消息队列、SaaS API、NoSQL等"
+        items = [
+            (1, base),
+            (2, "支持用户权限管理，包括角色、菜单和数据权限的配置"),
+            (3, base.replace("，", ",") + "。"),
+            (4, base.replace("NoSQL等", "NoSQL数据库等")),
+            (5, None),
+            (6, "支持用户权限管理，包括角色、菜单和数据权限的配置"),
+        ]
+        clusters = find_near_duplicates(items, threshold=0.85)
+        self.assertEqual([(c.leader, c.members) for c in clusters], [(1, [3, 4]), (2, [6])])
+        self.assertEqual(clusters[0].similarities[3], 1.0)
+        self.assertLess(clusters[0].similarities[4], 1.0)
+
+        exact = find_near_duplicates(items, threshold=1.0)
+        self.assertEqual([(c.leader, c.members) for c in exact], [(1, [3]), (2, [6])])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "report.json"
+            write_cluster_report(path, clusters, dict(items), 0.85, "reuse")
+            report = json.loads(path.read_text(encoding='utf-8'))
+        self.assertEqual((report["clusters"], report["merged_rows"]), (2, 3))
+        self.assertEqual(report["items"][1]["members"][0]["row"], 6)
+        print("近似重复检测测试完成")
+
+
+if __name__ == '__main__':
+    unittest.main()
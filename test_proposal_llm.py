@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from ProposalLLM import build_parser, main
+
+ROOT_DIR = Path(__file__).parent
+
+
+class TestProposalLLM(unittest.TestCase):
+    def test_import_is_lazy(self):
+        """测试导入Generate不加载提供商SDK和openpyxl，首次访问配置项时才加载配置"""
+        print("\n开始测试延迟导入...")
+        code = ("import sys, Generate\n"
+                "heavy = [m for m in ('openai', 'requests', 'httpx', 'openpyxl') if m in sys.modules]\n"
+                "loaded = Generate.Config._loaded\n"
+                "Generate.Config.MAX_WORKERS\n"
+                "print(heavy, loaded, Generate.Config._loaded)\n")
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "[] False True")
+
+    def test_parse_commands(self):
+        """测试子命令解析：generate自带参数，其余子命令的参数原样交给对应模块"""
+        print("\n开始测试命令行解析...")
+        args, rest = build_parser().parse_known_args(['generate', '--resume'])
+        self.assertTrue(args.resume)
+        self.assertEqual(rest, [])
+
+        args, rest = build_parser().parse_known_args(['batch', 'jobs.json', '--workers', '2'])
+        self.assertTrue(args.passthrough)
+        self.assertEqual(rest, ['jobs.json', '--workers', '2'])
+
+        with patch('Extract_Word.main') as extract_main:
+            self.assertEqual(main(['index', '--output-dir', 'sections']), 0)
+        extract_main.assert_called_once_with(['--reindex', '--output-dir', 'sections'])
+
+        with self.assertRaises(SystemExit):
+            main(['generate', '--unknown'])
+
+
+if __name__ == '__main__':
+    unittest.main()
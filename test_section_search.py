@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from Section_Search import BM25Index, tokenize
+
+
+class TestSectionSearch(unittest.TestCase):
+    def test_tokenize(self):
+        """测试中文切为二元组、英文数字按词切分"""
+        self.assertEqual(tokenize("支持X86，ARM服务器"), ["支持", "x86", "arm", "服务", "务器"])
+        self.assertEqual(tokenize("表 Kafka"), ["表", "kafka"])
+        self.assertEqual(tokenize(None), [])
+
+    def test_search_and_persist(self):
+        """测试检索排序、归一化得分和保存后重新加载"""
+        print("\n开始测试章节检索...")
+        index = BM25Index.build([
+            ("1.1", "数据源管理 支持可视化创建数据源，包括传统数据库、文件系统、消息队列"),
+            ("1.2", "任务调度 支持按时间和依赖关系调度任务，失败自动重试"),
+            ("2.1", "权限管理 支持角色、菜单和数据权限配置"),
+            ("2.2", "系统监控 支持集群资源监控和告警"),
+        ])
+        results = index.search("需要可视化创建不同类型的数据源，如文件系统和消息队列", top_k=2)
+        self.assertEqual(results[0][0], "1.1")
+        self.assertGreater(results[0][2], 0.25)
+        self.assertLess(results[1][2], 0.1)
+        self.assertEqual(index.search("支持数据权限")[0][0], "2.1")
+        self.assertEqual(index.search("完全无关的内容abc"), [])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "index.json"
+            index.save(path)
+            loaded = BM25Index.load(path)
+        self.assertEqual(len(loaded), 4)
+        self.assertEqual(loaded.search("任务失败重试"), index.search("任务失败重试"))
+        print("章节检索测试完成")
+
+
+if __name__ == '__main__':
+    unittest.main()